@@ -0,0 +1,118 @@
+import gzip
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+
+import config
+
+logger = logging.getLogger(__name__)
+
+STATE_FILE = 'last_backup.json'
+
+
+@dataclass
+class Backup:
+    """Результат бекапа"""
+    path: str
+    sha256: str
+    size: int
+    compressed_size: int
+    changed: bool
+
+
+class BackupManager:
+    """Бекапы базы: согласованный снимок через SQLite backup API, gzip,
+    пропуск неизмененных снимков и ротация локальных копий.
+
+    Методы синхронные - из бота их вызывают через AsyncDatabase.run().
+    /export_db и автобекап могут работать одновременно в разных потоках
+    базы: у каждого свой временный файл снимка, а сравнение с прошлым
+    бекапом, запись архива и ротация идут под блокировкой.
+    """
+
+    def __init__(self, database, backup_dir: str = config.BACKUP_DIR, keep: int = config.BACKUP_KEEP):
+        self.database = database
+        self.backup_dir = backup_dir
+        self.keep = keep
+        self._lock = threading.Lock()
+
+    def create(self, force: bool = False) -> Backup:
+        """Делает снимок. Если содержимое не изменилось с прошлого бекапа
+        (и не force) - новый файл не сохраняется, changed=False"""
+        os.makedirs(self.backup_dir, exist_ok=True)
+        fd, snapshot_path = tempfile.mkstemp(prefix='.snapshot_', suffix='.db', dir=self.backup_dir)
+        os.close(fd)
+        try:
+            self.database.snapshot(snapshot_path)
+            sha256 = self._hash(snapshot_path)
+            size = os.path.getsize(snapshot_path)
+
+            with self._lock:
+                last = self._load_state()
+                if not force and last and last['sha256'] == sha256 and os.path.exists(last['path']):
+                    logger.info(f"Backup skipped: database unchanged since {last['path']}")
+                    return Backup(last['path'], sha256, size, os.path.getsize(last['path']), changed=False)
+
+                path = self._new_backup_path()
+                # mtime=0: одинаковые снимки дают одинаковый архив
+                with open(snapshot_path, 'rb') as src, \
+                        gzip.GzipFile(path, 'wb', compresslevel=config.BACKUP_COMPRESSION_LEVEL, mtime=0) as dst:
+                    shutil.copyfileobj(src, dst, 1024 * 1024)
+
+                self._save_state({'sha256': sha256, 'path': path})
+                self._rotate()
+        finally:
+            if os.path.exists(snapshot_path):
+                os.remove(snapshot_path)
+
+        backup = Backup(path, sha256, size, os.path.getsize(path), changed=True)
+        logger.info(f"Backup created: {path} ({backup.size} -> {backup.compressed_size} bytes)")
+        return backup
+
+    def _new_backup_path(self) -> str:
+        """Имя нового архива: время с микросекундами (сортируется по времени),
+        а если такой файл уже есть - с номером"""
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+        path = os.path.join(self.backup_dir, f'backup_{timestamp}.db.gz')
+        counter = 1
+        while os.path.exists(path):
+            path = os.path.join(self.backup_dir, f'backup_{timestamp}_{counter}.db.gz')
+            counter += 1
+        return path
+
+    @staticmethod
+    def _hash(path: str) -> str:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def _load_state(self):
+        try:
+            with open(os.path.join(self.backup_dir, STATE_FILE)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _save_state(self, state: dict):
+        path = os.path.join(self.backup_dir, STATE_FILE)
+        with open(path + '.tmp', 'w') as f:
+            json.dump(state, f)
+        os.replace(path + '.tmp', path)
+
+    def _rotate(self):
+        """Оставляет только `keep` последних бекапов"""
+        backups = sorted(
+            name for name in os.listdir(self.backup_dir)
+            if name.startswith('backup_') and name.endswith('.db.gz')
+        )
+        for name in backups[:-self.keep]:
+            os.remove(os.path.join(self.backup_dir, name))
+            logger.info(f"Old backup removed: {name}")
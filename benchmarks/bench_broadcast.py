@@ -0,0 +1,77 @@
+"""Бенчмарк рассылки: старый последовательный цикл против Broadcaster.
+
+    python benchmarks/bench_broadcast.py --users 500 --latency 0.15
+
+Оба варианта шлют сообщения в локальную заглушку Bot API (fake_bot_api.py)
+с одинаковой сетевой задержкой и flood-лимитом 30 сообщений/сек.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from telegram import Bot
+from telegram.request import HTTPXRequest
+
+from broadcast import Broadcaster
+from fake_bot_api import FakeBotAPI
+
+TEXT = "🙏 Привіт! Будь ласка, оціни минулу молодіжку."
+
+
+async def legacy_loop(bot: Bot, chat_ids) -> int:
+    """Так рассылал admin_start_survey до Broadcaster"""
+    sent = 0
+    for chat_id in chat_ids:
+        try:
+            await bot.send_message(chat_id=chat_id, text=TEXT)
+            sent += 1
+        except Exception:
+            pass
+    return sent
+
+
+async def run(args):
+    chat_ids = list(range(1, args.users + 1))
+    results = {}
+
+    with FakeBotAPI(latency=args.latency, rate_limit=args.server_limit) as api:
+        # Как в ApplicationBuilder: пул соединений, а не одно соединение по умолчанию у Bot()
+        request = HTTPXRequest(connection_pool_size=256)
+        async with Bot('123:fake', base_url=api.base_url, request=request) as bot:
+            if not args.skip_legacy:
+                started = time.perf_counter()
+                sent = await legacy_loop(bot, chat_ids)
+                elapsed = time.perf_counter() - started
+                results['legacy loop'] = (sent, elapsed, api.flood_errors)
+
+            api.reset()
+            broadcaster = Broadcaster(bot, rate=args.rate, concurrency=args.concurrency)
+            started = time.perf_counter()
+            result = await broadcaster.broadcast(chat_ids, text=TEXT)
+            elapsed = time.perf_counter() - started
+            results['Broadcaster'] = (len(result.delivered), elapsed, api.flood_errors)
+
+    print(f"{args.users} users, latency {args.latency * 1000:.0f} ms, "
+          f"server limit {args.server_limit} msg/s, engine rate {args.rate} msg/s")
+    print(f"{'variant':<14}{'sent':>8}{'seconds':>10}{'msg/s':>10}{'429s':>8}")
+    for name, (sent, elapsed, floods) in results.items():
+        print(f"{name:<14}{sent:>8}{elapsed:>10.2f}{sent / elapsed:>10.1f}{floods:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=500)
+    parser.add_argument('--latency', type=float, default=0.15, help='задержка ответа Bot API, сек')
+    parser.add_argument('--server-limit', type=int, default=30, help='flood-лимит заглушки, сообщений/сек')
+    parser.add_argument('--rate', type=float, default=25, help='глобальный лимит Broadcaster')
+    parser.add_argument('--concurrency', type=int, default=20)
+    parser.add_argument('--skip-legacy', action='store_true')
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
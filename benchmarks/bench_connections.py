@@ -0,0 +1,95 @@
+"""Бенчмарк задержки одного вызова Database: новое подключение на каждый вызов
+(как было) против постоянных подключений с WAL и кеша проверок доступа.
+
+    python benchmarks/bench_connections.py --users 2000 --calls 2000
+"""
+import argparse
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import Database
+
+
+class UncachedDatabase(Database):
+    """Database без кеша MembershipCache: проверки доступа идут в базу"""
+
+    def load_membership(self):
+        pass
+
+
+class LegacyDatabase(UncachedDatabase):
+    """Database со старым поведением: sqlite3.connect() на каждый вызов, журнал DELETE"""
+
+    def get_connection(self):
+        return sqlite3.connect(self.db_name)
+
+
+def seed(db: Database, users: int) -> int:
+    conn = db.get_connection()
+    conn.executemany(
+        'INSERT INTO users (user_id, username, first_name, last_name, joined_date) VALUES (?, ?, ?, ?, ?)',
+        [(i, f'user{i}', 'Name', 'Surname', '2024-01-01T00:00:00') for i in range(1, users + 1)]
+    )
+    conn.commit()
+    conn.close()
+    db.load_membership()
+    return db.create_meeting()
+
+
+def measure(fn, calls: int) -> dict:
+    samples = []
+    for i in range(calls):
+        started = time.perf_counter()
+        fn(i)
+        samples.append((time.perf_counter() - started) * 1e6)
+    samples.sort()
+    return {
+        'mean': statistics.fmean(samples),
+        'p50': samples[len(samples) // 2],
+        'p99': samples[int(len(samples) * 0.99) - 1],
+    }
+
+
+def run(db: Database, users: int, calls: int) -> dict:
+    meeting_id = seed(db, users)
+    return {
+        'is_user_approved': measure(lambda i: db.is_user_approved(i % users + 1), calls),
+        'add_rating': measure(lambda i: db.add_rating(meeting_id, i % users + 1, 4, 5, 3, True), calls),
+        'get_meeting_stats': measure(lambda i: db.get_meeting_stats(meeting_id), calls // 10 or 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--calls', type=int, default=2000)
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        variants = (
+            ('per-call connect', LegacyDatabase),
+            ('pooled + WAL', UncachedDatabase),
+            ('pooled + cache', Database),
+        )
+        for name, cls in variants:
+            db = cls(os.path.join(tmp, f'{cls.__name__}.db'))
+            results[name] = run(db, args.users, args.calls)
+            db.close()
+
+    print(f"{args.users} users, {args.calls} calls per method (µs)")
+    print(f"{'method':<20}{'variant':<20}{'mean':>10}{'p50':>10}{'p99':>10}")
+    for method in results['pooled + cache']:
+        for name, res in results.items():
+            r = res[method]
+            print(f"{method:<20}{name:<20}{r['mean']:>10.1f}{r['p50']:>10.1f}{r['p99']:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
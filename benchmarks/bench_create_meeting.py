@@ -0,0 +1,76 @@
+"""Время запуска опроса (create_meeting): INSERT на каждого пользователя против
+одного INSERT ... SELECT.
+
+    python benchmarks/bench_create_meeting.py --users 100000
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import Database
+
+
+def legacy_create_meeting(db: Database, deadline_hours: int = 18) -> int:
+    """create_meeting до перехода на INSERT ... SELECT (отдельное подключение на каждый шаг)"""
+    conn = sqlite3.connect(db.db_name)
+    cursor = conn.cursor()
+    start_date = datetime.now()
+    cursor.execute(
+        'INSERT INTO youth_meetings (start_date, deadline_date, is_active) VALUES (?, ?, 1)',
+        (start_date.isoformat(), (start_date + timedelta(hours=deadline_hours)).isoformat())
+    )
+    meeting_id = cursor.lastrowid
+    users_conn = sqlite3.connect(db.db_name)
+    approved_users = [row[0] for row in users_conn.execute('SELECT user_id FROM users')]
+    users_conn.close()
+    for user_id in approved_users:
+        cursor.execute(
+            'INSERT INTO user_responses (meeting_id, user_id, has_responded, reminded) VALUES (?, ?, 0, 0)',
+            (meeting_id, user_id)
+        )
+    conn.commit()
+    conn.close()
+    return meeting_id
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=100000)
+    parser.add_argument('--runs', type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, 'meetings.db'))
+        conn = db.get_connection()
+        conn.executemany(
+            'INSERT INTO users (user_id, username, first_name, last_name, joined_date) VALUES (?, ?, ?, ?, ?)',
+            [(i, f'user{i}', 'Name', '', '2024-01-01T00:00:00') for i in range(1, args.users + 1)]
+        )
+        conn.commit()
+        conn.close()
+
+        results = {}
+        for name, create in (('per-user INSERT', legacy_create_meeting),
+                             ('INSERT ... SELECT', Database.create_meeting)):
+            timings = []
+            for _ in range(args.runs):
+                started = time.perf_counter()
+                meeting_id = create(db)
+                timings.append(time.perf_counter() - started)
+                db.close_meeting(meeting_id)
+            results[name] = min(timings)
+        db.close()
+
+    print(f"create_meeting with {args.users} approved users (best of {args.runs})")
+    for name, seconds in results.items():
+        print(f"{name:<20}{seconds * 1000:>10.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
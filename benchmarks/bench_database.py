@@ -0,0 +1,173 @@
+"""Набор бенчмарков Database на синтетической базе (datagen.py) с результатами
+в JSON для сравнения между коммитами.
+
+    python benchmarks/bench_database.py --users 50000 --meetings 2000 --json results/HEAD.json
+    python benchmarks/bench_database.py --compare results/base.json --json results/HEAD.json
+
+Время каждой операции - в микросекундах (mean, p50, p99, min по итерациям).
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import Database
+from datagen import generate
+
+
+def git_revision() -> dict:
+    """Коммит, на котором запущен бенчмарк (если это git checkout)"""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=root,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=root,
+                                    capture_output=True, text=True, check=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return {'commit': None, 'dirty': None}
+    return {'commit': commit, 'dirty': dirty}
+
+
+def measure(fn, iterations: int, setup=None) -> dict:
+    """Запускает fn(i) iterations раз; setup(i) выполняется вне замера"""
+    samples = []
+    for i in range(iterations):
+        if setup:
+            setup(i)
+        started = time.perf_counter()
+        fn(i)
+        samples.append((time.perf_counter() - started) * 1e6)
+    samples.sort()
+    return {
+        'iterations': iterations,
+        'mean_us': statistics.fmean(samples),
+        'p50_us': samples[len(samples) // 2],
+        'p99_us': samples[max(0, int(len(samples) * 0.99) - 1)],
+        'min_us': samples[0],
+    }
+
+
+def run_suite(db: Database, args) -> dict:
+    rng = random.Random(args.seed)
+    closed = list(range(1, args.meetings + 1))
+    results = {}
+
+    # Каждый create_meeting записывает user_responses на всех пользователей;
+    # встреча закрывается вне замера, последняя остается активной
+    created = []
+    results['create_meeting'] = measure(
+        lambda i: created.append(db.create_meeting()),
+        args.heavy_iterations,
+        setup=lambda i: created and db.close_meeting(created[-1])
+    )
+    active = created[-1]
+
+    raters = rng.sample(range(1, args.users + 1), min(args.iterations, args.users))
+    results['add_rating'] = measure(
+        lambda i: db.add_rating(active, raters[i % len(raters)], 4, 5, 3, True), args.iterations
+    )
+    results['get_users_for_reminder'] = measure(
+        lambda i: db.get_users_for_reminder(active), args.heavy_iterations
+    )
+    results['get_meeting_stats'] = measure(
+        lambda i: db.get_meeting_stats(rng.choice(closed)), args.iterations
+    )
+    # /graph year и /graph all
+    results['get_rating_rollup_month'] = measure(
+        lambda i: db.get_rating_rollup('month', 365), args.heavy_iterations
+    )
+    results['get_rating_rollup_quarter'] = measure(
+        lambda i: db.get_rating_rollup('quarter'), args.heavy_iterations
+    )
+    # /search: частое слово (есть во всех шаблонах отзывов), тема и префикс,
+    # первая страница по всей базе и по диапазону встреч
+    results['search_feedback_common'] = measure(
+        lambda i: db.search_feedback('тема'), args.heavy_iterations
+    )
+    results['search_feedback_topic'] = measure(
+        lambda i: db.search_feedback('молитв'), args.iterations
+    )
+    results['search_feedback_range'] = measure(
+        lambda i: db.search_feedback('дружба', args.meetings // 2, args.meetings), args.iterations
+    )
+    return results
+
+
+def print_results(results: dict, base: dict = None):
+    header = f"{'operation':<24}{'mean µs':>12}{'p50 µs':>12}{'p99 µs':>12}"
+    if base:
+        header += f"{'base p50':>12}{'change':>10}"
+    print(header)
+    for name, r in results.items():
+        line = f"{name:<24}{r['mean_us']:>12.1f}{r['p50_us']:>12.1f}{r['p99_us']:>12.1f}"
+        if base and name in base:
+            base_p50 = base[name]['p50_us']
+            line += f"{base_p50:>12.1f}{(r['p50_us'] / base_p50 - 1) * 100:>+9.0f}%"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=50000)
+    parser.add_argument('--meetings', type=int, default=2000)
+    parser.add_argument('--ratings-per-meeting', type=int, default=40)
+    parser.add_argument('--iterations', type=int, default=500, help='итераций для быстрых операций')
+    parser.add_argument('--heavy-iterations', type=int, default=20,
+                        help='итераций для create_meeting и выборок по всем встречам')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--json', help='куда записать результаты')
+    parser.add_argument('--compare', help='JSON с результатами для сравнения')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, 'bench.db'))
+        started = time.perf_counter()
+        counts = generate(db, args.users, args.meetings, args.ratings_per_meeting, seed=args.seed)
+        generated_in = time.perf_counter() - started
+        results = run_suite(db, args)
+        db.close()
+
+    report = {
+        'meta': {
+            **git_revision(),
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+            'seed': args.seed,
+            'data': counts,
+            'generate_seconds': round(generated_in, 2),
+        },
+        'results': results,
+    }
+
+    base = None
+    if args.compare:
+        with open(args.compare) as f:
+            base_report = json.load(f)
+        base = base_report['results']
+        if base_report['meta'].get('data') != counts:
+            print(f"WARNING: base was measured on different data: {base_report['meta'].get('data')}")
+
+    print(f"{counts} (generated in {generated_in:.1f}s), commit {report['meta']['commit']}")
+    print_results(results, base)
+
+    if args.json:
+        os.makedirs(os.path.dirname(os.path.abspath(args.json)), exist_ok=True)
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.json}")
+
+
+if __name__ == '__main__':
+    main()
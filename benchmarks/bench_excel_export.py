@@ -0,0 +1,163 @@
+"""Пиковая память Excel экспорта: обычный Workbook с fetchall() против
+write-only экспорта (excel_export.py) при росте таблицы оценок.
+
+    python benchmarks/bench_excel_export.py --ratings 5000 20000 80000
+
+Память меряется двумя способами: tracemalloc видит только объекты Python, а
+прирост пикового RSS процесса (VmHWM, Linux) - еще и память самого SQLite
+(кеш страниц, сортировки во временных B-деревьях при temp_store = MEMORY).
+Каждый экспорт меряется в отдельном процессе с уже импортированным openpyxl:
+иначе пик одного варианта включал бы импорт, а второй переиспользовал бы
+память, которую первый не вернул системе.
+"""
+import argparse
+import gc
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import Database
+from excel_export import SHEETS, build_excel_export
+
+
+def legacy_export(database: Database, path: str):
+    """Экспорт до перехода на write-only: все строки и ячейки в памяти"""
+    from openpyxl import Workbook
+
+    wb = Workbook()
+    wb.remove(wb.active)
+    conn = database.get_connection()
+    cursor = conn.cursor()
+    for title, header, _, query in SHEETS:
+        ws = wb.create_sheet(title)
+        ws.append(header)
+        cursor.execute(query)
+        for row in cursor.fetchall():
+            ws.append(list(row))
+        for column in ws.columns:
+            width = max(len(str(cell.value)) for cell in column)
+            ws.column_dimensions[column[0].column_letter].width = min(width + 2, 50)
+    conn.close()
+    wb.save(path)
+
+
+def seed(database: Database, ratings: int):
+    conn = database.get_connection()
+    meetings = max(1, ratings // 100)
+    conn.executemany(
+        'INSERT INTO youth_meetings (start_date, deadline_date, is_active) VALUES (?, ?, 0)',
+        [(f'2024-01-01T00:00:{i % 60:02d}', '2024-01-02T00:00:00') for i in range(meetings)]
+    )
+    conn.executemany(
+        '''INSERT INTO ratings
+           (meeting_id, interest_rating, relevance_rating, spiritual_growth_rating, attended, rating_date)
+           VALUES (?, ?, ?, ?, 1, ?)''',
+        [(i % meetings + 1, i % 5 + 1, i % 4 + 1, i % 3 + 1, '2024-01-01T12:00:00') for i in range(ratings)]
+    )
+    conn.executemany(
+        'INSERT INTO feedback (meeting_id, feedback_text, feedback_date) VALUES (?, ?, ?)',
+        [(i % meetings + 1, 'Дуже сподобалась тема зустрічі, дякую! ' * 3, '2024-01-01T12:00:00')
+         for i in range(ratings // 10)]
+    )
+    conn.commit()
+    conn.close()
+    database.rebuild_aggregates()
+
+
+def read_status_kb(field: str) -> Optional[int]:
+    """Поле из /proc/self/status в КБ (None не в Linux)"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def reset_peak_rss() -> bool:
+    """Сбрасывает VmHWM до текущего RSS, чтобы мерить пик каждого прогона отдельно"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def measure(fn) -> tuple:
+    """(пик tracemalloc МБ, прирост пикового RSS МБ или None, секунды)"""
+    gc.collect()
+    rss_tracked = reset_peak_rss()
+    rss_before = read_status_kb('VmRSS')
+    tracemalloc.start()
+    started = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    rss_peak = read_status_kb('VmHWM')
+    rss_mb = (rss_peak - rss_before) / 1024 if rss_tracked and rss_peak and rss_before else None
+    return peak / 1024 / 1024, rss_mb, elapsed
+
+
+def format_mb(value: Optional[float]) -> str:
+    return f"{value:.1f}" if value is not None else 'n/a'
+
+
+def measure_in_subprocess(variant: str, db_path: str) -> tuple:
+    """measure() экспорта variant ('stream' или 'legacy') в новом процессе"""
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--measure', variant, '--db', db_path],
+        check=True, capture_output=True, text=True
+    ).stdout
+    return tuple(json.loads(output.splitlines()[-1]))
+
+
+def run_measurement(variant: str, db_path: str):
+    """Режим дочернего процесса: один замер, результат - JSON в stdout"""
+    import openpyxl  # noqa: F401 - импорт не должен попасть в замер
+
+    database = Database(db_path)
+    if variant == 'stream':
+        result = measure(lambda: build_excel_export(database))
+    else:
+        result = measure(lambda: legacy_export(database, db_path + '.xlsx'))
+    database.close()
+    print(json.dumps(result))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--ratings', type=int, nargs='+', default=[5000, 20000, 80000])
+    parser.add_argument('--measure', choices=['stream', 'legacy'], help=argparse.SUPPRESS)
+    parser.add_argument('--db', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.measure:
+        run_measurement(args.measure, args.db)
+        return
+
+    print(f"{'ratings':>10}{'stream MB':>11}{'stream RSS':>12}{'stream s':>10}"
+          f"{'legacy MB':>11}{'legacy RSS':>12}{'legacy s':>10}")
+    for ratings in args.ratings:
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, 'export.db')
+            database = Database(db_path)
+            seed(database, ratings)
+            database.close()
+            stream_mb, stream_rss, stream_s = measure_in_subprocess('stream', db_path)
+            legacy_mb, legacy_rss, legacy_s = measure_in_subprocess('legacy', db_path)
+        print(f"{ratings:>10}{stream_mb:>11.1f}{format_mb(stream_rss):>12}{stream_s:>10.2f}"
+              f"{legacy_mb:>11.1f}{format_mb(legacy_rss):>12}{legacy_s:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
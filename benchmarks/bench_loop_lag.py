@@ -0,0 +1,119 @@
+"""Задержка event loop при синхронных запросах к базе и через AsyncDatabase.
+
+    python benchmarks/bench_loop_lag.py --ratings 200000 --feedback 50000 --handlers 200
+
+Параллельно запускаются «тяжелые» обработчики (get_meeting_stats по большой
+встрече: средние из meeting_aggregates и весь список отзывов) и «легкие»
+(get_active_meeting - запрос одной строки по индексу, как при нажатии
+кнопки; is_user_approved отвечает из кеша и до базы не доходит). Выводится
+задержка loop по LoopLagMonitor и время ответа легкого обработчика.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import Database, AsyncDatabase
+from monitoring import LoopLagMonitor
+
+
+def seed(db: Database, ratings: int, feedback: int) -> int:
+    meeting_id = db.create_meeting()
+    conn = db.get_connection()
+    conn.executemany(
+        'INSERT INTO users (user_id, username, first_name, last_name, joined_date) VALUES (?, ?, ?, ?, ?)',
+        [(i, f'user{i}', 'Name', '', '2024-01-01T00:00:00') for i in range(1, 1001)]
+    )
+    conn.executemany(
+        '''INSERT INTO ratings
+           (meeting_id, interest_rating, relevance_rating, spiritual_growth_rating, attended, rating_date)
+           VALUES (?, ?, ?, ?, 1, ?)''',
+        [(meeting_id, i % 5 + 1, (i * 7) % 5 + 1, (i * 3) % 5 + 1, '2024-01-01T00:00:00') for i in range(ratings)]
+    )
+    conn.executemany(
+        'INSERT INTO feedback (meeting_id, feedback_text, feedback_date) VALUES (?, ?, ?)',
+        [(meeting_id, f'Відгук {i}: дуже сподобалась тема зустрічі, дякую!', '2024-01-01T00:00:00')
+         for i in range(feedback)]
+    )
+    conn.commit()
+    conn.close()
+    # Оценки вставлены напрямую - агрегаты встречи пересчитываются по ним
+    db.rebuild_aggregates()
+    return meeting_id
+
+
+async def scenario(call, meeting_id: int, handlers: int) -> dict:
+    monitor = LoopLagMonitor(interval=0.005, warn_threshold=float('inf'), history=100000)
+    monitor.start()
+    light_latencies = []
+
+    async def heavy():
+        await call('get_meeting_stats', meeting_id)
+
+    async def light(started):
+        await call('get_active_meeting')
+        light_latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    tasks = []
+    for i in range(handlers):
+        # Апдейты приходят раз в миллисекунду; время легкого обработчика считаем
+        # от момента прихода, включая ожидание заблокированного loop
+        arrival = started + i * 0.001
+        coro = heavy() if i % 4 == 0 else light(arrival)
+        tasks.append(asyncio.create_task(coro))
+        await asyncio.sleep(max(0.0, arrival + 0.001 - time.perf_counter()))
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+    await monitor.stop()
+
+    light_latencies.sort()
+    result = monitor.summary()
+    result['light_p50'] = light_latencies[len(light_latencies) // 2] * 1000
+    result['light_p99'] = light_latencies[int(len(light_latencies) * 0.99) - 1] * 1000
+    result['elapsed'] = elapsed
+    return result
+
+
+async def run(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        database = Database(os.path.join(tmp, 'lag.db'))
+        meeting_id = seed(database, args.ratings, args.feedback)
+        async_db = AsyncDatabase(database)
+
+        async def sync_call(name, *a):
+            # Как было: синхронный вызов прямо в корутине обработчика
+            return getattr(database, name)(*a)
+
+        async def async_call(name, *a):
+            return await getattr(async_db, name)(*a)
+
+        results = {
+            'sync Database': await scenario(sync_call, meeting_id, args.handlers),
+            'AsyncDatabase': await scenario(async_call, meeting_id, args.handlers),
+        }
+        async_db.close()
+
+    print(f"{args.ratings} ratings, {args.feedback} feedback in meeting, "
+          f"{args.handlers} handlers (1/4 heavy), ms")
+    print(f"{'variant':<16}{'lag mean':>10}{'lag p99':>10}{'lag max':>10}"
+          f"{'light p50':>11}{'light p99':>11}{'total s':>9}")
+    for name, r in results.items():
+        print(f"{name:<16}{r['mean']:>10.1f}{r['p99']:>10.1f}{r['max']:>10.1f}"
+              f"{r['light_p50']:>11.1f}{r['light_p99']:>11.1f}{r['elapsed']:>9.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--ratings', type=int, default=200000)
+    parser.add_argument('--feedback', type=int, default=50000)
+    parser.add_argument('--handlers', type=int, default=200)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+"""Задержка доставки апдейтов: long polling против webhook.
+
+    python benchmarks/bench_update_latency.py --updates 50 --burst 200 --latency 0.05
+
+Заглушка Bot API (fake_bot_api.py) отдает апдейты через getUpdates или
+присылает их POST запросом на локальный webhook сервер бота. Задержка -
+время от появления апдейта до ответа бота (sendMessage) в заглушке.
+Сначала апдейты приходят по одному, затем пачкой (--burst) от разных
+пользователей: последовательная обработка (как было) против
+PerUserUpdateProcessor.
+"""
+import argparse
+import asyncio
+import os
+import secrets
+import socket
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from telegram import Update
+from telegram.ext import Application, MessageHandler, filters
+
+import config
+from fake_bot_api import FakeBotAPI
+from update_processor import PerUserUpdateProcessor
+
+
+def message_update(chat_id: int, text: str) -> dict:
+    return {'message': {
+        'message_id': 1,
+        'date': int(time.time()),
+        'chat': {'id': chat_id, 'type': 'private'},
+        'from': {'id': chat_id, 'is_bot': False, 'first_name': 'User'},
+        'text': text,
+    }}
+
+
+async def echo(update: Update, context):
+    await update.message.reply_text(update.message.text)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+async def wait_delivered(api: FakeBotAPI, texts, timeout: float = 30):
+    deadline = time.perf_counter() + timeout
+    while not all(text in api.delivered_at for text in texts):
+        if time.perf_counter() > deadline:
+            raise TimeoutError(f"{sum(t not in api.delivered_at for t in texts)} updates were not answered")
+        await asyncio.sleep(0.001)
+
+
+async def measure(api: FakeBotAPI, mode: str, concurrent: bool, updates: int, burst: int) -> dict:
+    builder = Application.builder().token('123:fake').base_url(api.base_url)
+    if concurrent:
+        builder.concurrent_updates(PerUserUpdateProcessor(config.UPDATE_CONCURRENCY))
+    application = builder.build()
+    application.add_handler(MessageHandler(filters.TEXT, echo))
+    await application.initialize()
+    await application.start()
+
+    secret_token = secrets.token_urlsafe(32)
+    if mode == 'polling':
+        await application.updater.start_polling(poll_interval=0, timeout=config.POLLING_TIMEOUT)
+    else:
+        port = free_port()
+        await application.updater.start_webhook(
+            listen='127.0.0.1',
+            port=port,
+            url_path=config.WEBHOOK_PATH,
+            webhook_url=f'http://127.0.0.1:{port}/{config.WEBHOOK_PATH}',
+            secret_token=secret_token,
+        )
+    await asyncio.sleep(0.5)
+    api.reset()
+
+    try:
+        single = []
+        for i in range(updates):
+            text = f'{mode}-{i}'
+            pushed = time.perf_counter()
+            api.push_update(message_update(i + 1, text))
+            await wait_delivered(api, [text])
+            single.append(api.delivered_at[text] - pushed)
+            # Апдейт приходит в случайный момент между ответами getUpdates
+            await asyncio.sleep(0.01 + (i % 10) * 0.007)
+
+        texts = [f'{mode}-burst-{i}' for i in range(burst)]
+        pushed = time.perf_counter()
+        for i, text in enumerate(texts):
+            api.push_update(message_update(i + 1, text))
+        await wait_delivered(api, texts)
+        batch = [api.delivered_at[text] - pushed for text in texts]
+
+        rejected = None
+        if mode == 'webhook':
+            api.push_update(message_update(1, 'forged'), secret_token='wrong')
+            await asyncio.sleep(0.5)
+            rejected = api.webhook_statuses[403] == 1 and 'forged' not in api.delivered_at
+    finally:
+        await application.updater.stop()
+        await application.stop()
+        await application.shutdown()
+
+    return {'single': single, 'burst': batch, 'forged_rejected': rejected}
+
+
+def percentile(values, q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+async def run(args):
+    variants = [
+        ('polling', False),
+        ('webhook', False),
+        ('polling', True),
+        ('webhook', True),
+    ]
+    results = {}
+    with FakeBotAPI(latency=args.latency) as api:
+        for mode, concurrent in variants:
+            name = f"{mode} {'per-user' if concurrent else 'sequential'}"
+            results[name] = await measure(api, mode, concurrent, args.updates, args.burst)
+
+    print(f"{args.updates} single updates, burst of {args.burst}, network latency {args.latency * 1000:.0f} ms")
+    print(f"{'variant':<22}{'p50 ms':>10}{'p99 ms':>10}{'burst p50':>12}{'burst max':>12}")
+    for name, result in results.items():
+        single, burst = result['single'], result['burst']
+        print(f"{name:<22}{statistics.median(single) * 1000:>10.1f}{percentile(single, 0.99) * 1000:>10.1f}"
+              f"{statistics.median(burst) * 1000:>12.1f}{max(burst) * 1000:>12.1f}")
+    forged = all(result['forged_rejected'] for result in results.values() if result['forged_rejected'] is not None)
+    print(f"webhook rejected a request with a wrong secret token: {forged}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--updates', type=int, default=50)
+    parser.add_argument('--burst', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=0.05, help='сетевая задержка заглушки, сек')
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+"""Бенчмарк записи оценок после рассылки опроса: устойчивая скорость
+(записей/сек) и задержка подтверждения при многих одновременных пользователях.
+
+    python benchmarks/bench_writes.py --writers 500 --duration 10
+
+Сравнивается коммит на каждый вызов в пуле потоков базы (как было) с
+групповым коммитом GroupCommitWriter при каждом уровне WRITE_DURABILITY.
+Каждый режим - на новой базе; synchronous FULL - fsync на каждый коммит.
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+from database import AsyncDatabase, Database
+from write_queue import GroupCommitWriter
+
+
+class PerCallDatabase(AsyncDatabase):
+    """Старый путь записи: каждый вызов - своя транзакция в пуле потоков базы"""
+
+    async def add_rating(self, *args):
+        await self.run(self.sync.add_rating, *args)
+
+    async def add_feedback(self, *args):
+        await self.run(self.sync.add_feedback, *args)
+
+    async def mark_not_attended(self, *args):
+        await self.run(self.sync.mark_not_attended, *args)
+
+
+# Режимы: (название, synchronous базы, durability писателя или None - коммит на вызов)
+MODES = [
+    ('per-call NORMAL', 'NORMAL', None),
+    ('group normal', 'NORMAL', 'normal'),
+    ('group queued', 'NORMAL', 'queued'),
+    ('per-call FULL', 'FULL', None),
+    ('group full', 'FULL', 'full'),
+]
+
+
+def open_database(path: str, users: int, synchronous: str, durability) -> AsyncDatabase:
+    config.DATABASE_SYNCHRONOUS = synchronous
+    sync = Database(path)
+    conn = sync.get_connection()
+    conn.executemany('INSERT INTO users (user_id) VALUES (?)', [(i,) for i in range(1, users + 1)])
+    conn.commit()
+    conn.close()
+    sync.load_membership()
+    if durability is None:
+        return PerCallDatabase(sync)
+    return AsyncDatabase(sync, writer=GroupCommitWriter(sync, durability=durability))
+
+
+async def writer_loop(db: AsyncDatabase, meeting_id: int, user_id: int, rng: random.Random,
+                      deadline: float, latencies: list):
+    """Один пользователь пишет оценки (иногда отзыв или "не був") до дедлайна"""
+    while time.perf_counter() < deadline:
+        choice = rng.random()
+        started = time.perf_counter()
+        if choice < 0.6:
+            await db.add_rating(meeting_id, user_id, rng.randint(1, 5), rng.randint(1, 5), rng.randint(1, 5), True)
+        elif choice < 0.9:
+            await db.add_feedback(meeting_id, 'Дуже сподобалась тема, дякую!')
+        else:
+            await db.mark_not_attended(meeting_id, user_id)
+        latencies.append(time.perf_counter() - started)
+
+
+async def run_mode(db: AsyncDatabase, args) -> dict:
+    meeting_id = await db.create_meeting()
+    rng = random.Random(args.seed)
+    latencies = []
+    started = time.perf_counter()
+    deadline = started + args.duration
+    await asyncio.gather(*(
+        writer_loop(db, meeting_id, user_id, random.Random(rng.random()), deadline, latencies)
+        for user_id in range(1, args.writers + 1)
+    ))
+    # В режиме queued подтверждение приходит до коммита - ждем, пока очередь запишется
+    await asyncio.get_running_loop().run_in_executor(None, db.close)
+    elapsed = time.perf_counter() - started
+
+    check = Database(db.sync.db_name)
+    conn = check.get_connection()
+    saved = conn.execute('SELECT (SELECT COUNT(*) FROM ratings) + (SELECT COUNT(*) FROM feedback)').fetchone()[0]
+    conn.close()
+    mismatched = check.verify_aggregates()
+    check.close()
+    latencies.sort()
+    return {
+        'writes': len(latencies),
+        'seconds': elapsed,
+        'saved': saved,
+        'aggregates_ok': not mismatched,
+        'p50_ms': statistics.median(latencies) * 1000,
+        'p99_ms': latencies[int(len(latencies) * 0.99) - 1] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--writers', type=int, default=500, help='одновременных пользователей')
+    parser.add_argument('--duration', type=float, default=10, help='секунд на режим')
+    parser.add_argument('--modes', default=','.join(name for name, _, _ in MODES),
+                        help='режимы через запятую')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    selected = [mode for mode in MODES if mode[0] in args.modes.split(',')]
+    print(f"{args.writers} writers, {args.duration:.0f}s per mode, "
+          f"batch <= {config.WRITE_QUEUE_MAX_BATCH}, delay {config.WRITE_QUEUE_MAX_DELAY * 1000:.0f} ms")
+    print(f"{'mode':<18}{'writes':>9}{'writes/s':>11}{'p50 ms':>9}{'p99 ms':>9}  check")
+    for name, synchronous, durability in selected:
+        with tempfile.TemporaryDirectory() as tmp:
+            db = open_database(os.path.join(tmp, 'writes.db'), args.writers, synchronous, durability)
+            r = asyncio.run(run_mode(db, args))
+        if r['saved'] != r['writes']:
+            check = f"SAVED {r['saved']}"
+        elif not r['aggregates_ok']:
+            check = 'AGGREGATES DIFFER'
+        else:
+            check = 'ok'
+        print(f"{name:<18}{r['writes']:>9}{r['writes'] / r['seconds']:>11.0f}"
+              f"{r['p50_ms']:>9.2f}{r['p99_ms']:>9.2f}  {check}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+"""Генератор синтетических данных для бенчмарков: пользователи, закрытые
+встречи, оценки и отзывы. Одинаковый --seed дает одинаковую базу.
+
+    python benchmarks/datagen.py --db /tmp/synthetic.db --users 50000 --meetings 2000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import Database, to_epoch
+
+FEEDBACK_TEXTS = [
+    'Дуже сподобалась тема зустрічі, дякую!',
+    'Було б добре більше часу на обговорення.',
+    'Цікаво, але трохи затягнуто.',
+    'Хочеться більше практичних прикладів.',
+    'Класна атмосфера і музика!',
+]
+
+# Темы, которые дописываются к отзывам, чтобы поиск (/search) находил разное
+# количество совпадений, а не каждый пятый отзыв
+FEEDBACK_TOPICS = [
+    'молитва', 'прощення', 'дружба', 'служіння', 'вдячність', 'надія', 'віра', 'покликання',
+    'родина', 'навчання', 'страх', 'радість', 'спокуса', 'лідерство', 'місія', 'поклоніння',
+    'терпіння', 'смирення', 'щедрість', 'мудрість', 'самотність', 'стосунки', 'робота', 'час',
+]
+
+
+def generate(db: Database, users: int, meetings: int, ratings_per_meeting: int = 40,
+             days: int = 730, attendance: float = 0.9, feedback_ratio: float = 0.2,
+             seed: int = 42) -> dict:
+    """Заполняет пустую базу и возвращает количество созданных строк.
+
+    Встречи распределены равномерно за последние `days` дней и все закрыты;
+    на каждую встречу оценку оставляют `ratings_per_meeting` случайных
+    пользователей (у остальных нет строки в user_responses).
+    """
+    rng = random.Random(seed)
+    now = datetime.now().replace(microsecond=0)
+    conn = db.get_connection()
+
+    with conn:
+        joined = now - timedelta(days=days)
+        conn.executemany(
+            'INSERT INTO users (user_id, username, first_name, last_name, joined_date, joined_ts) '
+            'VALUES (?, ?, ?, ?, ?, ?)',
+            ((user_id, f'user{user_id}', f'Name{user_id}', 'Surname', joined.isoformat(), to_epoch(joined))
+             for user_id in range(1, users + 1))
+        )
+
+        step = timedelta(days=days) / max(meetings, 1)
+        ratings = feedback = 0
+        for index in range(meetings):
+            start_date = now - timedelta(days=days) + step * index
+            deadline_date = start_date + timedelta(hours=18)
+            cursor = conn.execute(
+                'INSERT INTO youth_meetings (start_date, deadline_date, start_ts, deadline_ts, is_active) '
+                'VALUES (?, ?, ?, ?, 0)',
+                (start_date.isoformat(), deadline_date.isoformat(), to_epoch(start_date), to_epoch(deadline_date))
+            )
+            meeting_id = cursor.lastrowid
+
+            raters = rng.sample(range(1, users + 1), min(ratings_per_meeting, users))
+            rating_rows, feedback_rows = [], []
+            for user_id in raters:
+                rated = start_date + timedelta(minutes=rng.randrange(18 * 60))
+                rating_date, rating_ts = rated.isoformat(), to_epoch(rated)
+                if rng.random() < attendance:
+                    rating_rows.append((meeting_id, rng.randint(1, 5), rng.randint(1, 5), rng.randint(1, 5), 1,
+                                        rating_date, rating_ts))
+                    if rng.random() < feedback_ratio:
+                        text = f"{rng.choice(FEEDBACK_TEXTS)} Тема: {rng.choice(FEEDBACK_TOPICS)}"
+                        if rng.random() < 0.3:
+                            text += f", {rng.choice(FEEDBACK_TOPICS)}"
+                        feedback_rows.append((meeting_id, text, rating_date, rating_ts))
+                else:
+                    rating_rows.append((meeting_id, 0, 0, 0, 0, rating_date, rating_ts))
+            conn.executemany(
+                '''INSERT INTO ratings
+                   (meeting_id, interest_rating, relevance_rating, spiritual_growth_rating, attended,
+                    rating_date, rating_ts)
+                   VALUES (?, ?, ?, ?, ?, ?, ?)''',
+                rating_rows
+            )
+            conn.executemany(
+                'INSERT INTO feedback (meeting_id, feedback_text, feedback_date, feedback_ts) VALUES (?, ?, ?, ?)',
+                feedback_rows
+            )
+            conn.executemany(
+                'INSERT INTO user_responses (meeting_id, user_id, has_responded, reminded) VALUES (?, ?, 1, 0)',
+                [(meeting_id, user_id) for user_id in raters]
+            )
+            ratings += len(rating_rows)
+            feedback += len(feedback_rows)
+
+    conn.close()
+    db.rebuild_aggregates()
+    db.load_membership()
+    return {'users': users, 'meetings': meetings, 'ratings': ratings, 'feedback': feedback}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--db', required=True, help='путь к новой базе')
+    parser.add_argument('--users', type=int, default=50000)
+    parser.add_argument('--meetings', type=int, default=2000)
+    parser.add_argument('--ratings-per-meeting', type=int, default=40)
+    parser.add_argument('--days', type=int, default=730)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    if os.path.exists(args.db):
+        parser.error(f"{args.db} already exists")
+
+    started = time.perf_counter()
+    db = Database(args.db)
+    counts = generate(db, args.users, args.meetings, args.ratings_per_meeting, args.days, seed=args.seed)
+    db.close()
+    print(f"Generated {counts} in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,287 @@
+"""Локальная заглушка Telegram Bot API для бенчмарков.
+
+Сервер работает в отдельном потоке со своим event loop, понимает
+form-urlencoded и multipart запросы, которые шлёт python-telegram-bot,
+эмулирует сетевую задержку и (опционально) flood-лимит с ответом 429.
+
+Входящие апдейты добавляются через push_update(): если бот установил webhook,
+заглушка отправляет их POST запросом на его адрес (с секретом в заголовке),
+иначе отдает их в ответ на getUpdates (long polling).
+"""
+import asyncio
+import itertools
+import json
+import threading
+import time
+from collections import Counter, deque
+from email.parser import BytesParser
+from email.policy import HTTP
+from typing import Optional
+from urllib.parse import parse_qsl, urlsplit
+
+BOT_USER = {
+    'id': 1000000,
+    'is_bot': True,
+    'first_name': 'FakeBot',
+    'username': 'fake_bot',
+}
+
+
+class FakeBotAPI:
+    """Минимальный HTTP-сервер, отвечающий как api.telegram.org"""
+
+    def __init__(self, latency: float = 0.15, rate_limit: Optional[int] = None,
+                 host: str = '127.0.0.1', port: int = 0):
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.host = host
+        self.port = port
+        self.calls = Counter()
+        self.messages = []
+        self.flood_errors = 0
+        self._message_ids = itertools.count(1)
+        self._file_ids = itertools.count(1)
+        self._window = deque()
+        self.webhook = None
+        self.webhook_statuses = Counter()
+        self.delivered_at = {}
+        # on_request(method, params, timestamp) вызывается в потоке сервера при каждом запросе бота
+        self.on_request = None
+        self._updates = []
+        self._update_ids = itertools.count(1)
+        self._new_update = None
+        self._pushes = set()
+        self._loop = None
+        self._server = None
+        self._thread = None
+        self._ready = threading.Event()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}/bot"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='fake-bot-api', daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        return self
+
+    def stop(self):
+        if self._loop:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=5)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def reset(self):
+        self.calls.clear()
+        self.messages.clear()
+        self.flood_errors = 0
+        self._window.clear()
+        self.webhook_statuses.clear()
+        self.delivered_at.clear()
+
+    def push_update(self, update: dict, secret_token: Optional[str] = None):
+        """Новый апдейт от "Telegram" (update_id проставляется здесь).
+        secret_token подменяет секрет webhook - для проверки, что бот отклоняет чужие запросы"""
+        update = dict(update, update_id=next(self._update_ids))
+        self._loop.call_soon_threadsafe(self._start_push, update, secret_token)
+
+    def _start_push(self, update: dict, secret_token: Optional[str]):
+        task = self._loop.create_task(self._push(update, secret_token))
+        self._pushes.add(task)
+        task.add_done_callback(self._pushes.discard)
+
+    async def _push(self, update: dict, secret_token: Optional[str]):
+        if self.webhook is None:
+            self._updates.append(update)
+            self._new_update.set()
+            return
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        url = urlsplit(self.webhook['url'])
+        secret = self.webhook.get('secret_token') if secret_token is None else secret_token
+        body = json.dumps(update).encode()
+        reader, writer = await asyncio.open_connection(url.hostname, url.port)
+        try:
+            headers = (
+                f"POST {url.path} HTTP/1.1\r\n"
+                f"Host: {url.netloc}\r\n"
+                f"Content-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: close\r\n"
+            )
+            if secret:
+                headers += f"X-Telegram-Bot-Api-Secret-Token: {secret}\r\n"
+            writer.write(headers.encode() + b"\r\n" + body)
+            await writer.drain()
+            status_line = await reader.readline()
+            self.webhook_statuses[int(status_line.split()[1])] += 1
+        finally:
+            writer.close()
+
+    # === Сервер ===
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._new_update = asyncio.Event()
+        self._server = self._loop.run_until_complete(
+            asyncio.start_server(self._handle_connection, self.host, self.port, backlog=1024)
+        )
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._ready.set()
+        try:
+            self._loop.run_forever()
+        finally:
+            self._server.close()
+            tasks = asyncio.all_tasks(self._loop)
+            for task in tasks:
+                task.cancel()
+            self._loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            self._loop.close()
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                _, path, _ = request_line.decode('latin-1').split(' ', 2)
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                body = b''
+                length = int(headers.get('content-length', 0))
+                if length:
+                    body = await reader.readexactly(length)
+
+                status, payload = await self._dispatch(path, headers, body)
+                data = json.dumps(payload).encode()
+                writer.write(
+                    f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n"
+                    f"Content-Type: application/json\r\n"
+                    f"Content-Length: {len(data)}\r\n"
+                    f"Connection: keep-alive\r\n\r\n".encode() + data
+                )
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+    async def _dispatch(self, path: str, headers: dict, body: bytes):
+        method = path.rstrip('/').rsplit('/', 1)[-1]
+        params = self._parse_body(headers.get('content-type', ''), body)
+        self.calls[method] += 1
+        if self.on_request:
+            self.on_request(method, params, time.perf_counter())
+
+        # Long polling: задержка сети - после того, как апдейты появились
+        if self.latency and method != 'getUpdates':
+            await asyncio.sleep(self.latency)
+
+        if self.rate_limit and method.startswith('send'):
+            now = time.monotonic()
+            while self._window and now - self._window[0] > 1.0:
+                self._window.popleft()
+            if len(self._window) >= self.rate_limit:
+                self.flood_errors += 1
+                return 429, {
+                    'ok': False,
+                    'error_code': 429,
+                    'description': 'Too Many Requests: retry after 1',
+                    'parameters': {'retry_after': 1},
+                }
+            self._window.append(now)
+
+        handler = getattr(self, f'_api_{method}', None)
+        result = handler(params) if handler else True
+        if asyncio.iscoroutine(result):
+            result = await result
+        return 200, {'ok': True, 'result': result}
+
+    @staticmethod
+    def _parse_body(content_type: str, body: bytes) -> dict:
+        if not body:
+            return {}
+        if content_type.startswith('multipart/'):
+            message = BytesParser(policy=HTTP).parsebytes(
+                b'Content-Type: ' + content_type.encode() + b'\r\n\r\n' + body
+            )
+            params = {}
+            for part in message.iter_parts():
+                name = part.get_param('name', header='content-disposition')
+                if name and not part.get_filename():
+                    params[name] = part.get_content()
+            return params
+        if content_type.startswith('application/json'):
+            return json.loads(body)
+        return dict(parse_qsl(body.decode()))
+
+    # === Методы Bot API ===
+
+    def _message(self, params: dict, **extra) -> dict:
+        chat_id = int(params.get('chat_id', 0))
+        message = {
+            'message_id': next(self._message_ids),
+            'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'private'},
+            'from': BOT_USER,
+        }
+        message.update(extra)
+        return message
+
+    def _api_getMe(self, params):
+        return BOT_USER
+
+    def _api_sendMessage(self, params):
+        self.messages.append((int(params.get('chat_id', 0)), params.get('text', '')))
+        self.delivered_at[params.get('text', '')] = time.perf_counter()
+        return self._message(params, text=params.get('text', ''))
+
+    def _api_editMessageText(self, params):
+        if 'inline_message_id' in params:
+            return True
+        return self._message(params, text=params.get('text', ''))
+
+    def _api_sendPhoto(self, params):
+        file_id = f"photo-{next(self._file_ids)}"
+        return self._message(params, photo=[{
+            'file_id': file_id, 'file_unique_id': file_id, 'width': 1, 'height': 1,
+        }])
+
+    def _api_sendDocument(self, params):
+        file_id = f"doc-{next(self._file_ids)}"
+        return self._message(params, document={'file_id': file_id, 'file_unique_id': file_id})
+
+    async def _api_getUpdates(self, params):
+        offset = int(params.get('offset', 0))
+        self._updates = [update for update in self._updates if update['update_id'] >= offset]
+        if not self._updates:
+            self._new_update.clear()
+            try:
+                await asyncio.wait_for(self._new_update.wait(), float(params.get('timeout', 0)))
+            except asyncio.TimeoutError:
+                pass
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self._updates[:int(params.get('limit', 100))]
+
+    def _api_setWebhook(self, params):
+        self.webhook = {'url': params['url'], 'secret_token': params.get('secret_token')}
+        return True
+
+    def _api_deleteWebhook(self, params):
+        self.webhook = None
+        return True
@@ -0,0 +1,223 @@
+"""Нагрузочный тест бота: много пользователей одновременно проходят оценку
+(rating_conv_handler) через локальную заглушку Bot API.
+
+    python benchmarks/loadtest.py --users 5000 --ramp 60 --latency 0.05
+
+Бот собирается так же, как в bot.py (build_application, SQLitePersistence,
+PerUserUpdateProcessor), на временной базе, и получает апдейты long polling'ом
+из заглушки. Каждый пользователь нажимает "Оцінити", ставит три оценки и
+пропускает отзыв или пишет его. Задержка шага - от появления апдейта до
+ответа бота (editMessageText/sendMessage) в заглушке.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_bot_api import FakeBotAPI
+
+# Ответы бота, которые означают, что шаг завершился ошибкой
+ERROR_REPLIES = ('Сталася помилка', 'немає доступу')
+
+
+def callback_update(user_id: int, data: str, query_ids=iter(range(1, 10 ** 9))) -> dict:
+    return {'callback_query': {
+        'id': str(next(query_ids)),
+        'chat_instance': str(user_id),
+        'from': {'id': user_id, 'is_bot': False, 'first_name': 'User'},
+        'data': data,
+        'message': {
+            'message_id': 1,
+            'date': int(time.time()),
+            'chat': {'id': user_id, 'type': 'private'},
+            'text': 'survey',
+        },
+    }}
+
+
+def text_update(user_id: int, text: str) -> dict:
+    return {'message': {
+        'message_id': 2,
+        'date': int(time.time()),
+        'chat': {'id': user_id, 'type': 'private'},
+        'from': {'id': user_id, 'is_bot': False, 'first_name': 'User'},
+        'text': text,
+    }}
+
+
+class Driver:
+    """Отправляет апдейты в заглушку и ждет ответ бота в тот же чат"""
+
+    def __init__(self, api: FakeBotAPI, timeout: float):
+        self.api = api
+        self.timeout = timeout
+        self.loop = asyncio.get_running_loop()
+        self.latencies = defaultdict(list)
+        self.outcomes = Counter()
+        self._waiters = {}
+        api.on_request = self._on_request
+
+    def _on_request(self, method: str, params: dict, timestamp: float):
+        # Поток заглушки: передаем ответ в event loop драйвера
+        if method in ('editMessageText', 'sendMessage'):
+            self.loop.call_soon_threadsafe(
+                self._resolve, int(params.get('chat_id', 0)), params.get('text', ''), timestamp
+            )
+
+    def _resolve(self, chat_id: int, text: str, timestamp: float):
+        waiter = self._waiters.pop(chat_id, None)
+        if waiter and not waiter.done():
+            waiter.set_result((timestamp, text))
+
+    async def step(self, name: str, user_id: int, update: dict) -> bool:
+        waiter = self.loop.create_future()
+        self._waiters[user_id] = waiter
+        pushed = time.perf_counter()
+        self.api.push_update(update)
+        try:
+            answered, text = await asyncio.wait_for(waiter, self.timeout)
+        except asyncio.TimeoutError:
+            self._waiters.pop(user_id, None)
+            self.outcomes['timeout'] += 1
+            return False
+        self.latencies[name].append(answered - pushed)
+        if any(marker in text for marker in ERROR_REPLIES):
+            self.outcomes['error reply'] += 1
+            return False
+        self.outcomes['ok'] += 1
+        return True
+
+
+async def simulate_user(driver: Driver, rng: random.Random, user_id: int, meeting_id: int, args) -> bool:
+    """Один пользователь проходит опрос; True - оценка сохранена"""
+    await asyncio.sleep(rng.uniform(0, args.ramp))
+
+    async def think():
+        await asyncio.sleep(rng.uniform(args.think_min, args.think_max))
+
+    steps = [
+        ('rate', f'rate_{meeting_id}'),
+        ('interest', f'interest_{rng.randint(1, 5)}'),
+        ('relevance', f'relevance_{rng.randint(1, 5)}'),
+        ('spiritual', f'spiritual_{rng.randint(1, 5)}'),
+    ]
+    for name, data in steps:
+        if not await driver.step(name, user_id, callback_update(user_id, data)):
+            return False
+        await think()
+
+    if rng.random() < args.feedback_ratio:
+        if not await driver.step('feedback_yes', user_id, callback_update(user_id, 'feedback_yes')):
+            return False
+        await think()
+        return await driver.step('feedback_text', user_id, text_update(user_id, 'Дуже сподобалась тема, дякую!'))
+    return await driver.step('feedback_no', user_id, callback_update(user_id, 'feedback_no'))
+
+
+def percentile(values, q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+async def run(args, api: FakeBotAPI):
+    import bot
+    import charts
+    import config
+    from persistence import SQLitePersistence
+
+    # Пользователи и активный опрос
+    conn = bot.db.sync.get_connection()
+    conn.executemany('INSERT INTO users (user_id) VALUES (?)', [(i,) for i in range(1, args.users + 1)])
+    conn.commit()
+    conn.close()
+    bot.db.sync.load_membership()
+    meeting_id = await bot.db.create_meeting()
+
+    application = bot.build_application(SQLitePersistence(bot.db))
+    handler_errors = Counter()
+
+    async def on_error(update, context):
+        handler_errors[type(context.error).__name__] += 1
+
+    application.add_error_handler(on_error)
+
+    await application.initialize()
+    await bot.post_init(application)
+    await application.start()
+    await application.updater.start_polling(poll_interval=0, timeout=config.POLLING_TIMEOUT)
+
+    driver = Driver(api, args.timeout)
+    rng = random.Random(args.seed)
+    started = time.perf_counter()
+    cpu_started = time.process_time()
+    try:
+        completed = await asyncio.gather(*(
+            simulate_user(driver, random.Random(rng.random()), user_id, meeting_id, args)
+            for user_id in range(1, args.users + 1)
+        ))
+    finally:
+        elapsed = time.perf_counter() - started
+        cpu = time.process_time() - cpu_started
+        await application.updater.stop()
+        await application.stop()
+        await bot.post_shutdown(application)
+        await application.shutdown()
+        charts.shutdown()
+
+    stats = await bot.db.get_meeting_stats(meeting_id)
+    lag = bot.loop_monitor.summary()
+    bot.db.close()
+
+    steps = sum(driver.outcomes.values())
+    failed = steps - driver.outcomes['ok']
+    all_latencies = [value for values in driver.latencies.values() for value in values]
+
+    print(f"{args.users} users, ramp {args.ramp:.0f}s, API latency {args.latency * 1000:.0f} ms, "
+          f"finished in {elapsed:.1f}s")
+    print(f"{'step':<16}{'count':>8}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for name, values in list(driver.latencies.items()) + [('all', all_latencies)]:
+        if values:
+            print(f"{name:<16}{len(values):>8}{statistics.median(values) * 1000:>10.1f}"
+                  f"{percentile(values, 0.99) * 1000:>10.1f}{max(values) * 1000:>10.1f}")
+    print(f"throughput: {steps / elapsed:.1f} handler calls/s, {sum(completed) / elapsed:.1f} ratings/s")
+    print(f"errors: {failed}/{steps} steps ({failed / steps * 100 if steps else 0:.2f}%) "
+          f"{dict(driver.outcomes)}, handler exceptions {dict(handler_errors)}")
+    print(f"ratings saved: {stats['total_attended']} of {sum(completed)} completed flows")
+    # Заглушка работает в том же процессе: около 100% - упираемся в CPU машины, а не в бота
+    print(f"process CPU: {cpu:.1f}s of {elapsed:.1f}s wall ({cpu / elapsed * 100:.0f}% of one core)")
+    print(f"event loop lag: mean {lag['mean']:.1f} ms, p99 {lag['p99']:.1f} ms, max {lag['max']:.1f} ms")
+    return 0 if failed == 0 and stats['total_attended'] == sum(completed) else 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=5000)
+    parser.add_argument('--ramp', type=float, default=60, help='за сколько секунд все пользователи начинают')
+    parser.add_argument('--think-min', type=float, default=0.5, help='пауза между нажатиями, сек')
+    parser.add_argument('--think-max', type=float, default=2.0)
+    parser.add_argument('--feedback-ratio', type=float, default=0.3)
+    parser.add_argument('--latency', type=float, default=0.05, help='сетевая задержка заглушки, сек')
+    parser.add_argument('--timeout', type=float, default=30, help='сколько ждать ответ на шаг, сек')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    with tempfile.TemporaryDirectory() as tmp, FakeBotAPI(latency=args.latency) as api:
+        # bot.py читает настройки при импорте
+        os.environ['DATABASE_NAME'] = os.path.join(tmp, 'loadtest.db')
+        os.environ['BOT_API_BASE_URL'] = api.base_url
+        os.environ['BOT_TOKEN'] = '123:fake'
+        code = asyncio.run(run(args, api))
+    sys.exit(code)
+
+
+if __name__ == '__main__':
+    main()
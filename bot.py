@@ -1,6 +1,15 @@
+import time
+from monitoring import StartupTimer
+startup_timer = StartupTimer()
+
+import html
+import importlib.util
 import logging
-import os
+import re
+import secrets
+import sys
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.error import BadRequest
 from telegram.ext import (
     Application,
     CommandHandler,
@@ -8,18 +17,24 @@ from telegram.ext import (
     MessageHandler,
     ConversationHandler,
     ContextTypes,
-    PicklePersistence,
     filters
 )
 from datetime import datetime, timedelta
 import asyncio
-import matplotlib
-matplotlib.use('Agg')  # Для работы на сервере без GUI
-import matplotlib.pyplot as plt
-import io
 
 import config
-from database import Database
+from database import Database, AsyncDatabase, MATCH_START, MATCH_END
+from broadcast import Broadcaster, queued_messages
+from monitoring import LoopLagMonitor
+import metrics
+from instrumentation import InstrumentedRequest, instrument_handlers
+import charts
+from excel_export import build_excel_export
+from backup import BackupManager
+from update_processor import PerUserUpdateProcessor
+from persistence import SQLitePersistence
+
+startup_timer.mark('imports')
 
 # Настройка логирования
 logging.basicConfig(
@@ -31,8 +46,21 @@ logger = logging.getLogger(__name__)
 # Состояния для ConversationHandler
 WAITING_FOR_INTEREST, WAITING_FOR_RELEVANCE, WAITING_FOR_SPIRITUAL, WAITING_FOR_FEEDBACK = range(4)
 
-# Инициализация базы данных
-db = Database()
+# Инициализация базы данных (запросы выполняются вне event loop)
+db = AsyncDatabase(Database())
+startup_timer.mark('database')
+
+# Снимки базы для /export_db и автобекапа
+backups = BackupManager(db.sync)
+
+# Готовые графики /graph (сбрасываются при закрытии опроса)
+chart_cache = charts.ChartCache()
+
+# Задержка event loop (показывает, не блокирует ли что-то обработку апдейтов)
+loop_monitor = LoopLagMonitor()
+
+# Локальный endpoint для Prometheus (сводка для админа - /metrics)
+metrics_server = metrics.MetricsServer(metrics.registry)
 
 # user_ratings теперь хранится в context.user_data['rating'] для persistence
 
@@ -43,18 +71,18 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = user.id
     
     # Проверяем статус пользователя
-    if db.is_user_approved(user_id):
+    if await db.is_user_approved(user_id):
         await update.message.reply_text(
             f"Привіт, {user.first_name}! Ти вже затверджений і можеш користуватися ботом.\n\n"
             "Після кожної молодіжки тобі прийде опитування для оцінки зустрічі."
         )
-    elif db.is_user_pending(user_id):
+    elif await db.is_user_pending(user_id):
         await update.message.reply_text(
             "Твій запит вже відправлено адміністратору. Очікуй затвердження!"
         )
     else:
         # Добавляем в очередь на одобрение
-        db.add_pending_user(
+        await db.add_pending_user(
             user_id=user_id,
             username=user.username or "",
             first_name=user.first_name or "",
@@ -79,73 +107,213 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
             logger.error(f"Error notifying admin: {e}")
 
 
-async def admin_pending(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Показывает список пользователей ожидающих одобрения (только для админа)"""
+# Постраничные списки /pending и /remove: одно сообщение, которое
+# редактируется на месте. callback_data: members_<список>_<действие>_<аргумент>
+MEMBER_VIEWS = {
+    'pending': {
+        'title': "⏳ Запити на доступ",
+        'empty': "Немає користувачів, що очікують затвердження.",
+        'actions': [('approve', "✅ Затвердити"), ('reject', "❌ Відхилити")],
+    },
+    'approved': {
+        'title': "👥 Затверджені користувачі",
+        'empty': "Немає користувачів для видалення (крім тебе).",
+        'actions': [('remove', "🗑 Видалити")],
+    },
+}
+SELECTED_MARK = "☑️"
+UNSELECTED_MARK = "▫️"
+
+
+def format_member(kind: str, number: int, user: tuple) -> str:
+    user_id, username, first_name, last_name = user[:4]
+    line = f"{number}. {first_name} {last_name or ''}".rstrip()
+    line += f" (@{username or 'не вказано'}, ID {user_id})"
+    if kind == 'pending':
+        line += f" — {user[4][:16]}"
+    return line
+
+
+def render_members_page(kind: str, page: dict, selected=frozenset(), notice: str = ""):
+    """Текст и клавиатура страницы: выбор пользователей, действия над выбранными, навигация"""
+    view = MEMBER_VIEWS[kind]
+    if not page['users']:
+        return (notice + "\n\n" if notice else "") + view['empty'], None
+    
+    lines = [f"{view['title']}: {page['total']}", ""]
+    keyboard = []
+    for number, user in enumerate(page['users'], 1):
+        lines.append(format_member(kind, number, user))
+        mark = SELECTED_MARK if user[0] in selected else UNSELECTED_MARK
+        keyboard.append([InlineKeyboardButton(
+            f"{mark} {number}. {user[2]} {user[3] or ''}".rstrip(),
+            callback_data=f"members_{kind}_toggle_{user[0]}"
+        )])
+    if notice:
+        lines = [notice, ""] + lines
+    
+    keyboard.append([InlineKeyboardButton("☑️ Вибрати всіх на сторінці", callback_data=f"members_{kind}_all_0")])
+    keyboard.append([
+        InlineKeyboardButton(label, callback_data=f"members_{kind}_do_{action}")
+        for action, label in view['actions']
+    ])
+    
+    # "Обновить" хранит начало страницы: после пользователя prev_id (0 - первая страница)
+    navigation = []
+    if page['prev_id'] is not None:
+        navigation.append(InlineKeyboardButton("◀️", callback_data=f"members_{kind}_prev_{page['users'][0][0]}"))
+    navigation.append(InlineKeyboardButton("🔄", callback_data=f"members_{kind}_after_{page['prev_id'] or 0}"))
+    if page['has_next']:
+        navigation.append(InlineKeyboardButton("▶️", callback_data=f"members_{kind}_after_{page['users'][-1][0]}"))
+    keyboard.append(navigation)
+    return "\n".join(lines), InlineKeyboardMarkup(keyboard)
+
+
+def selected_members(markup: InlineKeyboardMarkup) -> set:
+    """Выбранные на странице пользователи - отмечены прямо в клавиатуре сообщения"""
+    selected = set()
+    for row in markup.inline_keyboard:
+        for button in row:
+            if button.callback_data and '_toggle_' in button.callback_data and button.text.startswith(SELECTED_MARK):
+                selected.add(int(button.callback_data.rsplit('_', 1)[1]))
+    return selected
+
+
+async def get_members_page(kind: str, **anchor) -> dict:
+    # Админ не может удалить сам себя
+    exclude_id = config.ADMIN_ID if kind == 'approved' else 0
+    return await db.get_members_page(kind, exclude_id=exclude_id, **anchor)
+
+
+async def send_members_page(update: Update, kind: str):
     if update.effective_user.id != config.ADMIN_ID:
         await update.message.reply_text("У тебе немає доступу до цієї команди.")
         return
     
-    pending_users = db.get_pending_users()
-    
-    if not pending_users:
-        await update.message.reply_text("Немає користувачів, що очікують затвердження.")
-        return
-    
-    for user in pending_users:
-        user_id, username, first_name, last_name, request_date = user
-        keyboard = [
-            [
-                InlineKeyboardButton("✅ Затвердити", callback_data=f"approve_{user_id}"),
-                InlineKeyboardButton("❌ Відхилити", callback_data=f"reject_{user_id}")
-            ]
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        
-        await update.message.reply_text(
-            f"👤 Запит:\n"
-            f"Ім'я: {first_name} {last_name or ''}\n"
-            f"Username: @{username or 'не вказано'}\n"
-            f"ID: {user_id}\n"
-            f"Дата запиту: {request_date[:16]}",
-            reply_markup=reply_markup
-        )
+    text, reply_markup = render_members_page(kind, await get_members_page(kind))
+    await update.message.reply_text(text, reply_markup=reply_markup)
+
+
+async def admin_pending(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Показывает запросы на доступ постранично (только для админа)"""
+    await send_members_page(update, 'pending')
 
 
 async def admin_remove(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Показывает список одобренных пользователей для удаления (только для админа)"""
-    if update.effective_user.id != config.ADMIN_ID:
-        await update.message.reply_text("У тебе немає доступу до цієї команди.")
-        return
-    
-    approved_users = db.get_all_approved_users_info()
+    """Показывает одобренных пользователей постранично для удаления (только для админа)"""
+    await send_members_page(update, 'approved')
+
+
+async def notify_members(bot, action: str, user_ids: list):
+    """Уведомляет пользователей о решении админа (в фоне, с учетом flood-лимитов)"""
+    if action == 'approve':
+        await Broadcaster(bot).broadcast(
+            user_ids,
+            text="🎉 Твій запит затверджено! Тепер ти будеш отримувати опитування після молодіжних зустрічей."
+        )
+        # Новым участникам сразу отправляем активное опитування
+        active_meeting = await db.get_active_meeting()
+        if active_meeting:
+            result = await Broadcaster(bot).broadcast(
+                user_ids,
+                text="🙏 Привіт! Будь ласка, оціни минулу молодіжку.\n\n"
+                     f"У тебе є {config.RATING_DEADLINE_HOURS} годин на оцінку.\n"
+                     "За годину до закінчення прийде нагадування.",
+                reply_markup=survey_keyboard(active_meeting)
+            )
+            for user_id in result.delivered:
+                await db.register_user_for_meeting(active_meeting, user_id)
+            logger.info(f"Sent active survey {active_meeting} to {len(result.delivered)} newly approved users")
+    elif action == 'reject':
+        await Broadcaster(bot).broadcast(user_ids, text="На жаль, твій запит на доступ було відхилено.")
+    elif action == 'remove':
+        await Broadcaster(bot).broadcast(
+            user_ids,
+            text="Тебе було видалено зі списку учасників бота. Ти більше не будеш отримувати опитування."
+        )
+
+
+async def handle_members_page(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Кнопки постраничных списков: навигация, выбор и действия над выбранными.
     
-    if not approved_users:
-        await update.message.reply_text("Немає затверджених користувачів.")
+    Каждое нажатие - ответ на callback и одно редактирование сообщения,
+    сколько бы пользователей ни было в списке.
+    """
+    query = update.callback_query
+    if query.from_user.id != config.ADMIN_ID:
+        await query.answer("У тебе немає доступу до цієї дії.")
         return
     
-    # Фильтруем админа из списка
-    approved_users = [u for u in approved_users if u[0] != config.ADMIN_ID]
-    
-    if not approved_users:
-        await update.message.reply_text("Немає користувачів для видалення (крім тебе).")
+    _, kind, operation, argument = query.data.split('_', 3)
+    markup = query.message.reply_markup
+    selected = selected_members(markup) if markup else set()
+    
+    if operation == 'toggle':
+        user_id = int(argument)
+        selected ^= {user_id}
+    elif operation == 'all':
+        page_ids = {
+            int(button.callback_data.rsplit('_', 1)[1])
+            for row in markup.inline_keyboard for button in row
+            if button.callback_data and '_toggle_' in button.callback_data
+        }
+        # Повторное нажатие снимает выбор со всех
+        selected = set() if page_ids <= selected else page_ids
+    
+    if operation in ('toggle', 'all'):
+        await query.answer()
+        # Клавиатура перестраивается без запроса к базе
+        keyboard = []
+        for row in markup.inline_keyboard:
+            new_row = []
+            for button in row:
+                if button.callback_data and '_toggle_' in button.callback_data:
+                    user_id = int(button.callback_data.rsplit('_', 1)[1])
+                    label = button.text.split(' ', 1)[1]
+                    mark = SELECTED_MARK if user_id in selected else UNSELECTED_MARK
+                    button = InlineKeyboardButton(f"{mark} {label}", callback_data=button.callback_data)
+                new_row.append(button)
+            keyboard.append(new_row)
+        await query.edit_message_reply_markup(InlineKeyboardMarkup(keyboard))
         return
     
-    text = "👥 *Затверджені користувачі:*\n\n"
-    text += "Виберь користувача для видалення:\n\n"
-    
-    for user_id, username, first_name, last_name in approved_users:
-        keyboard = [
-            [InlineKeyboardButton("🗑 Видалити", callback_data=f"remove_{user_id}")]
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        
-        await update.message.reply_text(
-            f"👤 Користувач:\n"
-            f"Ім'я: {first_name} {last_name or ''}\n"
-            f"Username: @{username or 'не вказано'}\n"
-            f"ID: {user_id}",
-            reply_markup=reply_markup
+    notice = ""
+    if operation == 'do':
+        if not selected:
+            await query.answer("Спочатку вибери користувачів.")
+            return
+        action = argument
+        user_ids = sorted(selected)
+        if action == 'approve':
+            done = [user_id for user_id in user_ids if await db.approve_user(user_id)]
+            notice = f"✅ Затверджено: {len(done)}"
+        elif action == 'reject':
+            done = [user_id for user_id in user_ids if await db.reject_user(user_id)]
+            notice = f"❌ Відхилено: {len(done)}"
+        else:
+            done = [user_id for user_id in user_ids if await db.remove_user(user_id)]
+            notice = f"🗑 Видалено: {len(done)}"
+        if done:
+            context.application.create_task(notify_members(context.bot, action, done), update=update)
+        # Остаемся на той же странице: она начинается после того же пользователя
+        refresh = next(
+            button.callback_data for row in markup.inline_keyboard for button in row
+            if button.callback_data and '_after_' in button.callback_data and button.text == "🔄"
         )
+        anchor = {'after_id': int(refresh.rsplit('_', 1)[1]) or None}
+    elif operation == 'prev':
+        anchor = {'before_id': int(argument)}
+    else:
+        anchor = {'after_id': int(argument) or None}
+    
+    await query.answer()
+    text, reply_markup = render_members_page(kind, await get_members_page(kind, **anchor), notice=notice)
+    try:
+        await query.edit_message_text(text, reply_markup=reply_markup)
+    except BadRequest as e:
+        # "Message is not modified" - страница не изменилась (🔄 без изменений)
+        if 'not modified' not in str(e):
+            raise
 
 
 async def handle_approval(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -161,7 +329,7 @@ async def handle_approval(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = int(user_id)
     
     if action == "approve":
-        db.approve_user(user_id)
+        await db.approve_user(user_id)
         await query.edit_message_text(f"✅ Користувача {user_id} затверджено!")
         
         # Уведомляем пользователя
@@ -172,14 +340,10 @@ async def handle_approval(update: Update, context: ContextTypes.DEFAULT_TYPE):
             )
             
             # Проверяем есть ли активное опитування
-            active_meeting = db.get_active_meeting()
+            active_meeting = await db.get_active_meeting()
             if active_meeting:
                 # Отправляем активное опитування новому пользователю
-                keyboard = [
-                    [InlineKeyboardButton("📝 Оцінити", callback_data=f"rate_{active_meeting}")],
-                    [InlineKeyboardButton("❌ Не був на молодіжці", callback_data=f"absent_{active_meeting}")]
-                ]
-                reply_markup = InlineKeyboardMarkup(keyboard)
+                reply_markup = survey_keyboard(active_meeting)
                 
                 await context.bot.send_message(
                     chat_id=user_id,
@@ -190,14 +354,14 @@ async def handle_approval(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 )
                 
                 # Регистрируем пользователя для этой встречи
-                db.register_user_for_meeting(active_meeting, user_id)
+                await db.register_user_for_meeting(active_meeting, user_id)
                 
                 logger.info(f"Sent active survey {active_meeting} to newly approved user {user_id}")
         except Exception as e:
             logger.error(f"Error notifying approved user: {e}")
     
     elif action == "reject":
-        db.reject_user(user_id)
+        await db.reject_user(user_id)
         await query.edit_message_text(f"❌ Запит користувача {user_id} відхилено.")
         
         # Уведомляем пользователя
@@ -210,7 +374,7 @@ async def handle_approval(update: Update, context: ContextTypes.DEFAULT_TYPE):
             logger.error(f"Error notifying rejected user: {e}")
     
     elif action == "remove":
-        if db.remove_user(user_id):
+        if await db.remove_user(user_id):
             await query.edit_message_text(f"🗑 Користувача {user_id} видалено зі списку!")
             
             # Уведомляем пользователя
@@ -232,128 +396,193 @@ async def admin_start_survey(update: Update, context: ContextTypes.DEFAULT_TYPE)
         return
     
     # Проверяем нет ли активного опроса
-    active_meeting = db.get_active_meeting()
+    active_meeting = await db.get_active_meeting()
     if active_meeting:
         await update.message.reply_text(
             "❌ Вже є активне опитування! Спочатку дочекайся його завершення або закрий його командою /close_survey"
         )
         return
     
-    # Создаем новую встречу
-    meeting_id = db.create_meeting()
-    
-    # Рассылаем опрос всем одобренным пользователям
-    approved_users = db.get_all_approved_users()
+    # Рассылаем опрос всем одобренным пользователям. Проверяем их до создания
+    # встречи: иначе осталась бы активная встреча без таймера закрытия
+    approved_users = await db.get_all_approved_users()
     
     if not approved_users:
         await update.message.reply_text("❌ Немає затверджених користувачів для опитування!")
         return
     
-    success_count = 0
-    for user_id in approved_users:
-        if user_id == config.ADMIN_ID:
-            continue  # Не отправляем админу
-        
-        try:
-            keyboard = [
-                [InlineKeyboardButton("📝 Оцінити", callback_data=f"rate_{meeting_id}")],
-                [InlineKeyboardButton("❌ Не був на молодіжці", callback_data=f"absent_{meeting_id}")]
-            ]
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            
-            await context.bot.send_message(
-                chat_id=user_id,
-                text="🙏 Привіт! Будь ласка, оціни минулу молодіжку.\n\n"
-                     f"У тебе є {config.RATING_DEADLINE_HOURS} годин на оцінку.\n"
-                     "За годину до закінчення прийде нагадування.",
-                reply_markup=reply_markup
-            )
-            success_count += 1
-        except Exception as e:
-            logger.error(f"Error sending survey to user {user_id}: {e}")
+    # Создаем новую встречу
+    meeting_id = await db.create_meeting()
     
-    await update.message.reply_text(
-        f"✅ Опитування запущено! ID зустрічі: {meeting_id}\n"
-        f"Відправлено {success_count} користувачам.\n\n"
-        f"Дедлайн: {config.RATING_DEADLINE_HOURS} годин\n"
-        f"Нагадування буде відправлено за {config.REMINDER_BEFORE_DEADLINE_HOURS} годину до кінця."
+    recipients = [user_id for user_id in approved_users if user_id != config.ADMIN_ID]  # Не отправляем админу
+    
+    status_message = await update.message.reply_text(
+        f"⏳ Розсилаю опитування #{meeting_id} ({len(recipients)} користувачів)..."
     )
     
-    # Планируем напоминание и закрытие опроса
-    reminder_time = config.RATING_DEADLINE_HOURS - config.REMINDER_BEFORE_DEADLINE_HOURS
+    # Напоминание и закрытие опроса уже записаны в базу вместе со встречей
+    for event in await db.get_pending_events(meeting_id):
+        schedule_event(context.job_queue, event)
     
-    # Запланируем джобы
-    context.job_queue.run_once(
-        send_reminders,
-        reminder_time * 3600,
-        data={'meeting_id': meeting_id},
-        name=f'reminder_{meeting_id}'
+    # Рассылка идет в фоне, чтобы не блокировать обработку остальных апдейтов
+    context.application.create_task(
+        broadcast_survey(context.bot, status_message, meeting_id, recipients),
+        update=update
     )
+
+
+def survey_keyboard(meeting_id: int) -> InlineKeyboardMarkup:
+    """Кнопки опроса для встречи"""
+    return InlineKeyboardMarkup([
+        [InlineKeyboardButton("📝 Оцінити", callback_data=f"rate_{meeting_id}")],
+        [InlineKeyboardButton("❌ Не був на молодіжці", callback_data=f"absent_{meeting_id}")]
+    ])
+
+
+async def broadcast_survey(bot, status_message, meeting_id: int, recipients: list):
+    """Рассылает опрос и обновляет у админа сообщение с прогрессом"""
+    async def report_progress(result):
+        await status_message.edit_text(
+            f"⏳ Розсилка опитування #{meeting_id}: {result.done}/{result.total} "
+            f"({result.rate:.1f} повідомлень/с)"
+        )
     
-    context.job_queue.run_once(
-        close_survey_job,
-        config.RATING_DEADLINE_HOURS * 3600,
-        data={'meeting_id': meeting_id},
-        name=f'close_{meeting_id}'
+    result = await Broadcaster(bot).broadcast(
+        recipients,
+        on_progress=report_progress,
+        text="🙏 Привіт! Будь ласка, оціни минулу молодіжку.\n\n"
+             f"У тебе є {config.RATING_DEADLINE_HOURS} годин на оцінку.\n"
+             "За годину до закінчення прийде нагадування.",
+        reply_markup=survey_keyboard(meeting_id)
+    )
+    
+    text = (
+        f"✅ Опитування запущено! ID зустрічі: {meeting_id}\n"
+        f"Відправлено {len(result.delivered)} користувачам.\n"
     )
+    if result.failed:
+        text += f"Не вдалося відправити: {len(result.failed)}\n"
+    text += (
+        f"⏱ {result.elapsed:.1f} с ({result.rate:.1f} повідомлень/с)\n\n"
+        f"Дедлайн: {config.RATING_DEADLINE_HOURS} годин\n"
+        f"Нагадування буде відправлено за {config.REMINDER_BEFORE_DEADLINE_HOURS} годину до кінця."
+    )
+    try:
+        await status_message.edit_text(text)
+    except Exception as e:
+        logger.error(f"Error reporting survey broadcast result: {e}")
 
 
 async def send_reminders(context: ContextTypes.DEFAULT_TYPE):
     """Отправляет напоминания тем, кто еще не оценил"""
     meeting_id = context.job.data['meeting_id']
-    users_to_remind = db.get_users_for_reminder(meeting_id)
+    started = time.perf_counter()
+    # Получатели отмечаются заранее одной транзакцией - без повторных напоминаний
+    users_to_remind = [
+        user_id for user_id in await db.claim_reminders(meeting_id)
+        if user_id != config.ADMIN_ID
+    ]
     
-    for user_id in users_to_remind:
-        if user_id == config.ADMIN_ID:
-            continue
-        
-        try:
-            keyboard = [
-                [InlineKeyboardButton("📝 Оцінити", callback_data=f"rate_{meeting_id}")],
-                [InlineKeyboardButton("❌ Не був на молодіжці", callback_data=f"absent_{meeting_id}")]
-            ]
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            
-            await context.bot.send_message(
-                chat_id=user_id,
-                text=f"⏰ Нагадування: у тебе залишилася {config.REMINDER_BEFORE_DEADLINE_HOURS} година щоб оцінити молодіжку!\n\n"
-                     "Будь ласка, не забудь залишити зворотний зв'язок.",
-                reply_markup=reply_markup
-            )
-            db.mark_as_reminded(meeting_id, user_id)
-        except Exception as e:
-            logger.error(f"Error sending reminder to user {user_id}: {e}")
+    result = await Broadcaster(context.bot).broadcast(
+        users_to_remind,
+        text=f"⏰ Нагадування: у тебе залишилася {config.REMINDER_BEFORE_DEADLINE_HOURS} година щоб оцінити молодіжку!\n\n"
+             "Будь ласка, не забудь залишити зворотний зв'язок.",
+        reply_markup=survey_keyboard(meeting_id)
+    )
+    
+    if result.failed:
+        await db.release_reminders(meeting_id, list(result.failed))
+    for user_id, error in result.failed.items():
+        logger.error(f"Error sending reminder to user {user_id}: {error}")
+    logger.info(
+        f"Reminders for meeting {meeting_id}: {len(result.delivered)}/{result.total} delivered, "
+        f"run took {time.perf_counter() - started:.2f}s"
+    )
+    await db.complete_event(context.job.data['event_id'])
 
 
 async def close_survey_job(context: ContextTypes.DEFAULT_TYPE):
     """Автоматически закрывает опрос по истечении времени"""
     meeting_id = context.job.data['meeting_id']
-    db.close_meeting(meeting_id)
+    logger.info(f"Auto-closing expired survey {meeting_id}")
+    await db.close_meeting(meeting_id)
+    chart_cache.invalidate()
     
     # Уведомляем админа
     try:
-        stats = db.get_meeting_stats(meeting_id)
+        stats = await db.get_meeting_stats(meeting_id)
+        
+        text = f"⏰ *Опитування #{meeting_id} автоматично закрито*\n\n"
+        text += f"📊 *Підсумки:*\n"
+        text += f"👥 Відповіли: {stats['total_attended']}\n"
+        text += f"❌ Не було: {stats['not_attended']}\n\n"
+        
+        if stats['total_attended'] > 0:
+            text += f"⭐️ *Середні оцінки:*\n"
+            text += f"• Цікавість: {stats['avg_interest']}/5\n"
+            text += f"• Актуальність: {stats['avg_relevance']}/5\n"
+            text += f"• Духовне зростання: {stats['avg_spiritual_growth']}/5\n\n"
+        
+        text += f"💡 Використай `/stats {meeting_id}` для детальної статистики"
+        
         await context.bot.send_message(
             chat_id=config.ADMIN_ID,
-            text=f"⏱ Опитування #{meeting_id} автоматично закрито.\n\n"
-                 f"Використай /stats {meeting_id} щоб переглянути результати."
+            text=text,
+            parse_mode='Markdown'
         )
     except Exception as e:
         logger.error(f"Error notifying admin about closed survey: {e}")
 
 
+# Обработчики запланированных событий опроса (таблица scheduled_events)
+EVENT_CALLBACKS = {
+    'reminder': send_reminders,
+    'close': close_survey_job,
+}
+
+
+def schedule_event(job_queue, event: dict):
+    """Ставит событие опроса на точный таймер; просроченное выполняется сразу"""
+    delay = max(0.0, (event['run_at'] - datetime.now()).total_seconds())
+    job_queue.run_once(
+        EVENT_CALLBACKS[event['kind']],
+        delay,
+        data={'meeting_id': event['meeting_id'], 'event_id': event['event_id']},
+        name=f"{event['kind']}_{event['meeting_id']}"
+    )
+
+
+async def restore_scheduled_events(application: Application):
+    """Восстанавливает таймеры событий из базы после перезапуска"""
+    events = await db.get_pending_events()
+    now = datetime.now()
+    # Если опрос уже пора закрывать, пропущенное напоминание не нужно
+    closing = {event['meeting_id'] for event in events if event['kind'] == 'close' and event['run_at'] <= now}
+    
+    for event in events:
+        if event['kind'] == 'reminder' and event['meeting_id'] in closing:
+            await db.complete_event(event['event_id'])
+            continue
+        if event['run_at'] <= now:
+            logger.info(f"Running missed {event['kind']} event for meeting {event['meeting_id']}")
+        schedule_event(application.job_queue, event)
+    
+    logger.info(f"Restored {len(events)} scheduled survey events")
+
+
 async def admin_close_survey(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Вручную закрывает активный опрос (только для админа)"""
     if update.effective_user.id != config.ADMIN_ID:
         await update.message.reply_text("У тебе немає доступу до цієї команди.")
         return
     
-    active_meeting = db.get_active_meeting()
+    active_meeting = await db.get_active_meeting()
     if not active_meeting:
         await update.message.reply_text("❌ Немає активного опитування.")
         return
     
-    db.close_meeting(active_meeting)
+    await db.close_meeting(active_meeting)
+    chart_cache.invalidate()
     
     # Отменяем запланированные джобы
     current_jobs = context.job_queue.get_jobs_by_name(f'reminder_{active_meeting}')
@@ -378,7 +607,7 @@ async def handle_rating_button(update: Update, context: ContextTypes.DEFAULT_TYP
     user_id = query.from_user.id
     
     # Проверяем что пользователь одобрен
-    if not db.is_user_approved(user_id):
+    if not await db.is_user_approved(user_id):
         await query.edit_message_text("У тебе немає доступу до цього бота.")
         return
     
@@ -388,7 +617,7 @@ async def handle_rating_button(update: Update, context: ContextTypes.DEFAULT_TYP
     
     if action == "absent":
         # Пользователь не был на встрече
-        db.mark_not_attended(meeting_id, user_id)
+        await db.mark_not_attended(meeting_id, user_id)
         await query.edit_message_text(
             "✅ Дякуємо за відповідь! Сподіваємося побачити тебе на наступній молодіжці! 🙏"
         )
@@ -504,7 +733,7 @@ async def handle_feedback_choice(update: Update, context: ContextTypes.DEFAULT_T
         # Сохраняем оценки без отзыва
         rating_data = context.user_data.get('rating')
         if rating_data:
-            db.add_rating(
+            await db.add_rating(
                 meeting_id=rating_data['meeting_id'],
                 user_id=user_id,
                 interest=rating_data['interest'],
@@ -539,7 +768,7 @@ async def handle_feedback_text(update: Update, context: ContextTypes.DEFAULT_TYP
         return ConversationHandler.END
 
     # Сохраняем оценки
-    db.add_rating(
+    await db.add_rating(
         meeting_id=rating_data['meeting_id'],
         user_id=user_id,
         interest=rating_data['interest'],
@@ -549,7 +778,7 @@ async def handle_feedback_text(update: Update, context: ContextTypes.DEFAULT_TYP
     )
 
     # Сохраняем отзыв
-    db.add_feedback(rating_data['meeting_id'], feedback_text)
+    await db.add_feedback(rating_data['meeting_id'], feedback_text)
 
     context.user_data.pop('rating', None)
 
@@ -574,16 +803,7 @@ async def admin_stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
             return
     else:
         # Если аргумента нет - показываем список всех встреч
-        conn = db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT meeting_id, start_date, is_active 
-            FROM youth_meetings 
-            ORDER BY start_date DESC 
-            LIMIT 10
-        ''')
-        meetings = cursor.fetchall()
-        conn.close()
+        meetings = await db.get_recent_meetings(10)
         
         if not meetings:
             await update.message.reply_text("❌ Ще не було жодної молодіжки.")
@@ -604,7 +824,7 @@ async def admin_stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text(text, parse_mode='Markdown')
         return
     
-    stats = db.get_meeting_stats(meeting_id)
+    stats = await db.get_meeting_stats(meeting_id)
 
     # Формируем текст статистики (основная часть)
     text = f"📊 *Статистика зустрічі #{meeting_id}*\n\n"
@@ -647,8 +867,42 @@ async def admin_stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("💬 Текстових відгуків немає.")
 
 
+def render_ratings_page(meeting_id: int, header: str, rows: list, first_number: int,
+                        has_prev: bool, has_next: bool):
+    """Текст (HTML) и кнопки страницы /ratings.
+    
+    first_number - номер первого участника страницы. Он передается в
+    callback_data вместе с опорной оценкой, поэтому листание не пересчитывает
+    оценки с начала встречи.
+    """
+    text = header + "\n\n"
+    number = first_number
+    for rating_id, interest, relevance, spiritual, attended, rating_date in rows:
+        if attended:
+            text += f"👤 <b>Учасник {number}:</b>\n"
+            text += f"• Цікавість: {interest}/5\n"
+            text += f"• Актуальність: {relevance}/5\n"
+            text += f"• Духовне зростання: {spiritual}/5\n"
+            text += f"<i>Оцінено: {datetime.fromisoformat(rating_date).strftime('%d.%m %H:%M')}</i>\n\n"
+            number += 1
+        else:
+            text += f"❌ <b>Не був присутній</b>\n"
+            text += f"<i>Відмітка: {datetime.fromisoformat(rating_date).strftime('%d.%m %H:%M')}</i>\n\n"
+    
+    navigation = []
+    if has_prev:
+        navigation.append(InlineKeyboardButton(
+            "◀️", callback_data=f"ratings_{meeting_id}_prev_{rows[0][0]}_{first_number}"
+        ))
+    if has_next:
+        navigation.append(InlineKeyboardButton(
+            "▶️", callback_data=f"ratings_{meeting_id}_next_{rows[-1][0]}_{number}"
+        ))
+    return text.rstrip(), InlineKeyboardMarkup([navigation]) if navigation else None
+
+
 async def admin_ratings(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Показывает список всех оценок по встрече в анонимном формате (только для админа)"""
+    """Показывает оценки встречи в анонимном формате постранично (только для админа)"""
     if update.effective_user.id != config.ADMIN_ID:
         await update.message.reply_text("У тебе немає доступу до цієї команди.")
         return
@@ -669,62 +923,149 @@ async def admin_ratings(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("❌ Невірний формат ID зустрічі.")
         return
     
-    # Получаем все оценки по встрече
-    conn = db.get_connection()
-    cursor = conn.cursor()
-    
     # Проверяем существует ли встреча
-    cursor.execute('SELECT meeting_id, start_date FROM youth_meetings WHERE meeting_id = ?', (meeting_id,))
-    meeting = cursor.fetchone()
+    meeting = await db.get_meeting(meeting_id)
     
     if not meeting:
         await update.message.reply_text(f"❌ Зустріч #{meeting_id} не знайдено.")
-        conn.close()
         return
     
-    # Получаем все оценки в порядке их добавления
-    cursor.execute('''
-        SELECT 
-            interest_rating,
-            relevance_rating,
-            spiritual_growth_rating,
-            attended,
-            rating_date
-        FROM ratings
-        WHERE meeting_id = ?
-        ORDER BY rating_date
-    ''', (meeting_id,))
-    
-    ratings = cursor.fetchall()
-    conn.close()
-    
-    if not ratings:
+    # Первая страница оценок в порядке их добавления
+    rows, has_next = await db.get_ratings_page(meeting_id)
+    
+    if not rows:
         await update.message.reply_text(f"❌ Немає оцінок для зустрічі #{meeting_id}.")
         return
     
-    # Формируем текст с анонимными оценками
-    from datetime import datetime
+    attended, not_attended = await db.get_meeting_totals(meeting_id)
     meeting_date = datetime.fromisoformat(meeting[1]).strftime("%d.%m.%Y %H:%M")
+    header = (
+        f"📋 <b>Анонімні оцінки зустрічі #{meeting_id}</b>\n"
+        f"📅 {meeting_date}\n"
+        f"📊 Всього оцінок: {attended}, не були: {not_attended}"
+    )
     
-    text = f"📋 *Анонімні оцінки зустрічі #{meeting_id}*\n"
-    text += f"📅 {meeting_date}\n\n"
+    text, reply_markup = render_ratings_page(meeting_id, header, rows, 1, False, has_next)
+    await update.message.reply_text(text, parse_mode='HTML', reply_markup=reply_markup)
+
+
+async def handle_ratings_page(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Листание /ratings: один запрос к базе и одно редактирование сообщения"""
+    query = update.callback_query
+    if query.from_user.id != config.ADMIN_ID:
+        await query.answer("У тебе немає доступу до цієї дії.")
+        return
+    await query.answer()
     
-    user_num = 1
-    for interest, relevance, spiritual, attended, rating_date in ratings:
-        if attended:
-            text += f"👤 *Учасник {user_num}:*\n"
-            text += f"• Цікавість: {interest}/5\n"
-            text += f"• Актуальність: {relevance}/5\n"
-            text += f"• Духовне зростання: {spiritual}/5\n"
-            text += f"_Оцінено: {datetime.fromisoformat(rating_date).strftime('%d.%m %H:%M')}_\n\n"
-            user_num += 1
-        else:
-            text += f"❌ *Не був присутній*\n"
-            text += f"_Відмітка: {datetime.fromisoformat(rating_date).strftime('%d.%m %H:%M')}_\n\n"
+    _, meeting_id, direction, rating_id, number = query.data.split('_')
+    meeting_id, rating_id, number = int(meeting_id), int(rating_id), int(number)
+    # Заголовок (дата, итоги) берем из самого сообщения - без запросов к базе
+    header = query.message.text_html.split("\n\n", 1)[0]
     
-    text += f"📊 Всього оцінок: {user_num - 1}"
+    if direction == 'next':
+        rows, has_next = await db.get_ratings_page(meeting_id, after_id=rating_id)
+        has_prev = True
+    else:
+        rows, has_prev = await db.get_ratings_page(meeting_id, before_id=rating_id)
+        has_next = True
+        # Номер первого участника предыдущей страницы: минус присутствовавшие на ней
+        number -= sum(1 for row in rows if row[4])
     
-    await update.message.reply_text(text, parse_mode='Markdown')
+    if not rows:
+        return
+    text, reply_markup = render_ratings_page(meeting_id, header, rows, number, has_prev, has_next)
+    await query.edit_message_text(text, parse_mode='HTML', reply_markup=reply_markup)
+
+
+
+def parse_search_args(args: list):
+    """/search слова [ID | ID-ID]: последний аргумент из цифр - диапазон встреч"""
+    first = last = None
+    if len(args) > 1:
+        match = re.fullmatch(r'(\d+)(?:-(\d+))?', args[-1])
+        if match:
+            first = int(match.group(1))
+            last = int(match.group(2) or match.group(1))
+            args = args[:-1]
+    return ' '.join(args), first, last
+
+
+def render_search_page(search: dict, found: dict, offset: int):
+    """Текст (HTML) страницы результатов и кнопки листания"""
+    scope = ""
+    if search['first'] is not None:
+        scope = f" у зустрічі #{search['first']}" if search['first'] == search['last'] else \
+            f" у зустрічах #{search['first']}–#{search['last']}"
+    text = f"🔎 <b>{html.escape(search['query'])}</b>{scope}: знайдено {found['total']}\n"
+    if not found['ranked']:
+        text += "Забагато збігів для сортування за релевантністю, спочатку нові відгуки.\n"
+    text += "\n"
+    for number, (feedback_id, meeting_id, start_date, snippet) in enumerate(found['results'], offset + 1):
+        date = datetime.fromisoformat(start_date).strftime('%d.%m.%Y') if start_date else '?'
+        snippet = html.escape(snippet).replace(MATCH_START, '<b>').replace(MATCH_END, '</b>')
+        text += f"{number}. <i>#{meeting_id}, {date}</i>\n💬 {snippet}\n\n"
+    
+    navigation = []
+    if offset > 0:
+        navigation.append(InlineKeyboardButton(
+            "◀️", callback_data=f"search_{max(0, offset - config.SEARCH_PAGE_SIZE)}"
+        ))
+    if offset + len(found['results']) < found['total']:
+        navigation.append(InlineKeyboardButton(
+            "▶️", callback_data=f"search_{offset + config.SEARCH_PAGE_SIZE}"
+        ))
+    return text.rstrip(), InlineKeyboardMarkup([navigation]) if navigation else None
+
+
+async def admin_search(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Полнотекстовый поиск по анонимным отзывам (только для админа)"""
+    if update.effective_user.id != config.ADMIN_ID:
+        await update.message.reply_text("У тебе немає доступу до цієї команди.")
+        return
+    
+    query, first, last = parse_search_args(context.args or [])
+    if not query:
+        await update.message.reply_text(
+            "Вкажи, що шукати.\n\n"
+            "Наприклад: `/search молитва` або `/search музика 10-20` (тільки зустрічі з 10 по 20)",
+            parse_mode='Markdown'
+        )
+        return
+    
+    found = await db.search_feedback(query, first, last)
+    if found is None:
+        await update.message.reply_text("❌ Пошук недоступний: SQLite зібрано без FTS5.")
+        return
+    if not found['results']:
+        await update.message.reply_text(f"Нічого не знайдено за запитом «{query}».")
+        return
+    
+    search = {'query': query, 'first': first, 'last': last}
+    text, reply_markup = render_search_page(search, found, 0)
+    message = await update.message.reply_text(text, parse_mode='HTML', reply_markup=reply_markup)
+    # Запрос не помещается в callback_data (64 байта) - листать можно последний поиск
+    context.user_data['search'] = {**search, 'message_id': message.message_id}
+
+
+async def handle_search_page(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Листание результатов /search: один поиск в базе и одно редактирование"""
+    query = update.callback_query
+    if query.from_user.id != config.ADMIN_ID:
+        await query.answer("У тебе немає доступу до цієї дії.")
+        return
+    
+    search = context.user_data.get('search')
+    if not search or search['message_id'] != query.message.message_id:
+        await query.answer("Це старий пошук, повтори /search.")
+        return
+    await query.answer()
+    
+    offset = int(query.data.split('_')[1])
+    found = await db.search_feedback(search['query'], search['first'], search['last'], offset=offset)
+    if not found or not found['results']:
+        return
+    text, reply_markup = render_search_page(search, found, offset)
+    await query.edit_message_text(text, parse_mode='HTML', reply_markup=reply_markup)
 
 
 async def admin_graph(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -745,141 +1086,97 @@ async def admin_graph(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     graph_type = context.args[0]
     
-    # Получаем данные в зависимости от типа
+    # График не меняется, пока не закрылась новая встреча (или не пришла
+    # оценка в закрытую); для периодов ключ включает еще и текущий день
+    cache_key = (await db.get_closed_meetings_version(), datetime.now().date())
+    cached = chart_cache.get(graph_type, cache_key)
+    if cached:
+        if cached.meetings < 2:
+            await update.message.reply_text(
+                f"⚠️ Недостатньо даних для графіка (тільки {cached.meetings} зустріч).\n"
+                "Графік буде більш інформативним після 3+ зустрічей."
+            )
+        await send_chart(update.message, cached)
+        return
+    
+    # Периоды (неделя/месяц/квартал) и средние по ним считает база
     if graph_type == 'month':
-        stats = db.get_stats_for_period(30)
         title = "Динаміка оцінок за місяць"
         group_by = 'week'
+        days = 30
     elif graph_type == 'year':
-        stats = db.get_stats_for_period(365)
         title = "Динаміка оцінок за рік"
         group_by = 'month'
+        days = 365
     else:  # all
-        stats = db.get_all_stats()
         title = "Динаміка оцінок за весь період"
         group_by = 'quarter'
+        days = None
+    rollup = await db.get_rating_rollup(group_by, days)
     
-    if not stats:
+    if not rollup:
         await update.message.reply_text("❌ Немає даних за вказаний період.")
         return
     
     # Если данных меньше 2 точек, предупреждаем
-    if len(stats) < 2:
+    meetings = sum(bucket['meetings'] for bucket in rollup)
+    if meetings < 2:
         await update.message.reply_text(
-            f"⚠️ Недостатньо даних для графіка (тільки {len(stats)} зустріч).\n"
+            f"⚠️ Недостатньо даних для графіка (тільки {meetings} зустріч).\n"
             "Графік буде більш інформативним після 3+ зустрічей."
         )
     
-    # Группируем данные
-    from datetime import datetime
-    from collections import defaultdict
+    handler_started = time.perf_counter()
     
-    grouped_data = defaultdict(lambda: {'interest': [], 'relevance': [], 'spiritual': [], 'dates': []})
+    dates = [datetime.fromisoformat(bucket['start']) for bucket in rollup]
+    interest = [bucket['avg_interest'] for bucket in rollup]
+    relevance = [bucket['avg_relevance'] for bucket in rollup]
+    spiritual = [bucket['avg_spiritual'] for bucket in rollup]
+    # Финальная оценка = среднее трех метрик
+    overall = [(i + r + s) / 3 for i, r, s in zip(interest, relevance, spiritual)]
     
-    for s in stats:
-        date_obj = datetime.fromisoformat(s['date'])
-        
-        if group_by == 'week':
-            # Группируем по неделям (понедельник каждой недели)
-            week_start = date_obj - timedelta(days=date_obj.weekday())
-            key = week_start.strftime('%Y-%W')
-            display_date = week_start
-        elif group_by == 'month':
-            # Группируем по месяцам
-            key = date_obj.strftime('%Y-%m')
-            display_date = date_obj.replace(day=1)
-        else:  # quarter
-            # Группируем по кварталам
-            quarter = (date_obj.month - 1) // 3 + 1
-            key = f"{date_obj.year}-Q{quarter}"
-            quarter_month = (quarter - 1) * 3 + 1
-            display_date = date_obj.replace(month=quarter_month, day=1)
-        
-        grouped_data[key]['interest'].append(s['avg_interest'])
-        grouped_data[key]['relevance'].append(s['avg_relevance'])
-        grouped_data[key]['spiritual'].append(s['avg_spiritual'])
-        grouped_data[key]['dates'].append(display_date)
-    
-    # Вычисляем средние по группам
-    dates = []
-    interest = []
-    relevance = []
-    spiritual = []
-    overall = []  # Финальная оценка
-    
-    for key in sorted(grouped_data.keys()):
-        data = grouped_data[key]
-        dates.append(data['dates'][0])
-        
-        # Среднее по каждой метрике в этом периоде
-        avg_interest = sum(data['interest']) / len(data['interest'])
-        avg_relevance = sum(data['relevance']) / len(data['relevance'])
-        avg_spiritual = sum(data['spiritual']) / len(data['spiritual'])
-        
-        interest.append(avg_interest)
-        relevance.append(avg_relevance)
-        spiritual.append(avg_spiritual)
-        
-        # Финальная оценка = среднее трех метрик
-        overall.append((avg_interest + avg_relevance + avg_spiritual) / 3)
-    
-    # Создаем график
-    plt.figure(figsize=(14, 7))
-    plt.plot(dates, interest, marker='o', label='Цікавість', linewidth=2.5, markersize=10, color='#1f77b4')
-    plt.plot(dates, relevance, marker='s', label='Актуальність', linewidth=2.5, markersize=10, color='#ff7f0e')
-    plt.plot(dates, spiritual, marker='^', label='Духовне зростання', linewidth=2.5, markersize=10, color='#2ca02c')
-    plt.plot(dates, overall, marker='D', label='🎯 Фінальна оцінка', linewidth=3, markersize=12, color='#d62728', linestyle='--')
-    
-    # Настройка осей
-    if group_by == 'week':
-        plt.xlabel('Тиждень', fontsize=12)
-        from matplotlib.dates import WeekdayLocator, DateFormatter
-        plt.gca().xaxis.set_major_locator(WeekdayLocator(byweekday=0))  # Понедельники
-        plt.gca().xaxis.set_major_formatter(DateFormatter('%d.%m'))
-    elif group_by == 'month':
-        plt.xlabel('Місяць', fontsize=12)
-        from matplotlib.dates import MonthLocator, DateFormatter
-        plt.gca().xaxis.set_major_locator(MonthLocator())
-        plt.gca().xaxis.set_major_formatter(DateFormatter('%b %Y'))
-    else:  # quarter
-        plt.xlabel('Квартал', fontsize=12)
-        from matplotlib.dates import MonthLocator, DateFormatter
-        plt.gca().xaxis.set_major_locator(MonthLocator(interval=3))
-        plt.gca().xaxis.set_major_formatter(DateFormatter('Q%q %Y'))
-    
-    plt.ylabel('Оцінка (1-5)', fontsize=12)
-    plt.title(title, fontsize=14, fontweight='bold')
-    plt.legend(fontsize=11, loc='best')
-    plt.grid(True, alpha=0.3, linestyle='--')
-    plt.xticks(rotation=45, ha='right')
-    plt.tight_layout()
-    plt.ylim(0, 5.5)
-    
-    # Сохраняем график в BytesIO
-    buf = io.BytesIO()
-    plt.savefig(buf, format='png', dpi=150, bbox_inches='tight')
-    buf.seek(0)
-    plt.close()
+    on_loop_time = time.perf_counter() - handler_started
+    
+    # Рендер графика в отдельном процессе - event loop в это время свободен
+    png = await charts.render_chart(dates, interest, relevance, spiritual, overall, title, group_by)
     
     # Формируем подпись
     period_names = {'month': 'місяць', 'year': 'рік', 'all': 'весь період'}
     
-    # Средние по каждой метрике за период
-    final_avg = sum(overall) / len(overall) if overall else 0
+    # Средние за весь период, тоже взвешенные по числу оценок
+    attended = sum(bucket['attended'] for bucket in rollup)
+    total_interest = sum(bucket['interest_sum'] for bucket in rollup) / attended
+    total_relevance = sum(bucket['relevance_sum'] for bucket in rollup) / attended
+    total_spiritual = sum(bucket['spiritual_sum'] for bucket in rollup) / attended
+    final_avg = (total_interest + total_relevance + total_spiritual) / 3
     
     caption = f"📈 Графік за {period_names[graph_type]}\n"
-    caption += f"📊 Кількість періодів: {len(dates)}\n\n"
+    caption += f"📊 Кількість періодів: {len(dates)} (зустрічей: {meetings}, оцінок: {attended})\n\n"
     caption += f"⭐️ Середні оцінки за період:\n"
-    caption += f"  • Цікавість: {sum(interest)/len(interest):.2f}/5\n"
-    caption += f"  • Актуальність: {sum(relevance)/len(relevance):.2f}/5\n"
-    caption += f"  • Духовне зростання: {sum(spiritual)/len(spiritual):.2f}/5\n"
+    caption += f"  • Цікавість: {total_interest:.2f}/5\n"
+    caption += f"  • Актуальність: {total_relevance:.2f}/5\n"
+    caption += f"  • Духовне зростання: {total_spiritual:.2f}/5\n"
     caption += f"  • 🎯 Фінальна оцінка: {final_avg:.2f}/5"
     
-    # Отправляем график
-    await update.message.reply_photo(
-        photo=buf,
-        caption=caption
-    )
+    # Отправляем график и запоминаем его вместе с file_id загруженного фото
+    entry = charts.CachedChart(key=cache_key, png=png, caption=caption, meetings=meetings)
+    chart_cache.put(graph_type, entry)
+    await send_chart(update.message, entry)
+    logger.info(f"Graph {graph_type}: {on_loop_time * 1000:.1f} ms of work on the event loop")
+
+
+async def send_chart(message, entry: charts.CachedChart):
+    """Отправляет график: повторно по file_id, если он уже загружен в Telegram"""
+    if entry.file_id:
+        try:
+            await message.reply_photo(photo=entry.file_id, caption=entry.caption)
+            return
+        except BadRequest as e:
+            logger.warning(f"Cached chart file_id rejected, uploading again: {e}")
+            entry.file_id = None
+    
+    sent = await message.reply_photo(photo=entry.png, caption=entry.caption)
+    entry.file_id = sent.photo[-1].file_id
 
 
 async def admin_help(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -906,6 +1203,7 @@ async def admin_help(update: Update, context: ContextTypes.DEFAULT_TYPE):
 /stats - Список всіх зустрічей
 /stats ID - Статистика по конкретному опитуванню
 /ratings ID - Анонімний список оцінок по зустрічі
+/search слова - Пошук по відгуках (можна додати ID або ID-ID зустрічей)
 /graph month - Графік за місяць (по тижнях)
 /graph year - Графік за рік (по місяцях)
 /graph all - Графік за весь період (по кварталах)
@@ -914,49 +1212,96 @@ async def admin_help(update: Update, context: ContextTypes.DEFAULT_TYPE):
 /export\\_excel - Завантажити дані в Excel
 /export\\_db - Завантажити базу даних SQLite
 
+🩺 *Моніторинг:*
+/metrics - Затримки обробників і запитів, помилки, черги
+
 ❓ /help - Показати це повідомлення
     """
     
     await update.message.reply_text(help_text, parse_mode='Markdown')
 
 
-async def admin_export_db(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Отправляет файл базы данных админу"""
+def format_latency_table(rows: list, label: str, limit: int) -> str:
+    """Таблица задержек для /metrics: имя, вызовов, p50 и p99 в мс"""
+    lines = [f"{'':<24}{'к-сть':>7}{'p50':>8}{'p99':>8}"]
+    for row in rows[:limit]:
+        lines.append(
+            f"{row['labels'][label][:24]:<24}{row['count']:>7}"
+            f"{row['p50'] * 1000:>8.1f}{row['p99'] * 1000:>8.1f}"
+        )
+    return "```\n" + "\n".join(lines) + "\n```"
+
+
+async def admin_metrics(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Сводка метрик: обработчики, запросы к базе, Bot API, рассылки, очереди"""
     if update.effective_user.id != config.ADMIN_ID:
         await update.message.reply_text("У тебе немає доступу до цієї команди.")
         return
     
-    db_path = config.DATABASE_NAME
+    uptime = timedelta(seconds=int(time.time() - metrics.registry.started))
+    text = f"📊 *Метрики* (працює {uptime})\n\n"
+    
+    handlers = metrics.handler_seconds.summary()
+    text += f"⚙️ *Обробники* (мс), викликів: {sum(row['count'] for row in handlers)}\n"
+    text += format_latency_table(handlers, 'handler', 12) + "\n"
+    handler_errors = metrics.handler_errors.items()
+    if handler_errors:
+        text += "Помилки: " + ", ".join(
+            f"`{name}` {error} ×{count:.0f}" for (name, error), count in handler_errors.items()
+        ) + "\n"
+    
+    queries = metrics.db_query_seconds.summary()
+    text += f"\n🗄 *База даних* (мс, топ за сумарним часом), запитів: {sum(row['count'] for row in queries)}\n"
+    text += format_latency_table(queries, 'method', 8) + "\n"
+    if metrics.db_errors.total():
+        text += f"Помилок у запитах: {metrics.db_errors.total():.0f}\n"
+    
+    requests = metrics.telegram_request_seconds.summary()
+    errors = {}
+    for (_, status), count in metrics.telegram_errors.items().items():
+        errors[status] = errors.get(status, 0) + count
+    text += f"\n📡 *Bot API*: запитів {sum(row['count'] for row in requests)}"
+    if errors:
+        text += ", помилки: " + ", ".join(f"{status} ×{count:.0f}" for status, count in sorted(errors.items()))
+    text += "\n"
+    
+    sent = metrics.broadcast_messages.items()
+    text += (
+        f"📨 *Розсилки*: доставлено {sent.get(('delivered',), 0):.0f}, "
+        f"не доставлено {sent.get(('failed',), 0):.0f}, повторів {sent.get(('retry',), 0):.0f}\n"
+    )
     
-    if not os.path.exists(db_path):
-        await update.message.reply_text("❌ Файл бази даних не знайдено.")
-        return
+    text += "\n📥 *Черги зараз*:\n"
+    for gauge in metrics.registry.gauges():
+        value = gauge.value()
+        if value is not None:
+            text += f"`{gauge.name}`: {value:g}\n"
     
-    # Получаем статистику по базе
-    conn = db.get_connection()
-    cursor = conn.cursor()
+    lag = loop_monitor.summary()
+    text += f"\n⏱ *Event loop*: p99 {lag['p99']:.0f} мс, макс. {lag['max']:.0f} мс"
     
-    # Количество пользователей
-    cursor.execute('SELECT COUNT(*) FROM users')
-    users_count = cursor.fetchone()[0]
-    
-    # Количество встреч
-    cursor.execute('SELECT COUNT(*) FROM youth_meetings')
-    meetings_count = cursor.fetchone()[0]
+    await update.message.reply_text(text, parse_mode='Markdown')
+
+
+async def admin_export_db(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Отправляет файл базы данных админу"""
+    if update.effective_user.id != config.ADMIN_ID:
+        await update.message.reply_text("У тебе немає доступу до цієї команди.")
+        return
     
-    # Количество оценок
-    cursor.execute('SELECT COUNT(*) FROM ratings WHERE attended = 1')
-    ratings_count = cursor.fetchone()[0]
+    # Согласованный снимок вместо копирования живого файла
+    backup = await db.run(backups.create)
     
-    # Количество отзывов
-    cursor.execute('SELECT COUNT(*) FROM feedback')
-    feedback_count = cursor.fetchone()[0]
+    # Получаем статистику по базе
+    counts = await db.get_counts()
+    users_count = counts['users']
+    meetings_count = counts['meetings']
+    ratings_count = counts['ratings']
+    feedback_count = counts['feedback']
     
     # Размер файла
-    file_size = os.path.getsize(db_path)
-    file_size_mb = file_size / 1024 / 1024
-    
-    conn.close()
+    file_size_mb = backup.size / 1024 / 1024
+    compressed_size_mb = backup.compressed_size / 1024 / 1024
     
     # Формируем описание
     caption = f"💾 *База даних*\n\n"
@@ -964,113 +1309,86 @@ async def admin_export_db(update: Update, context: ContextTypes.DEFAULT_TYPE):
     caption += f"📅 Зустрічей: {meetings_count}\n"
     caption += f"⭐️ Оцінок: {ratings_count}\n"
     caption += f"💬 Відгуків: {feedback_count}\n"
-    caption += f"📦 Розмір: {file_size_mb:.2f} МБ\n\n"
-    caption += f"🔧 Відкрити можна за допомогою SQLite Browser або будь-якого SQL клієнта"
+    caption += f"📦 Розмір: {file_size_mb:.2f} МБ (архів {compressed_size_mb:.2f} МБ)\n\n"
+    caption += f"🔧 Розпакуй gzip і відкрий за допомогою SQLite Browser або будь-якого SQL клієнта"
     
     # Отправляем файл
-    await update.message.reply_document(
-        document=open(db_path, 'rb'),
-        filename=f'youth_feedback_{datetime.now().strftime("%Y%m%d_%H%M%S")}.db',
-        caption=caption,
-        parse_mode='Markdown'
-    )
+    with open(backup.path, 'rb') as f:
+        await update.message.reply_document(
+            document=f,
+            filename=f'youth_feedback_{datetime.now().strftime("%Y%m%d_%H%M%S")}.db.gz',
+            caption=caption,
+            parse_mode='Markdown'
+        )
 
 
 async def auto_backup(context: ContextTypes.DEFAULT_TYPE):
     """Автоматичний щотижневий бекап бази даних"""
     try:
-        db_path = config.DATABASE_NAME
-
-        if not os.path.exists(db_path):
-            logger.error("Auto backup: database file not found")
+        backup = await db.run(backups.create)
+        if not backup.changed:
+            logger.info("Auto backup: database unchanged, upload skipped")
             return
 
         # Отримуємо статистику
-        conn = db.get_connection()
-        cursor = conn.cursor()
-
-        cursor.execute('SELECT COUNT(*) FROM users')
-        users_count = cursor.fetchone()[0]
-
-        cursor.execute('SELECT COUNT(*) FROM youth_meetings')
-        meetings_count = cursor.fetchone()[0]
+        counts = await db.get_counts()
+        users_count = counts['users']
+        meetings_count = counts['meetings']
+        ratings_count = counts['ratings']
 
-        cursor.execute('SELECT COUNT(*) FROM ratings WHERE attended = 1')
-        ratings_count = cursor.fetchone()[0]
-
-        file_size = os.path.getsize(db_path)
-        file_size_kb = file_size / 1024
-
-        conn.close()
+        file_size_kb = backup.size / 1024
+        compressed_size_kb = backup.compressed_size / 1024
 
         caption = f"🔄 *Автоматичний бекап*\n\n"
         caption += f"👥 Користувачів: {users_count}\n"
         caption += f"📅 Зустрічей: {meetings_count}\n"
         caption += f"⭐️ Оцінок: {ratings_count}\n"
-        caption += f"📦 Розмір: {file_size_kb:.1f} КБ\n\n"
+        caption += f"📦 Розмір: {file_size_kb:.1f} КБ (архів {compressed_size_kb:.1f} КБ)\n\n"
         caption += f"📆 {datetime.now().strftime('%d.%m.%Y %H:%M')}"
 
-        await context.bot.send_document(
-            chat_id=config.ADMIN_ID,
-            document=open(db_path, 'rb'),
-            filename=f'backup_{datetime.now().strftime("%Y%m%d")}.db',
-            caption=caption,
-            parse_mode='Markdown'
-        )
+        with open(backup.path, 'rb') as f:
+            await context.bot.send_document(
+                chat_id=config.ADMIN_ID,
+                document=f,
+                filename=f'backup_{datetime.now().strftime("%Y%m%d")}.db.gz',
+                caption=caption,
+                parse_mode='Markdown'
+            )
         logger.info("Auto backup sent successfully")
 
     except Exception as e:
         logger.error(f"Auto backup error: {e}")
 
 
-async def check_and_close_expired_surveys(context: ContextTypes.DEFAULT_TYPE):
-    """Фонова задача: перевіряє і закриває прострочені опитування"""
-    try:
-        active_meeting = db.get_active_meeting()
-        if not active_meeting:
-            return
-        
-        # Получаем дедлайн встречи
-        deadline = db.get_meeting_deadline(active_meeting)
-        if not deadline:
-            return
-        
-        # Проверяем истек ли дедлайн
-        now = datetime.now()
-        if now >= deadline:
-            logger.info(f"Auto-closing expired survey {active_meeting}")
-            
-            # Закрываем встречу
-            db.close_meeting(active_meeting)
-            
-            # Получаем статистику
-            stats = db.get_meeting_stats(active_meeting)
-            
-            # Формируем сообщение для админа
-            text = f"⏰ *Опитування #{active_meeting} автоматично закрито*\n\n"
-            text += f"📊 *Підсумки:*\n"
-            text += f"👥 Відповіли: {stats['total_attended']}\n"
-            text += f"❌ Не було: {stats['not_attended']}\n\n"
-            
-            if stats['total_attended'] > 0:
-                text += f"⭐️ *Середні оцінки:*\n"
-                text += f"• Цікавість: {stats['avg_interest']}/5\n"
-                text += f"• Актуальність: {stats['avg_relevance']}/5\n"
-                text += f"• Духовне зростання: {stats['avg_spiritual_growth']}/5\n\n"
-            
-            text += f"💡 Використай `/stats {active_meeting}` для детальної статистики"
-            
-            # Отправляем админу
-            await context.bot.send_message(
-                chat_id=config.ADMIN_ID,
-                text=text,
-                parse_mode='Markdown'
-            )
-            
-            logger.info(f"Survey {active_meeting} auto-closed and admin notified")
-            
-    except Exception as e:
-        logger.error(f"Error in check_and_close_expired_surveys: {e}")
+async def run_backfills(context: ContextTypes.DEFAULT_TYPE):
+    """Фоновое заполнение колонок, добавленных миграциями схемы: пачками, с
+    паузами, чтобы запросы обработчиков не ждали блокировку записи"""
+    if not db.sync.pending_backfills:
+        return
+    started = time.perf_counter()
+    updated = 0
+    while True:
+        rows = await db.backfill_batch(config.BACKFILL_BATCH_SIZE)
+        if rows is None:
+            break
+        updated += rows
+        await asyncio.sleep(config.BACKFILL_PAUSE)
+    logger.info(f"Schema backfill finished: {updated} rows in {time.perf_counter() - started:.1f}s")
+
+
+async def evict_stale_state(context: ContextTypes.DEFAULT_TYPE):
+    """Удаляет зависшие диалоги и user_data из базы и из памяти бота
+    (при запуске это делает сама persistence)"""
+    await context.application.persistence.evict_stale(context.application)
+
+
+async def check_membership_cache(context: ContextTypes.DEFAULT_TYPE):
+    """Фоновая самопроверка: кеш одобренных/ожидающих пользователей совпадает с базой"""
+    diff = await db.verify_membership()
+    logger.info(f"Membership cache: {db.sync.membership.stats()}")
+    if any(diff.values()):
+        logger.warning(f"Membership cache is out of sync with the database, reloading: {diff}")
+        await db.load_membership()
 
 
 async def admin_export_excel(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -1082,123 +1400,17 @@ async def admin_export_excel(update: Update, context: ContextTypes.DEFAULT_TYPE)
     await update.message.reply_text("⏳ Створюю Excel файл...")
     
     try:
-        from openpyxl import Workbook
-        from openpyxl.styles import Font, PatternFill, Alignment
-        
-        wb = Workbook()
-        
-        # Удаляем стандартный лист
-        wb.remove(wb.active)
-        
-        conn = db.get_connection()
-        cursor = conn.cursor()
-        
-        # === ЛИСТ 1: Зустрічі ===
-        ws_meetings = wb.create_sheet("Зустрічі")
-        ws_meetings.append(["ID", "Дата початку", "Активна", "Середня цікавість", "Середня актуальність", "Середнє духовне зростання", "Відвідали"])
-        
-        cursor.execute('''
-            SELECT 
-                m.meeting_id,
-                m.start_date,
-                CASE WHEN m.is_active = 1 THEN 'Так' ELSE 'Ні' END,
-                ROUND(AVG(CASE WHEN r.attended = 1 THEN r.interest_rating END), 2),
-                ROUND(AVG(CASE WHEN r.attended = 1 THEN r.relevance_rating END), 2),
-                ROUND(AVG(CASE WHEN r.attended = 1 THEN r.spiritual_growth_rating END), 2),
-                COUNT(CASE WHEN r.attended = 1 THEN 1 END)
-            FROM youth_meetings m
-            LEFT JOIN ratings r ON m.meeting_id = r.meeting_id
-            GROUP BY m.meeting_id
-            ORDER BY m.start_date DESC
-        ''')
-        for row in cursor.fetchall():
-            ws_meetings.append(list(row))
-        
-        for cell in ws_meetings[1]:
-            cell.font = Font(bold=True, color="FFFFFF")
-            cell.fill = PatternFill(start_color="70AD47", end_color="70AD47", fill_type="solid")
-            cell.alignment = Alignment(horizontal="center")
-        
-        # === ЛИСТ 3: Оцінки ===
-        ws_ratings = wb.create_sheet("Оцінки")
-        ws_ratings.append(["ID зустрічі", "Дата зустрічі", "Відвідав", "Цікавість", "Актуальність", "Духовне зростання", "Дата оцінки"])
-        
-        cursor.execute('''
-            SELECT 
-                m.meeting_id,
-                m.start_date,
-                CASE WHEN r.attended = 1 THEN 'Так' ELSE 'Ні' END,
-                r.interest_rating,
-                r.relevance_rating,
-                r.spiritual_growth_rating,
-                r.rating_date
-            FROM ratings r
-            JOIN youth_meetings m ON r.meeting_id = m.meeting_id
-            ORDER BY m.start_date DESC, r.rating_date
-        ''')
-        for row in cursor.fetchall():
-            ws_ratings.append(list(row))
-        
-        for cell in ws_ratings[1]:
-            cell.font = Font(bold=True, color="FFFFFF")
-            cell.fill = PatternFill(start_color="FFC000", end_color="FFC000", fill_type="solid")
-            cell.alignment = Alignment(horizontal="center")
-        
-        # === ЛИСТ 4: Відгуки ===
-        ws_feedback = wb.create_sheet("Відгуки")
-        ws_feedback.append(["ID зустрічі", "Дата зустрічі", "Відгук", "Дата відгуку"])
-        
-        cursor.execute('''
-            SELECT 
-                m.meeting_id,
-                m.start_date,
-                f.feedback_text,
-                f.feedback_date
-            FROM feedback f
-            JOIN youth_meetings m ON f.meeting_id = m.meeting_id
-            ORDER BY m.start_date DESC, f.feedback_date
-        ''')
-        for row in cursor.fetchall():
-            ws_feedback.append(list(row))
-        
-        for cell in ws_feedback[1]:
-            cell.font = Font(bold=True, color="FFFFFF")
-            cell.fill = PatternFill(start_color="9966FF", end_color="9966FF", fill_type="solid")
-            cell.alignment = Alignment(horizontal="center")
-        
-        # Устанавливаем ширину колонок
-        for ws in [ws_meetings, ws_ratings, ws_feedback]:
-            for column in ws.columns:
-                max_length = 0
-                column_letter = column[0].column_letter
-                for cell in column:
-                    try:
-                        if len(str(cell.value)) > max_length:
-                            max_length = len(str(cell.value))
-                    except:
-                        pass
-                adjusted_width = min(max_length + 2, 50)
-                ws.column_dimensions[column_letter].width = adjusted_width
-        
-        conn.close()
-        
-        # Сохраняем файл
+        buf = await db.run(build_excel_export, db.sync)
         filename = f'youth_feedback_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx'
-        wb.save(filename)
         
         # Получаем статистику
-        file_size = os.path.getsize(filename)
-        file_size_kb = file_size / 1024
+        file_size_kb = buf.getbuffer().nbytes / 1024
         
-        cursor = db.get_connection().cursor()
-        cursor.execute('SELECT COUNT(*) FROM users')
-        users_count = cursor.fetchone()[0]
-        cursor.execute('SELECT COUNT(*) FROM youth_meetings')
-        meetings_count = cursor.fetchone()[0]
-        cursor.execute('SELECT COUNT(*) FROM ratings WHERE attended = 1')
-        ratings_count = cursor.fetchone()[0]
-        cursor.execute('SELECT COUNT(*) FROM feedback')
-        feedback_count = cursor.fetchone()[0]
+        counts = await db.get_counts()
+        users_count = counts['users']
+        meetings_count = counts['meetings']
+        ratings_count = counts['ratings']
+        feedback_count = counts['feedback']
         
         # Формируем описание
         caption = f"📊 *Excel експорт бази даних*\n\n"
@@ -1212,46 +1424,57 @@ async def admin_export_excel(update: Update, context: ContextTypes.DEFAULT_TYPE)
         
         # Отправляем файл
         await update.message.reply_document(
-            document=open(filename, 'rb'),
+            document=buf,
             filename=filename,
             caption=caption,
             parse_mode='Markdown'
         )
         
-        # Удаляем временный файл
-        os.remove(filename)
-        
     except Exception as e:
         logger.error(f"Error exporting to Excel: {e}")
         await update.message.reply_text(f"❌ Помилка при створенні Excel файлу: {str(e)}")
 
 
-def main():
-    """Главная функция запуска бота"""
-    # Проверяем что ADMIN_ID установлен
-    if config.ADMIN_ID == 0:
-        logger.error("ADMIN_ID not set! Please set your Telegram user ID in config.py")
-        return
-
-    # Persistence - сохраняет состояние ConversationHandler и user_data между перезапусками
-    # Удаляем старый pickle при старте чтобы сбросить застрявшие состояния диалогов
-    pickle_path = "/var/data/bot_persistence.pickle"
-    if os.path.exists(pickle_path):
-        os.remove(pickle_path)
-        logger.info("Cleared old persistence file to reset stuck conversation states")
-    persistence = PicklePersistence(filepath=pickle_path)
-    logger.info("Persistence enabled - state will be saved to " + pickle_path)
-
-    # Создаем приложение с persistence
-    application = Application.builder().token(config.BOT_TOKEN).persistence(persistence).build()
+async def post_init(application: Application):
+    """Запускается после инициализации приложения, уже внутри event loop"""
+    loop_monitor.start()
+    await metrics_server.start()
+    await restore_scheduled_events(application)
+
+
+async def post_shutdown(application: Application):
+    """Запускается при остановке бота"""
+    await loop_monitor.stop()
+    await metrics_server.stop()
+    charts.shutdown()
+    logger.info(f"Event loop lag: {loop_monitor.summary()}")
+
+
+def build_application(persistence) -> Application:
+    """Создает приложение, фоновые задачи и обработчики"""
+    application = (
+        Application.builder()
+        .token(config.BOT_TOKEN)
+        .base_url(config.BOT_API_BASE_URL)
+        .request(InstrumentedRequest(connection_pool_size=config.BOT_CONNECTION_POOL_SIZE))
+        .persistence(persistence)
+        .concurrent_updates(PerUserUpdateProcessor(config.UPDATE_CONCURRENCY))
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+        .build()
+    )
     
-    # Добавляем фоновую задачу проверки дедлайнов (каждую 1 час)
-    job_queue = application.job_queue
-    job_queue.run_repeating(check_and_close_expired_surveys, interval=3600, first=60)
-
     # Автоматичний бекап раз на тиждень (604800 секунд = 7 днів)
-    job_queue.run_repeating(auto_backup, interval=604800, first=3600)
-    logger.info("Background job for checking deadlines scheduled (every 1 hour)")
+    # (напоминания и закрытие опросов восстанавливаются из базы в post_init)
+    application.job_queue.run_repeating(auto_backup, interval=604800, first=3600)
+    application.job_queue.run_repeating(
+        check_membership_cache, interval=config.MEMBERSHIP_CHECK_INTERVAL, first=config.MEMBERSHIP_CHECK_INTERVAL
+    )
+    application.job_queue.run_repeating(
+        evict_stale_state, interval=config.PERSISTENCE_EVICT_INTERVAL, first=config.PERSISTENCE_EVICT_INTERVAL
+    )
+    # Миграции схемы применяются при открытии базы, а строки заполняются в фоне
+    application.job_queue.run_once(run_backfills, when=1)
     
     # Обработчик процесса оценки с persistence
     rating_conv_handler = ConversationHandler(
@@ -1283,16 +1506,116 @@ def main():
     application.add_handler(CommandHandler("close_survey", admin_close_survey))
     application.add_handler(CommandHandler("stats", admin_stats))
     application.add_handler(CommandHandler("ratings", admin_ratings))
+    application.add_handler(CommandHandler("search", admin_search))
     application.add_handler(CommandHandler("graph", admin_graph))
     application.add_handler(CommandHandler("export_db", admin_export_db))
     application.add_handler(CommandHandler("export_excel", admin_export_excel))
+    application.add_handler(CommandHandler("metrics", admin_metrics))
+    application.add_handler(CallbackQueryHandler(handle_members_page, pattern='^members_'))
+    application.add_handler(CallbackQueryHandler(handle_ratings_page, pattern='^ratings_'))
+    application.add_handler(CallbackQueryHandler(handle_search_page, pattern='^search_'))
     application.add_handler(CallbackQueryHandler(handle_approval, pattern='^(approve|reject|remove)_'))
     application.add_handler(rating_conv_handler)
     
+    # Время и ошибки каждого обработчика, размеры очередей - в метрики
+    for handlers in application.handlers.values():
+        instrument_handlers(handlers)
+    metrics.registry.gauge(
+        'bot_update_queue_size', 'Апдейтов получено, но еще не взято в обработку',
+        application.update_queue.qsize
+    )
+    metrics.registry.gauge(
+        'bot_updates_in_progress', 'Апдейтов в обработке и в очереди за своим пользователем',
+        lambda: application.update_processor.pending
+    )
+    metrics.registry.gauge('bot_db_queue_size', 'Запросов к базе в очереди и в работе', lambda: db.pending)
+    metrics.registry.gauge(
+        'bot_db_write_queue_size', 'Оценок и отзывов ждут группового коммита', lambda: db.writer.pending
+    )
+    metrics.registry.gauge('bot_broadcast_queue_size', 'Сообщений рассылок ждут отправки', queued_messages)
+    metrics.registry.gauge(
+        'bot_event_loop_lag_max_seconds', 'Максимальная задержка event loop',
+        lambda: loop_monitor.max_lag
+    )
+    
+    return application
+
+
+def measure_startup() -> int:
+    """Печатает время фаз запуска и сравнивает с бюджетом (python bot.py --measure-startup)"""
+    build_application(SQLitePersistence(db))
+    startup_timer.mark('application')
+    
+    print(startup_timer.report(config.STARTUP_BUDGET_SECONDS))
+    # Тяжелые библиотеки должны грузиться только в /graph и /export_excel
+    for module in ('matplotlib', 'openpyxl'):
+        if module in sys.modules:
+            print(f"WARNING: {module} was imported at startup")
+    return 0 if startup_timer.total <= config.STARTUP_BUDGET_SECONDS else 1
+
+
+def get_update_mode() -> str:
+    """Режим получения апдейтов с откатом на polling, если webhook не настроен"""
+    if config.BOT_MODE != 'webhook':
+        return 'polling'
+    if not config.WEBHOOK_URL:
+        logger.warning("BOT_MODE=webhook but WEBHOOK_URL is not set, falling back to polling")
+        return 'polling'
+    if importlib.util.find_spec('tornado') is None:
+        logger.warning("Webhook mode needs python-telegram-bot[webhooks], falling back to polling")
+        return 'polling'
+    return 'webhook'
+
+
+def run(application: Application):
+    """Запускает получение апдейтов: webhook (локальный HTTP сервер) или long polling"""
+    if get_update_mode() == 'webhook':
+        # Telegram присылает секрет в каждом запросе, чужие запросы сервер отклоняет с 403
+        secret_token = config.WEBHOOK_SECRET or secrets.token_urlsafe(32)
+        webhook_url = f"{config.WEBHOOK_URL.rstrip('/')}/{config.WEBHOOK_PATH}"
+        logger.info(f"Bot started in webhook mode: {webhook_url} (listening on port {config.WEBHOOK_PORT})")
+        application.run_webhook(
+            listen=config.WEBHOOK_LISTEN,
+            port=config.WEBHOOK_PORT,
+            url_path=config.WEBHOOK_PATH,
+            webhook_url=webhook_url,
+            secret_token=secret_token,
+            max_connections=config.WEBHOOK_MAX_CONNECTIONS,
+            allowed_updates=Update.ALL_TYPES
+        )
+    else:
+        # run_polling сам удаляет webhook, если он остался от прошлого запуска
+        logger.info("Bot started in polling mode")
+        application.run_polling(timeout=config.POLLING_TIMEOUT, allowed_updates=Update.ALL_TYPES)
+
+
+def main():
+    """Главная функция запуска бота"""
+    # Проверяем что ADMIN_ID установлен
+    if config.ADMIN_ID == 0:
+        logger.error("ADMIN_ID not set! Please set your Telegram user ID in config.py")
+        return
+
+    # Воркеры графиков форкаются первыми, пока в процессе нет других потоков
+    # (пул потоков базы стартует с первым запросом, в том числе от persistence)
+    charts.start()
+    
+    # Persistence - сохраняет состояние ConversationHandler и user_data между перезапусками
+    # (в той же базе; зависшие диалоги удаляются по PERSISTENCE_TTL_HOURS)
+    persistence = SQLitePersistence(db)
+    logger.info("Persistence enabled - state will be saved to " + config.DATABASE_NAME)
+
+    # Создаем приложение с persistence
+    application = build_application(persistence)
+    startup_timer.mark('application')
+    logger.info(f"Startup took {startup_timer.total:.2f}s")
+    
     # Запускаем бота
-    logger.info("Bot started!")
-    application.run_polling(allowed_updates=Update.ALL_TYPES)
+    run(application)
+    db.close()
 
 
 if __name__ == '__main__':
+    if '--measure-startup' in sys.argv:
+        sys.exit(measure_startup())
     main()
@@ -0,0 +1,194 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional
+
+from telegram.error import Forbidden, BadRequest, NetworkError, RetryAfter
+
+import config
+from metrics import broadcast_messages
+
+logger = logging.getLogger(__name__)
+
+# Сообщений, ожидающих отправки во всех идущих рассылках (метрика bot_broadcast_queue_size)
+_queued = 0
+
+
+def queued_messages() -> int:
+    return _queued
+
+
+class RateLimiter:
+    """Равномерно распределяет запросы: не больше `rate` в секунду"""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate
+        self._next_slot = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        """Ждет свой слот. Слот резервируется под локом, а спим уже без него"""
+        loop = asyncio.get_running_loop()
+        async with self._lock:
+            now = loop.time()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        delay = slot - now
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def pause(self, seconds: float):
+        """Сдвигает все следующие слоты (после RetryAfter от Telegram)"""
+        loop = asyncio.get_running_loop()
+        self._next_slot = max(self._next_slot, loop.time() + seconds)
+
+
+class ChatRateLimiter:
+    """Лимит на один чат: не чаще одного сообщения в `interval` секунд"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._next_slot: Dict[int, float] = {}
+
+    async def acquire(self, chat_id: int):
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        slot = max(now, self._next_slot.get(chat_id, 0.0))
+        self._next_slot[chat_id] = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+@dataclass
+class BroadcastResult:
+    """Итог рассылки"""
+    total: int = 0
+    delivered: List[int] = field(default_factory=list)
+    failed: Dict[int, str] = field(default_factory=dict)
+    retries: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def done(self) -> int:
+        return len(self.delivered) + len(self.failed)
+
+    @property
+    def rate(self) -> float:
+        """Сообщений в секунду"""
+        return self.done / self.elapsed if self.elapsed else 0.0
+
+
+ProgressCallback = Callable[[BroadcastResult], Awaitable[None]]
+
+
+class Broadcaster:
+    """Параллельная рассылка в рамках flood-лимитов Telegram.
+
+    Глобальный лимит (~30 сообщений/сек на бота) и лимит на чат соблюдаются
+    заранее; если Telegram всё же ответил RetryAfter - вся рассылка
+    приостанавливается на указанное время и сообщение отправляется повторно.
+    """
+
+    def __init__(self, bot,
+                 rate: float = config.BROADCAST_RATE_LIMIT,
+                 concurrency: int = config.BROADCAST_CONCURRENCY,
+                 per_chat_interval: float = config.BROADCAST_PER_CHAT_INTERVAL,
+                 max_retries: int = config.BROADCAST_MAX_RETRIES):
+        self.bot = bot
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.limiter = RateLimiter(rate)
+        self.chat_limiter = ChatRateLimiter(per_chat_interval)
+
+    async def send(self, chat_id: int, result: BroadcastResult, **kwargs) -> bool:
+        """Отправляет одно сообщение с повторами. Возвращает True если доставлено"""
+        attempt = 0
+        while True:
+            await self.chat_limiter.acquire(chat_id)
+            await self.limiter.acquire()
+            try:
+                await self.bot.send_message(chat_id=chat_id, **kwargs)
+                broadcast_messages.inc(result='delivered')
+                return True
+            except RetryAfter as e:
+                # Flood control: тормозим всю рассылку, а не только этот чат
+                self.limiter.pause(e.retry_after)
+                error = e
+            except (Forbidden, BadRequest) as e:
+                # Бот заблокирован / чат не найден - повтор не поможет
+                result.failed[chat_id] = str(e)
+                broadcast_messages.inc(result='failed')
+                return False
+            except NetworkError as e:
+                await asyncio.sleep(2 ** attempt)
+                error = e
+
+            attempt += 1
+            result.retries += 1
+            if attempt > self.max_retries:
+                result.failed[chat_id] = str(error)
+                broadcast_messages.inc(result='failed')
+                return False
+            broadcast_messages.inc(result='retry')
+            logger.warning(f"Retrying message to {chat_id} ({attempt}/{self.max_retries}): {error}")
+
+    async def broadcast(self, chat_ids: Iterable[int],
+                        on_progress: Optional[ProgressCallback] = None,
+                        progress_interval: float = config.BROADCAST_PROGRESS_INTERVAL,
+                        **kwargs) -> BroadcastResult:
+        """Рассылает одно и то же сообщение (kwargs для send_message) по списку чатов"""
+        global _queued
+        chat_ids = list(chat_ids)
+        result = BroadcastResult(total=len(chat_ids))
+        queue: asyncio.Queue = asyncio.Queue()
+        for chat_id in chat_ids:
+            queue.put_nowait(chat_id)
+
+        started = time.monotonic()
+
+        async def worker():
+            global _queued
+            while True:
+                try:
+                    chat_id = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                _queued -= 1
+                try:
+                    if await self.send(chat_id, result, **kwargs):
+                        result.delivered.append(chat_id)
+                except Exception as e:
+                    logger.error(f"Error sending message to user {chat_id}: {e}")
+                    result.failed[chat_id] = str(e)
+                    broadcast_messages.inc(result='failed')
+
+        async def reporter():
+            while True:
+                await asyncio.sleep(progress_interval)
+                result.elapsed = time.monotonic() - started
+                try:
+                    await on_progress(result)
+                except Exception as e:
+                    logger.error(f"Error reporting broadcast progress: {e}")
+
+        workers = [asyncio.create_task(worker()) for _ in range(min(self.concurrency, len(chat_ids)))]
+        progress_task = asyncio.create_task(reporter()) if on_progress else None
+        _queued += len(chat_ids)
+        try:
+            await asyncio.gather(*workers)
+        finally:
+            # Неотправленное при отмене рассылки из очереди убираем
+            _queued -= queue.qsize()
+            for task in workers:
+                task.cancel()
+            if progress_task:
+                progress_task.cancel()
+
+        result.elapsed = time.monotonic() - started
+        logger.info(
+            f"Broadcast finished: {len(result.delivered)}/{result.total} delivered, "
+            f"{len(result.failed)} failed, {result.retries} retries, "
+            f"{result.elapsed:.1f}s ({result.rate:.1f} msg/s)"
+        )
+        return result
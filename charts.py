@@ -0,0 +1,149 @@
+import asyncio
+import io
+import logging
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+import config
+
+logger = logging.getLogger(__name__)
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def render_ratings_chart(dates: List, interest: List[float], relevance: List[float],
+                         spiritual: List[float], overall: List[float],
+                         title: str, group_by: str) -> Tuple[bytes, float]:
+    """Рисует график динамики оценок и возвращает (PNG, время рендера в секундах).
+
+    Выполняется в процессе пула: только объектный API Figure, без глобального
+    состояния pyplot.
+    """
+    # matplotlib импортируется только в процессе рендера - бот его не грузит
+    from matplotlib.dates import DateFormatter, MonthLocator, WeekdayLocator
+    from matplotlib.figure import Figure
+
+    started = time.perf_counter()
+
+    fig = Figure(figsize=(14, 7))
+    ax = fig.add_subplot()
+    ax.plot(dates, interest, marker='o', label='Цікавість', linewidth=2.5, markersize=10, color='#1f77b4')
+    ax.plot(dates, relevance, marker='s', label='Актуальність', linewidth=2.5, markersize=10, color='#ff7f0e')
+    ax.plot(dates, spiritual, marker='^', label='Духовне зростання', linewidth=2.5, markersize=10, color='#2ca02c')
+    ax.plot(dates, overall, marker='D', label='🎯 Фінальна оцінка', linewidth=3, markersize=12, color='#d62728', linestyle='--')
+
+    # Настройка осей
+    if group_by == 'week':
+        ax.set_xlabel('Тиждень', fontsize=12)
+        ax.xaxis.set_major_locator(WeekdayLocator(byweekday=0))  # Понедельники
+        ax.xaxis.set_major_formatter(DateFormatter('%d.%m'))
+    elif group_by == 'month':
+        ax.set_xlabel('Місяць', fontsize=12)
+        ax.xaxis.set_major_locator(MonthLocator())
+        ax.xaxis.set_major_formatter(DateFormatter('%b %Y'))
+    else:  # quarter
+        ax.set_xlabel('Квартал', fontsize=12)
+        ax.xaxis.set_major_locator(MonthLocator(interval=3))
+        ax.xaxis.set_major_formatter(DateFormatter('Q%q %Y'))
+
+    ax.set_ylabel('Оцінка (1-5)', fontsize=12)
+    ax.set_title(title, fontsize=14, fontweight='bold')
+    ax.legend(fontsize=11, loc='best')
+    ax.grid(True, alpha=0.3, linestyle='--')
+    fig.autofmt_xdate(rotation=45, ha='right')
+    fig.tight_layout()
+    ax.set_ylim(0, 5.5)
+
+    buf = io.BytesIO()
+    fig.savefig(buf, format='png', dpi=150, bbox_inches='tight')
+    return buf.getvalue(), time.perf_counter() - started
+
+
+def start():
+    """Создает пул и процессы-воркеры.
+
+    Процессы создаются через fork: spawn заново импортировал бы bot.py со всей
+    его инициализацией. fork копирует только вызывающий поток, поэтому start()
+    вызывается в main() до того, как появятся другие потоки (пул потоков базы,
+    писатель, persistence, Bot API): их блокировки и подключения SQLite в
+    копии процесса остались бы в произвольном состоянии.
+    """
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(
+            max_workers=config.CHART_WORKERS,
+            mp_context=multiprocessing.get_context('fork')
+        )
+        # Воркеры форкаются при первой задаче - сразу, а не при первом /graph
+        _pool.submit(int).result()
+
+
+async def render_chart(*args) -> bytes:
+    """Рендерит график в пуле процессов, не блокируя event loop.
+
+    Если пул не запущен или воркер упал (например, по памяти), график
+    рисуется в потоке: новый fork, когда в процессе уже работают потоки,
+    небезопасен, поэтому пул не пересоздается до перезапуска бота.
+    """
+    global _pool
+    loop = asyncio.get_running_loop()
+    started = time.perf_counter()
+    png = None
+    if _pool is not None:
+        try:
+            png, render_time = await loop.run_in_executor(_pool, render_ratings_chart, *args)
+            where = 'worker process'
+        except BrokenProcessPool:
+            logger.error("Chart worker pool is broken, rendering charts in a thread until restart")
+            _pool.shutdown(wait=False)
+            _pool = None
+    if png is None:
+        png, render_time = await loop.run_in_executor(None, render_ratings_chart, *args)
+        where = 'thread'
+    logger.info(
+        f"Chart rendered in {render_time:.2f}s in {where} "
+        f"({time.perf_counter() - started:.2f}s including queue and transfer)"
+    )
+    return png
+
+
+@dataclass
+class CachedChart:
+    """Готовый график и его file_id после первой загрузки в Telegram"""
+    key: tuple
+    png: bytes
+    caption: str
+    meetings: int
+    file_id: Optional[str] = None
+
+
+class ChartCache:
+    """Последний график каждого типа (month/year/all) с ключом версии данных"""
+
+    def __init__(self):
+        self._entries = {}
+
+    def get(self, graph_type: str, key: tuple) -> Optional[CachedChart]:
+        entry = self._entries.get(graph_type)
+        if entry is not None and entry.key == key:
+            logger.info(f"Chart cache hit for {graph_type}")
+            return entry
+        return None
+
+    def put(self, graph_type: str, entry: CachedChart):
+        self._entries[graph_type] = entry
+
+    def invalidate(self):
+        self._entries.clear()
+
+
+def shutdown():
+    """Останавливает пул процессов (при остановке бота)"""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
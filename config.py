@@ -3,6 +3,9 @@ import os
 # Токен бота - будет браться из переменной окружения на Render
 BOT_TOKEN = os.getenv('BOT_TOKEN', '***REVOKED_TOKEN***')
 
+# Адрес Bot API (можно указать свой локальный Bot API сервер)
+BOT_API_BASE_URL = os.getenv('BOT_API_BASE_URL', 'https://api.telegram.org/bot')
+
 # ID администратора (твой Telegram ID)
 ADMIN_ID = int(os.getenv('ADMIN_ID', '1125355606'))
 
@@ -12,5 +15,102 @@ RATING_DEADLINE_HOURS = 18
 # Время напоминания до дедлайна (в часах)
 REMINDER_BEFORE_DEADLINE_HOURS = 1
 
+# Получение апдейтов: 'polling' или 'webhook'
+# (без WEBHOOK_URL бот откатывается на polling)
+BOT_MODE = os.getenv('BOT_MODE', 'polling')
+# Публичный https адрес сервиса, например https://youth-feedback-bot.onrender.com
+WEBHOOK_URL = os.getenv('WEBHOOK_URL', '')
+WEBHOOK_LISTEN = os.getenv('WEBHOOK_LISTEN', '0.0.0.0')
+WEBHOOK_PORT = int(os.getenv('PORT', '8443'))
+WEBHOOK_PATH = 'telegram'
+# Секрет для заголовка X-Telegram-Bot-Api-Secret-Token
+# (если не задан, генерируется при каждом запуске)
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET', '')
+# Сколько апдейтов Telegram может доставлять одновременно
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv('WEBHOOK_MAX_CONNECTIONS', '40'))
+# Long polling: сколько секунд getUpdates ждет новые апдейты
+POLLING_TIMEOUT = 30
+# Сколько апдейтов (разных пользователей) обрабатывается одновременно
+UPDATE_CONCURRENCY = int(os.getenv('UPDATE_CONCURRENCY', '32'))
+
 # База данных
-DATABASE_NAME = '/var/data/youth_feedback.db'
+DATABASE_NAME = os.getenv('DATABASE_NAME', '/var/data/youth_feedback.db')
+
+# Состояние диалогов и user_data (таблицы persistence_* в той же базе):
+# как часто сохранять изменения (в секундах) и через сколько часов без
+# изменений незаконченный диалог считается зависшим
+PERSISTENCE_UPDATE_INTERVAL = 5
+PERSISTENCE_TTL_HOURS = RATING_DEADLINE_HOURS + 6
+# Как часто (в секундах) удалять зависшие диалоги, пока бот работает
+PERSISTENCE_EVICT_INTERVAL = 3600
+
+# Бекапы (gzip-снимки базы) и сколько последних хранить локально
+BACKUP_DIR = '/var/data/backups'
+BACKUP_KEEP = 8
+BACKUP_COMPRESSION_LEVEL = 6
+
+# Рассылка опросов и напоминаний
+# Telegram допускает ~30 сообщений/сек от бота и ~1 сообщение/сек в один чат
+BROADCAST_RATE_LIMIT = float(os.getenv('BROADCAST_RATE_LIMIT', '25'))
+BROADCAST_CONCURRENCY = int(os.getenv('BROADCAST_CONCURRENCY', '20'))
+BROADCAST_PER_CHAT_INTERVAL = 1.0
+BROADCAST_MAX_RETRIES = 3
+# Как часто обновлять сообщение с прогрессом рассылки (в секундах)
+BROADCAST_PROGRESS_INTERVAL = 5
+
+# Настройки SQLite (подключения постоянные, журнал WAL)
+DATABASE_SYNCHRONOUS = 'NORMAL'
+DATABASE_CACHE_SIZE_KB = 16384
+DATABASE_MMAP_SIZE = 64 * 1024 * 1024
+DATABASE_BUSY_TIMEOUT = 5.0
+DATABASE_CACHED_STATEMENTS = 256
+# Потоков для запросов к базе из асинхронных обработчиков
+DATABASE_THREADS = 4
+# Заполнение колонок после миграций схемы: строк в одной транзакции и пауза
+# между пачками (в секундах), чтобы запросы бота проходили без очереди
+BACKFILL_BATCH_SIZE = 2000
+BACKFILL_PAUSE = 0.05
+
+# Групповой коммит оценок и отзывов: писатель собирает записи не дольше
+# WRITE_QUEUE_MAX_DELAY секунд (с первой записи) или до WRITE_QUEUE_MAX_BATCH
+# штук и коммитит их одной транзакцией
+WRITE_QUEUE_MAX_BATCH = 200
+WRITE_QUEUE_MAX_DELAY = 0.005
+# Гарантии записи: 'full' - fsync на каждую пачку, 'normal' - как остальная
+# база (DATABASE_SYNCHRONOUS), 'queued' - ответ, не дожидаясь коммита
+WRITE_DURABILITY = os.getenv('WRITE_DURABILITY', 'normal')
+
+# Пользователей на одной странице /pending и /remove
+MEMBERS_PAGE_SIZE = 10
+# Оценок на одной странице /ratings (страница должна уместиться в 4096 символов)
+RATINGS_PAGE_SIZE = 20
+# Найденных отзывов на одной странице /search
+SEARCH_PAGE_SIZE = 10
+# Больше совпадений - /search показывает новые отзывы первыми вместо ранжирования
+# по релевантности (bm25 считается для каждого совпадения)
+SEARCH_RANK_LIMIT = 20000
+
+# Как часто сверять кеш одобренных/ожидающих пользователей с базой (в секундах)
+MEMBERSHIP_CHECK_INTERVAL = 3600
+
+# Метрики в формате Prometheus: GET http://METRICS_HOST:METRICS_PORT/metrics
+# (METRICS_PORT=0 - не поднимать endpoint; сводка всегда доступна в /metrics)
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+METRICS_PORT = int(os.getenv('METRICS_PORT', '9464'))
+# Соединений к Bot API (как по умолчанию в python-telegram-bot)
+BOT_CONNECTION_POOL_SIZE = 256
+
+# Мониторинг задержки event loop (в секундах)
+LOOP_LAG_CHECK_INTERVAL = 0.5
+LOOP_LAG_WARN_THRESHOLD = 0.25
+
+# Процессов для рендера графиков
+CHART_WORKERS = int(os.getenv('CHART_WORKERS', '1'))
+
+# Бюджет времени запуска bot.py до начала polling (в секундах),
+# проверяется командой: python bot.py --measure-startup
+STARTUP_BUDGET_SECONDS = 1.5
+
+# Excel экспорт: строк за одно чтение из курсора и строк для расчета ширины колонок
+EXPORT_BATCH_SIZE = 1000
+EXPORT_WIDTH_SAMPLE_ROWS = 200
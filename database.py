@@ -1,7 +1,445 @@
+import asyncio
+import functools
+import logging
+import re
 import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from datetime import datetime
 from typing import List, Tuple, Optional
 import config
+from metrics import db_errors, db_query_seconds
+from write_queue import GroupCommitWriter
+
+logger = logging.getLogger(__name__)
+
+
+# Версия базовой схемы, которую создает init_database. Дальше схема меняется
+# только миграциями из MIGRATIONS
+BASE_SCHEMA_VERSION = 6
+
+# Индексы для горячих запросов: имя -> DDL
+INDEXES = {
+    # add_rating / mark_not_attended / get_users_for_reminder; заодно не дает
+    # зарегистрировать пользователя на встречу дважды
+    'idx_user_responses_meeting_user':
+        'CREATE UNIQUE INDEX IF NOT EXISTS idx_user_responses_meeting_user '
+        'ON user_responses (meeting_id, user_id)',
+    # Страницы /ratings: оценки встречи по (rating_date, rating_id)
+    # (rating_id - это rowid, он и так есть в каждом индексе)
+    'idx_ratings_meeting_date':
+        'CREATE INDEX IF NOT EXISTS idx_ratings_meeting_date '
+        'ON ratings (meeting_id, rating_date)',
+    # Отзывы встречи в порядке добавления
+    'idx_feedback_meeting_date':
+        'CREATE INDEX IF NOT EXISTS idx_feedback_meeting_date '
+        'ON feedback (meeting_id, feedback_date)',
+    # Загрузка запланированных событий при старте
+    'idx_scheduled_events_pending':
+        'CREATE INDEX IF NOT EXISTS idx_scheduled_events_pending '
+        'ON scheduled_events (done, run_at)',
+    # Страницы /pending и /remove (keyset по ключу сортировки)
+    'idx_pending_users_request':
+        'CREATE INDEX IF NOT EXISTS idx_pending_users_request '
+        'ON pending_users (request_date, user_id)',
+    'idx_users_name':
+        'CREATE INDEX IF NOT EXISTS idx_users_name '
+        'ON users (first_name, user_id)',
+}
+
+# Списки пользователей для постраничного просмотра:
+# (таблица, колонки, колонка сортировки; user_id - второй ключ сортировки)
+MEMBER_LISTS = {
+    'pending': ('pending_users', 'user_id, username, first_name, last_name, request_date', 'request_date'),
+    'approved': ('users', 'user_id, username, first_name, last_name', 'first_name'),
+}
+
+# Начало периода для графиков по времени начала встречи {ts} (UTC epoch),
+# в местном времени сервера, как и текстовые даты (YYYY-MM-DD):
+# неделя с понедельника, месяц, квартал
+ROLLUP_PERIODS = {
+    'week': "date({ts}, 'unixepoch', 'localtime', 'weekday 0', '-6 days')",
+    'month': "strftime('%Y-%m-01', {ts}, 'unixepoch', 'localtime')",
+    'quarter': "printf('%s-%02d-01', strftime('%Y', {ts}, 'unixepoch', 'localtime'), "
+               "(CAST(strftime('%m', {ts}, 'unixepoch', 'localtime') AS INTEGER) - 1) / 3 * 3 + 1)",
+}
+
+# Агрегаты meeting_aggregates, посчитанные заново по таблице ratings
+AGGREGATES_FROM_RATINGS = '''
+    SELECT 
+        meeting_id,
+        SUM(attended = 1),
+        SUM(attended = 0),
+        SUM(CASE WHEN attended = 1 THEN interest_rating ELSE 0 END),
+        SUM(CASE WHEN attended = 1 THEN relevance_rating ELSE 0 END),
+        SUM(CASE WHEN attended = 1 THEN spiritual_growth_rating ELSE 0 END)
+    FROM ratings
+    GROUP BY meeting_id
+'''
+
+# === Горячие запросы ===
+# Методы Database выполняют именно эти строки, и их же проверяет
+# explain_query_plans (manage.py check-indexes, tests/test_query_plans.py),
+# поэтому аудит не расходится с тем, что выполняется на самом деле
+
+# add_rating / mark_not_attended
+MARK_RESPONDED_SQL = '''
+    UPDATE user_responses 
+    SET has_responded = 1 
+    WHERE meeting_id = ? AND user_id = ?
+'''
+
+# get_users_for_reminder / claim_reminders
+REMINDER_USERS_SQL = '''
+    SELECT user_id FROM user_responses 
+    WHERE meeting_id = ? AND has_responded = 0 AND reminded = 0
+'''
+
+# get_meeting_stats: отзывы встречи
+MEETING_FEEDBACK_SQL = '''
+    SELECT feedback_text, feedback_date 
+    FROM feedback 
+    WHERE meeting_id = ?
+    ORDER BY feedback_date
+'''
+
+ACTIVE_MEETING_SQL = '''
+    SELECT meeting_id FROM youth_meetings 
+    WHERE is_active = 1 
+    ORDER BY start_ts DESC 
+    LIMIT 1
+'''
+
+# get_pending_events: все невыполненные события или события одной встречи
+PENDING_EVENTS_SQL = '''
+    SELECT event_id, meeting_id, kind, run_at FROM scheduled_events
+    WHERE done = 0 {condition}
+    ORDER BY run_at
+'''
+
+# get_ratings_page: первая страница, страница после оценки и перед оценкой
+RATINGS_PAGE_COLUMNS = ('rating_id, interest_rating, relevance_rating, spiritual_growth_rating, '
+                        'attended, rating_date')
+_RATINGS_ANCHOR = '(SELECT rating_date, rating_id FROM ratings WHERE rating_id = ?)'
+RATINGS_PAGE_SQL = {
+    'first': f'''
+        SELECT {RATINGS_PAGE_COLUMNS} FROM ratings
+        WHERE meeting_id = ?
+        ORDER BY rating_date, rating_id LIMIT ?
+    ''',
+    'after': f'''
+        SELECT {RATINGS_PAGE_COLUMNS} FROM ratings
+        WHERE meeting_id = ? AND (rating_date, rating_id) > {_RATINGS_ANCHOR}
+        ORDER BY rating_date, rating_id LIMIT ?
+    ''',
+    'before': f'''
+        SELECT {RATINGS_PAGE_COLUMNS} FROM ratings
+        WHERE meeting_id = ? AND (rating_date, rating_id) < {_RATINGS_ANCHOR}
+        ORDER BY rating_date DESC, rating_id DESC LIMIT ?
+    ''',
+}
+
+
+def members_page_sql(table: str, columns: str, sort_column: str) -> dict:
+    """Запросы get_members_page для одного списка из MEMBER_LISTS"""
+    order = f'{sort_column}, user_id'
+    key = f'(SELECT {sort_column}, user_id FROM {table} WHERE user_id = ?)'
+    return {
+        'anchor': f'SELECT {sort_column}, user_id FROM {table} WHERE user_id = ?',
+        'first': f'''
+            SELECT {columns} FROM {table} WHERE user_id != ? ORDER BY {order} LIMIT ?
+        ''',
+        'after': f'''
+            SELECT {columns} FROM {table}
+            WHERE user_id != ? AND ({order}) > (?, ?)
+            ORDER BY {order} LIMIT ?
+        ''',
+        'before': f'''
+            SELECT {columns} FROM {table}
+            WHERE user_id != ? AND ({order}) < (?, ?)
+            ORDER BY {sort_column} DESC, user_id DESC LIMIT ?
+        ''',
+        # Есть ли пользователи перед первым и после последнего на странице
+        'prev': f'''
+            SELECT user_id FROM {table}
+            WHERE user_id != ? AND ({order}) < {key}
+            ORDER BY {sort_column} DESC, user_id DESC LIMIT 1
+        ''',
+        'next': f'''
+            SELECT 1 FROM {table}
+            WHERE user_id != ? AND ({order}) > {key}
+            LIMIT 1
+        ''',
+        'count': f'SELECT COUNT(*) FROM {table} WHERE user_id != ?',
+    }
+
+
+MEMBERS_PAGE_SQL = {kind: members_page_sql(*spec) for kind, spec in MEMBER_LISTS.items()}
+
+
+def rating_rollup_sql(period: str, start_ts: str = 'm.start_ts') -> str:
+    """Запрос get_rating_rollup: period - ключ ROLLUP_PERIODS, start_ts -
+    выражение времени начала встречи (START_TS_FALLBACK, пока идет заполнение)"""
+    return f'''
+        SELECT 
+            {ROLLUP_PERIODS[period].format(ts=start_ts)} AS bucket_start,
+            COUNT(*),
+            COALESCE(SUM(a.attended_count), 0) AS attended,
+            COALESCE(SUM(a.interest_sum), 0),
+            COALESCE(SUM(a.relevance_sum), 0),
+            COALESCE(SUM(a.spiritual_sum), 0)
+        FROM youth_meetings m
+        LEFT JOIN meeting_aggregates a ON m.meeting_id = a.meeting_id
+        WHERE m.is_active = 0 AND {start_ts} >= ?
+        GROUP BY bucket_start
+        HAVING attended > 0
+        ORDER BY bucket_start
+    '''
+
+
+# Запросы, которые обязаны использовать индекс: (описание, SQL, параметры, индекс)
+# (для поиска по первичному ключу в плане пишется 'INTEGER PRIMARY KEY').
+# Запасной вариант get_rating_rollup (START_TS_FALLBACK) индекс не использует
+# и работает только пока миграция заполняет start_ts
+QUERY_PLAN_CHECKS = [
+    ('add_rating: отметка ответа', MARK_RESPONDED_SQL, (1, 1), 'idx_user_responses_meeting_user'),
+    ('get_users_for_reminder', REMINDER_USERS_SQL, (1,), 'idx_user_responses_meeting_user'),
+    ('get_meeting_stats: отзывы', MEETING_FEEDBACK_SQL, (1,), 'idx_feedback_meeting_date'),
+    ('get_active_meeting', ACTIVE_MEETING_SQL, (), 'idx_meetings_active_start_ts'),
+    ('get_pending_events', PENDING_EVENTS_SQL.format(condition=''), (), 'idx_scheduled_events_pending'),
+    ('get_pending_events: встреча', PENDING_EVENTS_SQL.format(condition='AND meeting_id = ?'), (1,),
+     'idx_scheduled_events_pending'),
+] + [
+    (f'get_ratings_page: {variant}', sql, (1,) * sql.count('?'), 'idx_ratings_meeting_date')
+    for variant, sql in RATINGS_PAGE_SQL.items()
+] + [
+    (f'get_rating_rollup: {period}', rating_rollup_sql(period), (0,), 'idx_meetings_active_start_ts')
+    for period in ROLLUP_PERIODS
+] + [
+    ('get_rating_rollup: агрегаты встречи', rating_rollup_sql('month'), (0,), 'INTEGER PRIMARY KEY'),
+] + [
+    (f'get_members_page: {kind} {variant}', MEMBERS_PAGE_SQL[kind][variant],
+     (0,) * MEMBERS_PAGE_SQL[kind][variant].count('?'), index)
+    for kind, index in (('pending', 'idx_pending_users_request'), ('approved', 'idx_users_name'))
+    for variant in ('first', 'after', 'before', 'prev', 'next')
+]
+
+
+# Полнотекстовый поиск по отзывам (/search). Внешнее содержимое: тексты
+# хранятся только в feedback, а индекс поддерживают триггеры
+FEEDBACK_FTS_DDL = [
+    '''
+    CREATE VIRTUAL TABLE IF NOT EXISTS feedback_fts USING fts5(
+        feedback_text,
+        content = 'feedback',
+        content_rowid = 'feedback_id',
+        tokenize = 'unicode61 remove_diacritics 2'
+    )
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS feedback_fts_insert AFTER INSERT ON feedback BEGIN
+        INSERT INTO feedback_fts (rowid, feedback_text) VALUES (new.feedback_id, new.feedback_text);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS feedback_fts_delete AFTER DELETE ON feedback BEGIN
+        INSERT INTO feedback_fts (feedback_fts, rowid, feedback_text)
+        VALUES ('delete', old.feedback_id, old.feedback_text);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS feedback_fts_update AFTER UPDATE OF feedback_text ON feedback BEGIN
+        INSERT INTO feedback_fts (feedback_fts, rowid, feedback_text)
+        VALUES ('delete', old.feedback_id, old.feedback_text);
+        INSERT INTO feedback_fts (rowid, feedback_text) VALUES (new.feedback_id, new.feedback_text);
+    END
+    ''',
+]
+
+# Маркеры совпадений в snippet() (заменяются на разметку при выводе)
+MATCH_START, MATCH_END = '\x02', '\x03'
+
+
+def fts_query(text: str) -> Optional[str]:
+    """Запрос пользователя -> запрос FTS5: все слова, каждое как префикс
+    ("молит" находит "молитва"). Синтаксис FTS5 из ввода не пропускается"""
+    words = re.findall(r'\w+', text.lower())
+    if not words:
+        return None
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def to_epoch(value: datetime) -> int:
+    """Дата без часового пояса (местное время сервера, как datetime.now())
+    -> секунды UTC epoch"""
+    return int(value.timestamp())
+
+
+def iso_to_epoch(value: Optional[str]) -> Optional[int]:
+    """Текстовая дата из базы (isoformat) -> UTC epoch. Зарегистрирована в
+    каждом подключении как SQL функция iso_to_epoch() для заполнения колонок"""
+    if value is None:
+        return None
+    return to_epoch(datetime.fromisoformat(value))
+
+
+@dataclass(frozen=True)
+class Backfill:
+    """Заполнение новой колонки в уже существующих строках: column = expression"""
+    table: str
+    column: str
+    expression: str
+
+
+@dataclass(frozen=True)
+class Migration:
+    """Шаг схемы после BASE_SCHEMA_VERSION.
+    
+    statements выполняются одной транзакцией вместе с PRAGMA user_version,
+    поэтому должны быть быстрыми (ALTER TABLE ADD COLUMN в SQLite меняет
+    только схему, не строки). Все, что требует переписать строки, - в
+    backfills: они выполняются потом, небольшими транзакциями по порядку
+    rowid, пока бот работает (см. Database.backfill_batch).
+    """
+    version: int
+    name: str
+    statements: Tuple[str, ...]
+    backfills: Tuple[Backfill, ...] = ()
+
+
+MIGRATIONS = [
+    # Время в UTC epoch рядом с текстовыми датами: сравнение и группировка по
+    # периодам идут по целым числам и индексу, без разбора строк. Текстовые
+    # колонки остаются для отображения и экспорта
+    Migration(7, 'epoch timestamps', (
+        'ALTER TABLE youth_meetings ADD COLUMN start_ts INTEGER',
+        'ALTER TABLE youth_meetings ADD COLUMN deadline_ts INTEGER',
+        'ALTER TABLE ratings ADD COLUMN rating_ts INTEGER',
+        'ALTER TABLE feedback ADD COLUMN feedback_ts INTEGER',
+        'ALTER TABLE users ADD COLUMN joined_ts INTEGER',
+        'ALTER TABLE pending_users ADD COLUMN request_ts INTEGER',
+        # get_active_meeting и get_rating_rollup (закрытые встречи за период);
+        # заменяет индекс по текстовой start_date
+        'CREATE INDEX IF NOT EXISTS idx_meetings_active_start_ts ON youth_meetings (is_active, start_ts)',
+        'DROP INDEX IF EXISTS idx_meetings_active_start',
+    ), (
+        Backfill('youth_meetings', 'start_ts', 'iso_to_epoch(start_date)'),
+        Backfill('youth_meetings', 'deadline_ts', 'iso_to_epoch(deadline_date)'),
+        Backfill('users', 'joined_ts', 'iso_to_epoch(joined_date)'),
+        Backfill('pending_users', 'request_ts', 'iso_to_epoch(request_date)'),
+        Backfill('ratings', 'rating_ts', 'iso_to_epoch(rating_date)'),
+        Backfill('feedback', 'feedback_ts', 'iso_to_epoch(feedback_date)'),
+    )),
+    # Статистика и графики читают meeting_aggregates, а не ratings: индекс
+    # (meeting_id, attended) только замедлял каждую вставку оценки. Полный
+    # пересчет агрегатов (manage.py) идет по idx_ratings_meeting_date
+    Migration(8, 'drop idx_ratings_meeting_attended', (
+        'DROP INDEX IF EXISTS idx_ratings_meeting_attended',
+    )),
+]
+
+# Версия схемы (PRAGMA user_version) после всех миграций
+SCHEMA_VERSION = MIGRATIONS[-1].version if MIGRATIONS else BASE_SCHEMA_VERSION
+EPOCH_TIMESTAMPS_VERSION = 7
+
+# Время начала встречи, пока start_ts заполнен не во всех строках
+START_TS_FALLBACK = 'COALESCE(m.start_ts, iso_to_epoch(m.start_date))'
+
+
+class PooledConnection:
+    """Постоянное подключение потока.
+    
+    Ведет себя как sqlite3.Connection, но close() не закрывает подключение,
+    а возвращает его в пул (незакоммиченные изменения откатываются, как и
+    при настоящем закрытии).
+    """
+    __slots__ = ('_conn',)
+    
+    def __init__(self, conn: sqlite3.Connection):
+        self._conn = conn
+    
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+    
+    def __enter__(self):
+        return self._conn.__enter__()
+    
+    def __exit__(self, *exc):
+        return self._conn.__exit__(*exc)
+    
+    def close(self):
+        if self._conn.in_transaction:
+            self._conn.rollback()
+
+
+class MembershipCache:
+    """Одобренные и ожидающие пользователи в памяти процесса.
+    
+    Загружается при старте и обновляется сразу после коммита в методах,
+    которые меняют users/pending_users (write-through), поэтому проверки
+    доступа не ходят в базу. hits - проверки из памяти, misses - проверки,
+    которым пришлось идти в базу (кеш еще не загружен).
+    """
+    
+    def __init__(self):
+        self.approved = set()
+        self.pending = set()
+        self.loaded = False
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+    
+    def load(self, approved, pending):
+        with self._lock:
+            self.approved = set(approved)
+            self.pending = set(pending)
+            self.loaded = True
+    
+    def is_approved(self, user_id: int) -> Optional[bool]:
+        """None, если кеш не загружен"""
+        if not self.loaded:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return user_id in self.approved
+    
+    def is_pending(self, user_id: int) -> Optional[bool]:
+        """None, если кеш не загружен"""
+        if not self.loaded:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return user_id in self.pending
+    
+    def add_pending(self, user_id: int):
+        with self._lock:
+            self.pending.add(user_id)
+    
+    def approve(self, user_id: int):
+        with self._lock:
+            self.pending.discard(user_id)
+            self.approved.add(user_id)
+    
+    def reject(self, user_id: int):
+        with self._lock:
+            self.pending.discard(user_id)
+    
+    def remove(self, user_id: int):
+        with self._lock:
+            self.approved.discard(user_id)
+    
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            'approved': len(self.approved),
+            'pending': len(self.pending),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+        }
+
 
 class Database:
     def __init__(self, db_name: str = config.DATABASE_NAME):
@@ -11,11 +449,81 @@ class Database:
         db_dir = os.path.dirname(self.db_name)
         if db_dir:
             os.makedirs(db_dir, exist_ok=True)
-        self.init_database()
+        # Одно постоянное подключение на поток (sqlite3 не разрешает делить их между потоками)
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        self._backfill_lock = threading.Lock()
+        # Курсоры заполнения: (таблица, колонка) -> последний обработанный rowid
+        # (None - таблица заполнена)
+        self._backfill_progress = {}
+        # DDL выполняется только если схема базы устарела (ускоряет запуск)
+        version = self.get_schema_version()
+        if version < BASE_SCHEMA_VERSION:
+            self.init_database()
+        if version < SCHEMA_VERSION:
+            self.migrate()
+        self.pending_backfills = self._load_pending_backfills()
+        # Проверки доступа отвечают из памяти
+        self.membership = MembershipCache()
+        self.load_membership()
     
     def get_connection(self):
-        """Создает подключение к БД"""
-        return sqlite3.connect(self.db_name)
+        """Возвращает постоянное подключение текущего потока"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        elif conn.in_transaction:
+            # Предыдущий вызов упал до commit/close - не продолжаем его транзакцию
+            conn.rollback()
+        return PooledConnection(conn)
+    
+    def _connect(self) -> sqlite3.Connection:
+        """Открывает новое подключение и настраивает его"""
+        # check_same_thread=False только ради close() при остановке:
+        # в работе подключением пользуется лишь поток, который его открыл
+        conn = sqlite3.connect(
+            self.db_name,
+            timeout=config.DATABASE_BUSY_TIMEOUT,
+            cached_statements=config.DATABASE_CACHED_STATEMENTS,
+            check_same_thread=False,
+        )
+        # WAL: читатели не блокируют писателя; в этом режиме NORMAL достаточно,
+        # чтобы пережить падение процесса (при отключении питания можно потерять
+        # последние транзакции, но не целостность базы)
+        conn.execute('PRAGMA journal_mode = WAL')
+        conn.execute(f'PRAGMA synchronous = {config.DATABASE_SYNCHRONOUS}')
+        conn.execute(f'PRAGMA cache_size = -{config.DATABASE_CACHE_SIZE_KB}')
+        conn.execute(f'PRAGMA mmap_size = {config.DATABASE_MMAP_SIZE}')
+        conn.execute('PRAGMA temp_store = MEMORY')
+        conn.create_function('iso_to_epoch', 1, iso_to_epoch, deterministic=True)
+        return conn
+    
+    def snapshot(self, path: str):
+        """Согласованный снимок базы в файл через SQLite backup API
+        (без риска скопировать страницу посреди записи)"""
+        target = sqlite3.connect(path)
+        try:
+            conn = self.get_connection()
+            conn.backup(target)
+            conn.close()
+            # Снимок - самостоятельный файл, без -wal рядом
+            target.execute('PRAGMA journal_mode = DELETE')
+        finally:
+            target.close()
+    
+    def close(self):
+        """Закрывает все постоянные подключения (при остановке бота)"""
+        with self._connections_lock:
+            for conn in self._connections:
+                # Обновляет статистику планировщика для индексов, если она устарела
+                conn.execute('PRAGMA optimize')
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
     
     def init_database(self):
         """Инициализирует структуру базы данных"""
@@ -91,9 +599,314 @@ class Database:
             )
         ''')
         
+        # Накопительные суммы по встречам, обновляются вместе с каждой оценкой
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'meeting_aggregates'")
+        aggregates_exist = cursor.fetchone() is not None
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS meeting_aggregates (
+                meeting_id INTEGER PRIMARY KEY,
+                attended_count INTEGER NOT NULL DEFAULT 0,
+                not_attended_count INTEGER NOT NULL DEFAULT 0,
+                interest_sum INTEGER NOT NULL DEFAULT 0,
+                relevance_sum INTEGER NOT NULL DEFAULT 0,
+                spiritual_sum INTEGER NOT NULL DEFAULT 0,
+                FOREIGN KEY (meeting_id) REFERENCES youth_meetings (meeting_id)
+            )
+        ''')
+        if not aggregates_exist:
+            self._rebuild_aggregates(cursor)
+        
+        # Запланированные события опросов (напоминание, закрытие) - переживают перезапуск
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'scheduled_events'")
+        events_exist = cursor.fetchone() is not None
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS scheduled_events (
+                event_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                meeting_id INTEGER NOT NULL,
+                kind TEXT NOT NULL,
+                run_at TEXT NOT NULL,
+                done INTEGER NOT NULL DEFAULT 0,
+                FOREIGN KEY (meeting_id) REFERENCES youth_meetings (meeting_id)
+            )
+        ''')
+        if not events_exist:
+            # Активные опросы из старой версии получают события по своему дедлайну
+            cursor.execute('SELECT meeting_id, deadline_date FROM youth_meetings WHERE is_active = 1')
+            for meeting_id, deadline_date in cursor.fetchall():
+                self._schedule_meeting_events(cursor, meeting_id, datetime.fromisoformat(deadline_date))
+        
+        # Состояние диалогов и user_data бота (SQLitePersistence), по строке на ключ
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS persistence_user_data (
+                user_id INTEGER PRIMARY KEY,
+                data BLOB NOT NULL,
+                updated_at TEXT NOT NULL
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS persistence_conversations (
+                name TEXT NOT NULL,
+                conversation_key TEXT NOT NULL,
+                state BLOB NOT NULL,
+                updated_at TEXT NOT NULL,
+                PRIMARY KEY (name, conversation_key)
+            )
+        ''')
+        
+        self._create_indexes(cursor)
+        self._create_search_index(cursor)
+        
+        cursor.execute(f'PRAGMA user_version = {BASE_SCHEMA_VERSION}')
         conn.commit()
         conn.close()
     
+    def get_schema_version(self) -> int:
+        """Версия схемы, записанная в базе (0 - новая или старая база)"""
+        conn = self.get_connection()
+        version = conn.execute('PRAGMA user_version').fetchone()[0]
+        conn.close()
+        return version
+    
+    # === Миграции схемы ===
+    
+    def migrate(self) -> List[int]:
+        """Применяет по порядку миграции новее версии базы, каждую своей
+        транзакцией. Возвращает версии примененных миграций.
+        
+        Версия перечитывается под блокировкой записи (BEGIN IMMEDIATE), так что
+        бот и manage.py, запущенные одновременно, не применят шаг дважды.
+        """
+        applied = []
+        conn = self.get_connection()
+        try:
+            for migration in MIGRATIONS:
+                conn.execute('BEGIN IMMEDIATE')
+                version = conn.execute('PRAGMA user_version').fetchone()[0]
+                if version >= migration.version:
+                    conn.rollback()
+                    continue
+                cursor = conn.cursor()
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS schema_migrations (
+                        version INTEGER PRIMARY KEY,
+                        name TEXT NOT NULL,
+                        applied_at TEXT NOT NULL,
+                        backfilled_at TEXT
+                    )
+                ''')
+                for statement in migration.statements:
+                    cursor.execute(statement)
+                now = datetime.now().isoformat()
+                cursor.execute('''
+                    INSERT OR REPLACE INTO schema_migrations (version, name, applied_at, backfilled_at)
+                    VALUES (?, ?, ?, ?)
+                ''', (migration.version, migration.name, now, None if migration.backfills else now))
+                cursor.execute(f'PRAGMA user_version = {migration.version}')
+                conn.commit()
+                applied.append(migration.version)
+                logger.info(f"Applied migration {migration.version}: {migration.name}")
+        finally:
+            conn.close()
+        return applied
+    
+    def _load_pending_backfills(self) -> List[Migration]:
+        """Примененные миграции, строки которых еще не заполнены до конца"""
+        if not MIGRATIONS:
+            return []
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('SELECT version FROM schema_migrations WHERE backfilled_at IS NULL')
+        versions = {row[0] for row in cursor.fetchall()}
+        conn.close()
+        return [migration for migration in MIGRATIONS if migration.version in versions]
+    
+    def is_backfilled(self, version: int) -> bool:
+        """Заполнены ли колонки миграции во всех строках (до этого запросы
+        берут значение из старых колонок там, где новое еще пустое)"""
+        return all(migration.version != version for migration in self.pending_backfills)
+    
+    def backfill_batch(self, batch_size: int = config.BACKFILL_BATCH_SIZE) -> Optional[int]:
+        """Заполняет следующую пачку строк первой незаконченной миграции.
+        
+        Пачка - следующие batch_size существующих строк одной таблицы с
+        пустой колонкой (по rowid после курсора), одна короткая транзакция:
+        блокировка записи держится миллисекунды, и запросы бота проходят между
+        пачками. Курсор - последний обработанный rowid, а не диапазон: в users
+        и pending_users rowid - это Telegram user_id (до ~7e9), и шаги по
+        диапазонам почти всегда были бы пустыми. Строки, добавленные после
+        миграции, уже записаны с новыми колонками и просто пропускаются.
+        Возвращает количество обновленных строк или None, если заполнять
+        больше нечего.
+        """
+        with self._backfill_lock:
+            if not self.pending_backfills:
+                return None
+            migration = self.pending_backfills[0]
+            conn = self.get_connection()
+            try:
+                for backfill in migration.backfills:
+                    key = (backfill.table, backfill.column)
+                    position = self._backfill_progress.get(key, 0)
+                    if position is None:
+                        continue
+                    with conn:
+                        cursor = conn.cursor()
+                        cursor.execute(f'''
+                            SELECT rowid FROM {backfill.table}
+                            WHERE rowid > ? AND {backfill.column} IS NULL
+                            ORDER BY rowid LIMIT ?
+                        ''', (position, batch_size))
+                        rowids = [row[0] for row in cursor.fetchall()]
+                        if not rowids:
+                            # Таблица заполнена
+                            self._backfill_progress[key] = None
+                            continue
+                        cursor.execute(f'''
+                            UPDATE {backfill.table} SET {backfill.column} = {backfill.expression}
+                            WHERE rowid BETWEEN ? AND ? AND {backfill.column} IS NULL
+                        ''', (rowids[0], rowids[-1]))
+                    self._backfill_progress[key] = rowids[-1]
+                    return cursor.rowcount
+                
+                with conn:
+                    conn.execute(
+                        'UPDATE schema_migrations SET backfilled_at = ? WHERE version = ?',
+                        (datetime.now().isoformat(), migration.version)
+                    )
+            finally:
+                conn.close()
+            self.pending_backfills = self.pending_backfills[1:]
+            logger.info(f"Backfilled migration {migration.version}: {migration.name}")
+            return 0
+    
+    def backfill(self, batch_size: int = config.BACKFILL_BATCH_SIZE) -> int:
+        """Заполняет все незаконченные миграции сразу (manage.py backfill).
+        Возвращает количество обновленных строк"""
+        updated = 0
+        while True:
+            rows = self.backfill_batch(batch_size)
+            if rows is None:
+                return updated
+            updated += rows
+    
+    def _create_indexes(self, cursor):
+        """Создает индексы из INDEXES (недостающие)"""
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'index'")
+        existing = {row[0] for row in cursor.fetchall()}
+        
+        if 'idx_user_responses_meeting_user' not in existing:
+            # Перед уникальным индексом схлопываем возможные дубли,
+            # сохраняя отметки "ответил" и "напомнили"
+            cursor.execute('''
+                UPDATE user_responses SET
+                    has_responded = (
+                        SELECT MAX(d.has_responded) FROM user_responses d
+                        WHERE d.meeting_id = user_responses.meeting_id AND d.user_id = user_responses.user_id
+                    ),
+                    reminded = (
+                        SELECT MAX(d.reminded) FROM user_responses d
+                        WHERE d.meeting_id = user_responses.meeting_id AND d.user_id = user_responses.user_id
+                    )
+                WHERE response_id IN (
+                    SELECT MIN(response_id) FROM user_responses
+                    GROUP BY meeting_id, user_id HAVING COUNT(*) > 1
+                )
+            ''')
+            cursor.execute('''
+                DELETE FROM user_responses WHERE response_id NOT IN (
+                    SELECT MIN(response_id) FROM user_responses GROUP BY meeting_id, user_id
+                )
+            ''')
+        
+        for name, ddl in INDEXES.items():
+            if name not in existing:
+                cursor.execute(ddl)
+    
+    def explain_query_plans(self) -> List[dict]:
+        """Проверяет через EXPLAIN QUERY PLAN, что горячие запросы используют свои индексы"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        results = []
+        for query, sql, params, index in QUERY_PLAN_CHECKS:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            plan = [row[3] for row in cursor.fetchall()]
+            results.append({
+                'query': query,
+                'index': index,
+                'plan': plan,
+                'ok': any(re.search(rf'\b{index}\b', line) for line in plan),
+            })
+        conn.close()
+        return results
+    
+    # === Агрегаты по встречам ===
+    
+    @staticmethod
+    def _add_to_aggregates(cursor, meeting_id: int, interest: int, relevance: int,
+                           spiritual_growth: int, attended: bool):
+        """Учитывает одну оценку в meeting_aggregates (в транзакции вызывающего)"""
+        if attended:
+            values = (meeting_id, 1, 0, interest, relevance, spiritual_growth)
+        else:
+            values = (meeting_id, 0, 1, 0, 0, 0)
+        cursor.execute('''
+            INSERT INTO meeting_aggregates 
+            (meeting_id, attended_count, not_attended_count, interest_sum, relevance_sum, spiritual_sum)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT (meeting_id) DO UPDATE SET
+                attended_count = attended_count + excluded.attended_count,
+                not_attended_count = not_attended_count + excluded.not_attended_count,
+                interest_sum = interest_sum + excluded.interest_sum,
+                relevance_sum = relevance_sum + excluded.relevance_sum,
+                spiritual_sum = spiritual_sum + excluded.spiritual_sum
+        ''', values)
+    
+    @staticmethod
+    def _rebuild_aggregates(cursor):
+        """Пересчитывает meeting_aggregates по сырым оценкам"""
+        cursor.execute('DELETE FROM meeting_aggregates')
+        cursor.execute(f'''
+            INSERT INTO meeting_aggregates 
+            (meeting_id, attended_count, not_attended_count, interest_sum, relevance_sum, spiritual_sum)
+            {AGGREGATES_FROM_RATINGS}
+        ''')
+    
+    def rebuild_aggregates(self) -> int:
+        """Пересобирает meeting_aggregates и возвращает количество встреч"""
+        conn = self.get_connection()
+        with conn:
+            cursor = conn.cursor()
+            self._rebuild_aggregates(cursor)
+            cursor.execute('SELECT COUNT(*) FROM meeting_aggregates')
+            count = cursor.fetchone()[0]
+        conn.close()
+        return count
+    
+    def verify_aggregates(self) -> List[int]:
+        """Сверяет meeting_aggregates с сырыми оценками, возвращает ID расходящихся встреч"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute(f'''
+            SELECT meeting_id FROM (
+                SELECT * FROM ({AGGREGATES_FROM_RATINGS})
+                EXCEPT
+                SELECT meeting_id, attended_count, not_attended_count, interest_sum, relevance_sum, spiritual_sum
+                FROM meeting_aggregates
+                UNION ALL
+                SELECT * FROM (
+                    SELECT meeting_id, attended_count, not_attended_count, interest_sum, relevance_sum, spiritual_sum
+                    FROM meeting_aggregates
+                    EXCEPT
+                    {AGGREGATES_FROM_RATINGS}
+                )
+            )
+            GROUP BY meeting_id
+            ORDER BY meeting_id
+        ''')
+        mismatched = [row[0] for row in cursor.fetchall()]
+        conn.close()
+        return mismatched
+    
     # === Работа с пользователями ===
     
     def add_pending_user(self, user_id: int, username: str, first_name: str, last_name: str):
@@ -101,12 +914,14 @@ class Database:
         conn = self.get_connection()
         cursor = conn.cursor()
         try:
+            now = datetime.now()
             cursor.execute('''
                 INSERT OR REPLACE INTO pending_users 
-                (user_id, username, first_name, last_name, request_date)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (user_id, username, first_name, last_name, datetime.now().isoformat()))
+                (user_id, username, first_name, last_name, request_date, request_ts)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (user_id, username, first_name, last_name, now.isoformat(), to_epoch(now)))
             conn.commit()
+            self.membership.add_pending(user_id)
             return True
         except Exception as e:
             print(f"Error adding pending user: {e}")
@@ -114,15 +929,6 @@ class Database:
         finally:
             conn.close()
     
-    def get_pending_users(self) -> List[Tuple]:
-        """Получает список пользователей ожидающих одобрения"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('SELECT * FROM pending_users')
-        users = cursor.fetchall()
-        conn.close()
-        return users
-    
     def approve_user(self, user_id: int) -> bool:
         """Одобряет пользователя и переносит его в основную таблицу"""
         conn = self.get_connection()
@@ -137,17 +943,19 @@ class Database:
             return False
         
         # Добавляем в users
+        now = datetime.now()
         cursor.execute('''
             INSERT OR REPLACE INTO users 
-            (user_id, username, first_name, last_name, joined_date)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (user_data[0], user_data[1], user_data[2], user_data[3], datetime.now().isoformat()))
+            (user_id, username, first_name, last_name, joined_date, joined_ts)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (user_data[0], user_data[1], user_data[2], user_data[3], now.isoformat(), to_epoch(now)))
         
         # Удаляем из pending
         cursor.execute('DELETE FROM pending_users WHERE user_id = ?', (user_id,))
         
         conn.commit()
         conn.close()
+        self.membership.approve(user_id)
         return True
     
     def reject_user(self, user_id: int) -> bool:
@@ -155,12 +963,17 @@ class Database:
         conn = self.get_connection()
         cursor = conn.cursor()
         cursor.execute('DELETE FROM pending_users WHERE user_id = ?', (user_id,))
+        deleted = cursor.rowcount > 0
         conn.commit()
         conn.close()
-        return True
+        self.membership.reject(user_id)
+        return deleted
     
     def is_user_approved(self, user_id: int) -> bool:
         """Проверяет одобрен ли пользователь"""
+        cached = self.membership.is_approved(user_id)
+        if cached is not None:
+            return cached
         conn = self.get_connection()
         cursor = conn.cursor()
         cursor.execute('SELECT user_id FROM users WHERE user_id = ?', (user_id,))
@@ -170,6 +983,9 @@ class Database:
     
     def is_user_pending(self, user_id: int) -> bool:
         """Проверяет находится ли пользователь в очереди"""
+        cached = self.membership.is_pending(user_id)
+        if cached is not None:
+            return cached
         conn = self.get_connection()
         cursor = conn.cursor()
         cursor.execute('SELECT user_id FROM pending_users WHERE user_id = ?', (user_id,))
@@ -194,45 +1010,117 @@ class Database:
         deleted = cursor.rowcount > 0
         conn.commit()
         conn.close()
+        self.membership.remove(user_id)
         return deleted
     
-    def get_all_approved_users_info(self) -> List[Tuple]:
-        """Получает информацию о всех одобренных пользователях"""
+    def _load_membership_sets(self) -> Tuple[set, set]:
         conn = self.get_connection()
         cursor = conn.cursor()
-        cursor.execute('SELECT user_id, username, first_name, last_name FROM users ORDER BY first_name')
-        users = cursor.fetchall()
+        cursor.execute('SELECT user_id FROM users')
+        approved = {row[0] for row in cursor.fetchall()}
+        cursor.execute('SELECT user_id FROM pending_users')
+        pending = {row[0] for row in cursor.fetchall()}
         conn.close()
-        return users
+        return approved, pending
+    
+    def load_membership(self):
+        """(Пере)загружает кеш одобренных и ожидающих пользователей из базы"""
+        self.membership.load(*self._load_membership_sets())
+    
+    def verify_membership(self) -> dict:
+        """Сверяет кеш с базой: пользователи, которых кеш не знает (missing)
+        или которых уже нет в базе (stale). Пустые множества - кеш согласован"""
+        approved, pending = self._load_membership_sets()
+        return {
+            'missing_approved': approved - self.membership.approved,
+            'stale_approved': self.membership.approved - approved,
+            'missing_pending': pending - self.membership.pending,
+            'stale_pending': self.membership.pending - pending,
+        }
+    
+    def get_members_page(self, kind: str, after_id: Optional[int] = None, before_id: Optional[int] = None,
+                         exclude_id: int = 0, limit: int = config.MEMBERS_PAGE_SIZE) -> dict:
+        """Страница списка пользователей ('pending' или 'approved', см. MEMBER_LISTS).
+        
+        Keyset пагинация: страница начинается сразу после пользователя after_id
+        (или заканчивается перед before_id) в порядке сортировки, поэтому
+        стоимость не зависит от номера страницы, а удаление пользователей не
+        сдвигает соседние страницы. Если опорного пользователя уже нет
+        (одобрен/удален), показывается первая страница.
+        
+        Возвращает users (строки), prev_id (последний пользователь предыдущей
+        страницы или None, если это первая), has_next и total.
+        """
+        queries = MEMBERS_PAGE_SQL[kind]
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        anchor_id = after_id if after_id is not None else before_id
+        anchor = None
+        if anchor_id is not None:
+            cursor.execute(queries['anchor'], (anchor_id,))
+            anchor = cursor.fetchone()
+        
+        users = []
+        if anchor and before_id is not None:
+            cursor.execute(queries['before'], (exclude_id, *anchor, limit))
+            users = cursor.fetchall()[::-1]
+        # Назад может выйти неполная первая страница (перед ней удаляли
+        # пользователей) - она не дополняется, иначе повторила бы начало
+        # текущей. Пусто (перед опорой никого не осталось) - первая страница
+        if not users:
+            anchor_key = anchor if anchor and after_id is not None else None
+            if anchor_key:
+                cursor.execute(queries['after'], (exclude_id, *anchor_key, limit))
+            else:
+                cursor.execute(queries['first'], (exclude_id, limit))
+            users = cursor.fetchall()
+        
+        prev_id, has_next = None, False
+        if users:
+            first_id, last_id = users[0][0], users[-1][0]
+            cursor.execute(queries['prev'], (exclude_id, first_id))
+            row = cursor.fetchone()
+            prev_id = row[0] if row else None
+            cursor.execute(queries['next'], (exclude_id, last_id))
+            has_next = cursor.fetchone() is not None
+        
+        cursor.execute(queries['count'], (exclude_id,))
+        total = cursor.fetchone()[0]
+        conn.close()
+        return {'users': users, 'prev_id': prev_id, 'has_next': has_next, 'total': total}
     
     # === Работа с молодежными встречами ===
     
     def create_meeting(self, deadline_hours: int = config.RATING_DEADLINE_HOURS) -> int:
-        """Создает новую встречу и возвращает её ID"""
+        """Создает новую встречу (вместе с событиями напоминания и закрытия)
+        и возвращает её ID"""
         from datetime import timedelta
         
         conn = self.get_connection()
-        cursor = conn.cursor()
         
         start_date = datetime.now()
         deadline_date = start_date + timedelta(hours=deadline_hours)
         
-        cursor.execute('''
-            INSERT INTO youth_meetings (start_date, deadline_date, is_active)
-            VALUES (?, ?, 1)
-        ''', (start_date.isoformat(), deadline_date.isoformat()))
-        
-        meeting_id = cursor.lastrowid
-        
-        # Инициализируем user_responses для всех пользователей
-        approved_users = self.get_all_approved_users()
-        for user_id in approved_users:
+        # Встреча и список участников создаются в одной транзакции:
+        # при ошибке не останется встречи без user_responses
+        with conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT INTO youth_meetings (start_date, deadline_date, start_ts, deadline_ts, is_active)
+                VALUES (?, ?, ?, ?, 1)
+            ''', (start_date.isoformat(), deadline_date.isoformat(), to_epoch(start_date), to_epoch(deadline_date)))
+            
+            meeting_id = cursor.lastrowid
+            
+            # Инициализируем user_responses для всех пользователей одним запросом
             cursor.execute('''
                 INSERT INTO user_responses (meeting_id, user_id, has_responded, reminded)
-                VALUES (?, ?, 0, 0)
-            ''', (meeting_id, user_id))
+                SELECT ?, user_id, 0, 0 FROM users
+            ''', (meeting_id,))
+            
+            self._schedule_meeting_events(cursor, meeting_id, deadline_date)
         
-        conn.commit()
         conn.close()
         return meeting_id
     
@@ -240,146 +1128,202 @@ class Database:
         """Возвращает ID активной встречи, если есть"""
         conn = self.get_connection()
         cursor = conn.cursor()
-        cursor.execute('''
-            SELECT meeting_id FROM youth_meetings 
-            WHERE is_active = 1 
-            ORDER BY start_date DESC 
-            LIMIT 1
-        ''')
+        cursor.execute(ACTIVE_MEETING_SQL)
         result = cursor.fetchone()
         conn.close()
         return result[0] if result else None
     
     def close_meeting(self, meeting_id: int):
-        """Закрывает встречу"""
+        """Закрывает встречу и отменяет ее оставшиеся события"""
         conn = self.get_connection()
         cursor = conn.cursor()
         cursor.execute('UPDATE youth_meetings SET is_active = 0 WHERE meeting_id = ?', (meeting_id,))
+        cursor.execute('UPDATE scheduled_events SET done = 1 WHERE meeting_id = ? AND done = 0', (meeting_id,))
         conn.commit()
         conn.close()
     
+    @staticmethod
+    def _schedule_meeting_events(cursor, meeting_id: int, deadline_date: datetime):
+        """Планирует напоминание и закрытие опроса (внутри транзакции вызывающего)"""
+        from datetime import timedelta
+        
+        reminder_date = deadline_date - timedelta(hours=config.REMINDER_BEFORE_DEADLINE_HOURS)
+        cursor.executemany('''
+            INSERT INTO scheduled_events (meeting_id, kind, run_at)
+            VALUES (?, ?, ?)
+        ''', [
+            (meeting_id, 'reminder', reminder_date.isoformat()),
+            (meeting_id, 'close', deadline_date.isoformat()),
+        ])
+    
+    def get_pending_events(self, meeting_id: Optional[int] = None) -> List[dict]:
+        """Невыполненные запланированные события (всех встреч или одной) по времени"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        if meeting_id is not None:
+            cursor.execute(PENDING_EVENTS_SQL.format(condition='AND meeting_id = ?'), (meeting_id,))
+        else:
+            cursor.execute(PENDING_EVENTS_SQL.format(condition=''))
+        events = [
+            {'event_id': row[0], 'meeting_id': row[1], 'kind': row[2], 'run_at': datetime.fromisoformat(row[3])}
+            for row in cursor.fetchall()
+        ]
+        conn.close()
+        return events
+    
+    def complete_event(self, event_id: int):
+        """Отмечает событие выполненным"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('UPDATE scheduled_events SET done = 1 WHERE event_id = ?', (event_id,))
+        conn.commit()
+        conn.close()
+    
+    def get_closed_meetings_version(self) -> Tuple[int, int, int]:
+        """Версия данных закрытых встреч: меняется при закрытии встречи и при
+        каждой оценке закрытой встречи (используется как ключ кеша графиков)"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT 
+                COUNT(*),
+                COALESCE(MAX(m.meeting_id), 0),
+                COALESCE(SUM(a.attended_count + a.not_attended_count), 0)
+            FROM youth_meetings m
+            LEFT JOIN meeting_aggregates a ON m.meeting_id = a.meeting_id
+            WHERE m.is_active = 0
+        ''')
+        version = cursor.fetchone()
+        conn.close()
+        return version
+    
     def register_user_for_meeting(self, meeting_id: int, user_id: int):
         """Регистрирует пользователя для активной встречи (для новых пользователей)"""
         conn = self.get_connection()
         cursor = conn.cursor()
         
-        # Проверяем что пользователь еще не зарегистрирован
+        # Уникальный индекс (meeting_id, user_id) не даст зарегистрировать дважды
         cursor.execute('''
-            SELECT response_id FROM user_responses 
-            WHERE meeting_id = ? AND user_id = ?
+            INSERT OR IGNORE INTO user_responses (meeting_id, user_id, has_responded, reminded)
+            VALUES (?, ?, 0, 0)
         ''', (meeting_id, user_id))
-        
-        if not cursor.fetchone():
-            # Регистрируем пользователя для этой встречи
-            cursor.execute('''
-                INSERT INTO user_responses (meeting_id, user_id, has_responded, reminded)
-                VALUES (?, ?, 0, 0)
-            ''', (meeting_id, user_id))
-            conn.commit()
-        
+        conn.commit()
         conn.close()
     
-    def get_meeting_deadline(self, meeting_id: int) -> Optional[datetime]:
-        """Получает дедлайн встречи"""
+    def get_recent_meetings(self, limit: int = 10) -> List[Tuple]:
+        """Последние встречи: (meeting_id, start_date, is_active)"""
         conn = self.get_connection()
         cursor = conn.cursor()
-        cursor.execute('SELECT deadline_date FROM youth_meetings WHERE meeting_id = ?', (meeting_id,))
-        result = cursor.fetchone()
+        cursor.execute('''
+            SELECT meeting_id, start_date, is_active 
+            FROM youth_meetings 
+            ORDER BY start_date DESC 
+            LIMIT ?
+        ''', (limit,))
+        meetings = cursor.fetchall()
         conn.close()
-        if result:
-            return datetime.fromisoformat(result[0])
-        return None
+        return meetings
+    
+    def get_meeting(self, meeting_id: int) -> Optional[Tuple]:
+        """Получает встречу: (meeting_id, start_date)"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('SELECT meeting_id, start_date FROM youth_meetings WHERE meeting_id = ?', (meeting_id,))
+        meeting = cursor.fetchone()
+        conn.close()
+        return meeting
     
     # === Работа с оценками ===
     
+    # Записи оценок и отзывов: _write_* выполняются в транзакции вызывающего -
+    # своей (add_rating и т.д.) или пачки группового коммита (AsyncDatabase)
+    
     def add_rating(self, meeting_id: int, user_id: int, interest: int, relevance: int, 
                    spiritual_growth: int, attended: bool):
         """Добавляет оценку (анонимно)"""
         conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        # Добавляем оценку
-        cursor.execute('''
-            INSERT INTO ratings 
-            (meeting_id, interest_rating, relevance_rating, spiritual_growth_rating, attended, rating_date)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (meeting_id, interest, relevance, spiritual_growth, 1 if attended else 0, datetime.now().isoformat()))
-        
-        # Отмечаем что пользователь ответил
-        cursor.execute('''
-            UPDATE user_responses 
-            SET has_responded = 1 
-            WHERE meeting_id = ? AND user_id = ?
-        ''', (meeting_id, user_id))
-        
+        self._write_rating(conn.cursor(), meeting_id, user_id, interest, relevance, spiritual_growth, attended)
         conn.commit()
         conn.close()
     
     def add_feedback(self, meeting_id: int, feedback_text: str):
         """Добавляет текстовый отзыв (анонимно)"""
         conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO feedback (meeting_id, feedback_text, feedback_date)
-            VALUES (?, ?, ?)
-        ''', (meeting_id, feedback_text, datetime.now().isoformat()))
+        self._write_feedback(conn.cursor(), meeting_id, feedback_text)
         conn.commit()
         conn.close()
     
     def mark_not_attended(self, meeting_id: int, user_id: int):
         """Отмечает что пользователь не был на встрече"""
         conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        # Добавляем запись с отметкой "не был"
+        self._write_not_attended(conn.cursor(), meeting_id, user_id)
+        conn.commit()
+        conn.close()
+    
+    @staticmethod
+    def _write_rating(cursor, meeting_id: int, user_id: int, interest: int, relevance: int,
+                      spiritual_growth: int, attended: bool):
+        # Добавляем оценку
+        now = datetime.now()
         cursor.execute('''
             INSERT INTO ratings 
-            (meeting_id, interest_rating, relevance_rating, spiritual_growth_rating, attended, rating_date)
-            VALUES (?, 0, 0, 0, 0, ?)
-        ''', (meeting_id, datetime.now().isoformat()))
+            (meeting_id, interest_rating, relevance_rating, spiritual_growth_rating, attended,
+             rating_date, rating_ts)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (meeting_id, interest, relevance, spiritual_growth, 1 if attended else 0,
+              now.isoformat(), to_epoch(now)))
+        
+        Database._add_to_aggregates(cursor, meeting_id, interest, relevance, spiritual_growth, attended)
         
         # Отмечаем что пользователь ответил
+        cursor.execute(MARK_RESPONDED_SQL, (meeting_id, user_id))
+    
+    @staticmethod
+    def _write_feedback(cursor, meeting_id: int, feedback_text: str):
+        now = datetime.now()
         cursor.execute('''
-            UPDATE user_responses 
-            SET has_responded = 1 
-            WHERE meeting_id = ? AND user_id = ?
-        ''', (meeting_id, user_id))
+            INSERT INTO feedback (meeting_id, feedback_text, feedback_date, feedback_ts)
+            VALUES (?, ?, ?, ?)
+        ''', (meeting_id, feedback_text, now.isoformat(), to_epoch(now)))
+    
+    @staticmethod
+    def _write_not_attended(cursor, meeting_id: int, user_id: int):
+        # Добавляем запись с отметкой "не был"
+        now = datetime.now()
+        cursor.execute('''
+            INSERT INTO ratings 
+            (meeting_id, interest_rating, relevance_rating, spiritual_growth_rating, attended,
+             rating_date, rating_ts)
+            VALUES (?, 0, 0, 0, 0, ?, ?)
+        ''', (meeting_id, now.isoformat(), to_epoch(now)))
         
-        conn.commit()
-        conn.close()
+        Database._add_to_aggregates(cursor, meeting_id, 0, 0, 0, False)
+        
+        # Отмечаем что пользователь ответил
+        cursor.execute(MARK_RESPONDED_SQL, (meeting_id, user_id))
     
     def get_meeting_stats(self, meeting_id: int) -> dict:
         """Получает статистику по встрече"""
         conn = self.get_connection()
         cursor = conn.cursor()
         
-        # Средние оценки (только для тех кто был)
+        # Средние оценки (только для тех кто был) и количество не посетивших
         cursor.execute('''
             SELECT 
-                AVG(interest_rating) as avg_interest,
-                AVG(relevance_rating) as avg_relevance,
-                AVG(spiritual_growth_rating) as avg_spiritual,
-                COUNT(*) as total_attended
-            FROM ratings 
-            WHERE meeting_id = ? AND attended = 1
+                interest_sum * 1.0 / attended_count as avg_interest,
+                relevance_sum * 1.0 / attended_count as avg_relevance,
+                spiritual_sum * 1.0 / attended_count as avg_spiritual,
+                attended_count,
+                not_attended_count
+            FROM meeting_aggregates 
+            WHERE meeting_id = ?
         ''', (meeting_id,))
         
-        stats = cursor.fetchone()
-        
-        # Количество не посетивших
-        cursor.execute('''
-            SELECT COUNT(*) FROM ratings 
-            WHERE meeting_id = ? AND attended = 0
-        ''', (meeting_id,))
-        not_attended = cursor.fetchone()[0]
+        stats = cursor.fetchone() or (None, None, None, 0, 0)
+        not_attended = stats[4]
         
         # Текстовые отзывы
-        cursor.execute('''
-            SELECT feedback_text, feedback_date 
-            FROM feedback 
-            WHERE meeting_id = ?
-            ORDER BY feedback_date
-        ''', (meeting_id,))
+        cursor.execute(MEETING_FEEDBACK_SQL, (meeting_id,))
         feedbacks = cursor.fetchall()
         
         conn.close()
@@ -393,102 +1337,398 @@ class Database:
             'feedbacks': feedbacks
         }
     
+    def get_ratings_page(self, meeting_id: int, after_id: Optional[int] = None,
+                         before_id: Optional[int] = None,
+                         limit: int = config.RATINGS_PAGE_SIZE) -> Tuple[List[Tuple], bool]:
+        """Страница оценок встречи в порядке (rating_date, rating_id).
+        
+        Keyset пагинация: страница после оценки after_id или перед before_id
+        (без них - первая), один запрос по idx_ratings_meeting_date, сколько
+        бы оценок ни было. Строки: (rating_id, interest, relevance, spiritual,
+        attended, rating_date). Второе значение - есть ли еще оценки дальше в
+        направлении листания.
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        if before_id is not None:
+            cursor.execute(RATINGS_PAGE_SQL['before'], (meeting_id, before_id, limit + 1))
+        elif after_id is not None:
+            cursor.execute(RATINGS_PAGE_SQL['after'], (meeting_id, after_id, limit + 1))
+        else:
+            cursor.execute(RATINGS_PAGE_SQL['first'], (meeting_id, limit + 1))
+        rows = cursor.fetchall()
+        conn.close()
+        more = len(rows) > limit
+        rows = rows[:limit]
+        if before_id is not None:
+            rows.reverse()
+        return rows, more
+    
+    def get_meeting_totals(self, meeting_id: int) -> Tuple[int, int]:
+        """Сколько было на встрече и сколько отметили, что не были (из агрегатов)"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute(
+            'SELECT attended_count, not_attended_count FROM meeting_aggregates WHERE meeting_id = ?',
+            (meeting_id,)
+        )
+        row = cursor.fetchone()
+        conn.close()
+        return tuple(row) if row else (0, 0)
+    
     def get_users_for_reminder(self, meeting_id: int) -> List[int]:
         """Получает список пользователей для напоминания"""
         conn = self.get_connection()
         cursor = conn.cursor()
-        cursor.execute('''
-            SELECT user_id FROM user_responses 
-            WHERE meeting_id = ? AND has_responded = 0 AND reminded = 0
-        ''', (meeting_id,))
+        cursor.execute(REMINDER_USERS_SQL, (meeting_id,))
         users = [row[0] for row in cursor.fetchall()]
         conn.close()
         return users
     
-    def mark_as_reminded(self, meeting_id: int, user_id: int):
-        """Отмечает что пользователю отправлено напоминание"""
+    def claim_reminders(self, meeting_id: int) -> List[int]:
+        """Забирает список пользователей для напоминания и сразу отмечает их
+        как напомненных - одной транзакцией.
+
+        Отметка ставится до отправки: если бот упадет посреди рассылки,
+        повторный запуск никому не напомнит второй раз. Недоставленные
+        напоминания возвращаются через release_reminders().
+        """
+        conn = self.get_connection()
+        with conn:
+            cursor = conn.cursor()
+            cursor.execute(REMINDER_USERS_SQL, (meeting_id,))
+            users = [row[0] for row in cursor.fetchall()]
+            cursor.executemany('''
+                UPDATE user_responses
+                SET reminded = 1
+                WHERE meeting_id = ? AND user_id = ?
+            ''', [(meeting_id, user_id) for user_id in users])
+        conn.close()
+        return users
+
+    def release_reminders(self, meeting_id: int, user_ids: List[int]):
+        """Снимает отметку о напоминании (одной транзакцией) с тех, кому
+        оно так и не было доставлено"""
+        conn = self.get_connection()
+        with conn:
+            conn.executemany('''
+                UPDATE user_responses
+                SET reminded = 0
+                WHERE meeting_id = ? AND user_id = ?
+            ''', [(meeting_id, user_id) for user_id in user_ids])
+        conn.close()
+
+    def get_rating_rollup(self, period: str, days: Optional[int] = None) -> List[dict]:
+        """Средние оценки по неделям, месяцам или кварталам (для графиков).
+        
+        Группировка и средние считаются в SQL по meeting_aggregates, поэтому из
+        базы приходит по строке на период, а не на встречу. Средние взвешены по
+        числу присутствовавших: SUM(сумм оценок) / SUM(присутствовавших), так
+        что встреча на 40 человек весит больше встречи на 5, а встречи без
+        оценок не тянут среднее к нулю. Периоды без единой оценки пропускаются.
+        
+        period - ключ ROLLUP_PERIODS; days - только встречи за последние days дней.
+        start - дата начала периода (YYYY-MM-DD). Период выбирается по start_ts
+        (idx_meetings_active_start_ts); пока миграция заполняет start_ts, для
+        старых встреч время берется из start_date.
+        """
+        from datetime import timedelta
+        
+        if self.is_backfilled(EPOCH_TIMESTAMPS_VERSION):
+            start_ts = 'm.start_ts'
+        else:
+            start_ts = START_TS_FALLBACK
+        cutoff = to_epoch(datetime.now() - timedelta(days=days)) if days else 0
+        
         conn = self.get_connection()
         cursor = conn.cursor()
-        cursor.execute('''
-            UPDATE user_responses 
-            SET reminded = 1 
-            WHERE meeting_id = ? AND user_id = ?
-        ''', (meeting_id, user_id))
+        cursor.execute(rating_rollup_sql(period, start_ts), (cutoff,))
+        rows = cursor.fetchall()
+        conn.close()
+        
+        return [
+            {
+                'start': start,
+                'meetings': meetings,
+                'attended': attended,
+                'interest_sum': interest,
+                'relevance_sum': relevance,
+                'spiritual_sum': spiritual,
+                'avg_interest': interest / attended,
+                'avg_relevance': relevance / attended,
+                'avg_spiritual': spiritual / attended,
+            }
+            for start, meetings, attended, interest, relevance, spiritual in rows
+        ]
+    
+    # === Состояние бота (SQLitePersistence) ===
+    
+    def load_persisted_user_data(self) -> List[Tuple[int, bytes]]:
+        """Все сохраненные user_data: (user_id, данные)"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('SELECT user_id, data FROM persistence_user_data')
+        rows = cursor.fetchall()
+        conn.close()
+        return rows
+    
+    def save_persisted_user_data(self, user_id: int, data: Optional[bytes]):
+        """Сохраняет user_data одного пользователя (None - удаляет строку)"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        if data is None:
+            cursor.execute('DELETE FROM persistence_user_data WHERE user_id = ?', (user_id,))
+        else:
+            cursor.execute('''
+                INSERT INTO persistence_user_data (user_id, data, updated_at)
+                VALUES (?, ?, ?)
+                ON CONFLICT (user_id) DO UPDATE SET
+                    data = excluded.data,
+                    updated_at = excluded.updated_at
+            ''', (user_id, data, datetime.now().isoformat()))
         conn.commit()
         conn.close()
     
-    def get_stats_for_period(self, days: int) -> List[dict]:
-        """Получает статистику за период (для графиков)"""
+    def load_persisted_conversations(self, name: str) -> List[Tuple[str, bytes]]:
+        """Состояния диалогов ConversationHandler: (ключ, состояние)"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute(
+            'SELECT conversation_key, state FROM persistence_conversations WHERE name = ?', (name,)
+        )
+        rows = cursor.fetchall()
+        conn.close()
+        return rows
+    
+    def save_persisted_conversation(self, name: str, key: str, state: Optional[bytes]):
+        """Сохраняет состояние одного диалога (None - диалог завершен)"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        if state is None:
+            cursor.execute(
+                'DELETE FROM persistence_conversations WHERE name = ? AND conversation_key = ?', (name, key)
+            )
+        else:
+            cursor.execute('''
+                INSERT INTO persistence_conversations (name, conversation_key, state, updated_at)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT (name, conversation_key) DO UPDATE SET
+                    state = excluded.state,
+                    updated_at = excluded.updated_at
+            ''', (name, key, state, datetime.now().isoformat()))
+        conn.commit()
+        conn.close()
+    
+    def evict_persisted_state(self, ttl_hours: float) -> Tuple[List[Tuple[str, str]], List[int]]:
+        """Удаляет диалоги и user_data, которые не менялись дольше ttl_hours.
+        Возвращает удаленные ключи: ([(name, conversation_key)], [user_id])"""
         from datetime import timedelta
         
+        cutoff = (datetime.now() - timedelta(hours=ttl_hours)).isoformat()
         conn = self.get_connection()
-        cursor = conn.cursor()
+        with conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                'SELECT name, conversation_key FROM persistence_conversations WHERE updated_at < ?', (cutoff,)
+            )
+            conversations = cursor.fetchall()
+            cursor.execute('DELETE FROM persistence_conversations WHERE updated_at < ?', (cutoff,))
+            cursor.execute('SELECT user_id FROM persistence_user_data WHERE updated_at < ?', (cutoff,))
+            user_ids = [row[0] for row in cursor.fetchall()]
+            cursor.execute('DELETE FROM persistence_user_data WHERE updated_at < ?', (cutoff,))
+        conn.close()
+        return conversations, user_ids
+    
+    # === Поиск по отзывам ===
+    
+    def _create_search_index(self, cursor):
+        """Создает feedback_fts с триггерами и индексирует уже сохраненные отзывы"""
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'feedback_fts'")
+        if cursor.fetchone():
+            return
+        try:
+            for ddl in FEEDBACK_FTS_DDL:
+                cursor.execute(ddl)
+        except sqlite3.OperationalError as e:
+            # SQLite без FTS5: бот работает, только /search недоступен
+            logger.warning(f"Full-text search is unavailable: {e}")
+            return
+        cursor.execute("INSERT INTO feedback_fts (feedback_fts) VALUES ('rebuild')")
+    
+    def rebuild_search_index(self) -> int:
+        """Переиндексирует все отзывы (manage.py rebuild-search). Возвращает их количество"""
+        conn = self.get_connection()
+        with conn:
+            conn.execute("INSERT INTO feedback_fts (feedback_fts) VALUES ('rebuild')")
+            count = conn.execute('SELECT COUNT(*) FROM feedback').fetchone()[0]
+        conn.close()
+        return count
+    
+    def search_feedback(self, text: str, first_meeting: Optional[int] = None,
+                        last_meeting: Optional[int] = None, offset: int = 0,
+                        limit: int = config.SEARCH_PAGE_SIZE) -> Optional[dict]:
+        """Ищет отзывы по словам, лучшие совпадения (bm25) первыми.
         
-        cutoff_date = (datetime.now() - timedelta(days=days)).isoformat()
+        Возвращает results - (feedback_id, meeting_id, start_date, snippet),
+        где совпадения отмечены MATCH_START/MATCH_END, total и ranked. None -
+        если в SQLite нет FTS5.
         
-        cursor.execute('''
-            SELECT 
-                m.meeting_id,
-                m.start_date,
-                AVG(CASE WHEN r.attended = 1 THEN r.interest_rating END) as avg_interest,
-                AVG(CASE WHEN r.attended = 1 THEN r.relevance_rating END) as avg_relevance,
-                AVG(CASE WHEN r.attended = 1 THEN r.spiritual_growth_rating END) as avg_spiritual,
-                COUNT(CASE WHEN r.attended = 1 THEN 1 END) as attended_count
-            FROM youth_meetings m
-            LEFT JOIN ratings r ON m.meeting_id = r.meeting_id
-            WHERE m.start_date >= ? AND m.is_active = 0
-            GROUP BY m.meeting_id
-            ORDER BY m.start_date
-        ''', (cutoff_date,))
-        
-        results = cursor.fetchall()
-        conn.close()
-        
-        stats = []
-        for row in results:
-            stats.append({
-                'meeting_id': row[0],
-                'date': row[1],  # Уже ISO string из базы
-                'avg_interest': round(row[2], 2) if row[2] else 0,
-                'avg_relevance': round(row[3], 2) if row[3] else 0,
-                'avg_spiritual': round(row[4], 2) if row[4] else 0,
-                'attended_count': row[5]
-            })
+        Сортировка по релевантности считает bm25 для каждого совпадения, поэтому
+        если совпадений больше SEARCH_RANK_LIMIT (слово есть почти в каждом
+        отзыве и ранжирование мало что дает), отзывы идут от новых к старым по
+        rowid - это FTS5 отдает без сортировки (ranked = False). Страницы через
+        OFFSET: при сортировке по релевантности keyset ничего не экономит.
+        """
+        query = fts_query(text)
+        if query is None:
+            return {'results': [], 'total': 0, 'ranked': True}
         
-        return stats
+        # Диапазон встреч проверяется по строке feedback; без него join не нужен
+        join, condition, params = '', '', (query,)
+        if first_meeting is not None or last_meeting is not None:
+            join = 'JOIN feedback f ON f.feedback_id = feedback_fts.rowid'
+            condition = 'AND f.meeting_id BETWEEN ? AND ?'
+            params = (query, first_meeting or 0, last_meeting or 2 ** 63 - 1)
+        
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute(f'''
+                SELECT COUNT(*) FROM feedback_fts {join}
+                WHERE feedback_fts MATCH ? {condition}
+            ''', params)
+            total = cursor.fetchone()[0]
+            ranked = total <= config.SEARCH_RANK_LIMIT
+            # Ключ сортировки выходит из подзапроса: порядок после join
+            # задает только внешний ORDER BY
+            if ranked:
+                sort_key, order = 'rank', 'sort_key'
+            else:
+                sort_key, order = 'feedback_fts.rowid', 'sort_key DESC'
+            cursor.execute(f'''
+                SELECT hits.rowid, f.meeting_id, m.start_date, hits.snippet
+                FROM (
+                    SELECT feedback_fts.rowid AS rowid, {sort_key} AS sort_key,
+                           snippet(feedback_fts, 0, '{MATCH_START}', '{MATCH_END}', '…', 16) AS snippet
+                    FROM feedback_fts {join}
+                    WHERE feedback_fts MATCH ? {condition}
+                    ORDER BY {order}
+                    LIMIT ? OFFSET ?
+                ) hits
+                JOIN feedback f ON f.feedback_id = hits.rowid
+                LEFT JOIN youth_meetings m ON m.meeting_id = f.meeting_id
+                ORDER BY hits.{order}
+            ''', (*params, limit, offset))
+            results = cursor.fetchall()
+        except sqlite3.OperationalError as e:
+            if 'feedback_fts' not in str(e):
+                raise
+            return None
+        finally:
+            conn.close()
+        return {'results': results, 'total': total, 'ranked': ranked}
     
-    def get_all_stats(self) -> List[dict]:
-        """Получает всю статистику за весь период (для графиков)"""
+    def get_counts(self) -> dict:
+        """Общие количества записей (для подписей к экспорту и бекапу)"""
         conn = self.get_connection()
         cursor = conn.cursor()
-        
         cursor.execute('''
             SELECT 
-                m.meeting_id,
-                m.start_date,
-                AVG(CASE WHEN r.attended = 1 THEN r.interest_rating END) as avg_interest,
-                AVG(CASE WHEN r.attended = 1 THEN r.relevance_rating END) as avg_relevance,
-                AVG(CASE WHEN r.attended = 1 THEN r.spiritual_growth_rating END) as avg_spiritual,
-                COUNT(CASE WHEN r.attended = 1 THEN 1 END) as attended_count
-            FROM youth_meetings m
-            LEFT JOIN ratings r ON m.meeting_id = r.meeting_id
-            WHERE m.is_active = 0
-            GROUP BY m.meeting_id
-            ORDER BY m.start_date
+                (SELECT COUNT(*) FROM users),
+                (SELECT COUNT(*) FROM youth_meetings),
+                (SELECT COUNT(*) FROM ratings WHERE attended = 1),
+                (SELECT COUNT(*) FROM feedback)
         ''')
-        
-        results = cursor.fetchall()
+        users, meetings, ratings, feedback = cursor.fetchone()
         conn.close()
+        return {
+            'users': users,
+            'meetings': meetings,
+            'ratings': ratings,
+            'feedback': feedback
+        }
+
+
+class AsyncDatabase:
+    """Асинхронный фасад над Database.
+    
+    Каждый метод Database доступен как корутина и выполняется в пуле потоков
+    базы данных, поэтому медленный запрос не останавливает event loop и не
+    задерживает обработку апдейтов других пользователей. У каждого потока свое
+    постоянное подключение; в режиме WAL чтения идут параллельно, а писатели
+    по очереди ждут блокировку (busy_timeout). add_rating, add_feedback и
+    mark_not_attended идут не в пул, а в очередь GroupCommitWriter.
+    """
+    
+    def __init__(self, database: Database, threads: int = config.DATABASE_THREADS,
+                 writer: Optional[GroupCommitWriter] = None):
+        self.sync = database
+        self._executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='database')
+        # Запросов в очереди и в работе (метрика bot_db_queue_size)
+        self.pending = 0
+        # Оценки и отзывы приходят пачкой после рассылки опроса - их пишет
+        # один поток с групповым коммитом
+        self.writer = writer or GroupCommitWriter(database)
+    
+    async def run(self, func, *args, **kwargs):
+        """Выполняет произвольную функцию в потоке базы данных"""
+        loop = asyncio.get_running_loop()
+        self.pending += 1
+        try:
+            return await loop.run_in_executor(self._executor, self._timed, func, args, kwargs)
+        finally:
+            self.pending -= 1
+    
+    @staticmethod
+    def _timed(func, args, kwargs):
+        """Выполняет запрос в потоке базы и записывает его время (без ожидания в очереди)"""
+        method = getattr(func, '__name__', 'query')
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        except Exception as e:
+            db_errors.inc(method=method, error=type(e).__name__)
+            raise
+        finally:
+            db_query_seconds.observe(time.perf_counter() - started, method=method)
+    
+    async def is_user_approved(self, user_id: int) -> bool:
+        """Проверка доступа из кеша - без перехода в поток базы"""
+        if self.sync.membership.loaded:
+            return self.sync.is_user_approved(user_id)
+        return await self.run(self.sync.is_user_approved, user_id)
+    
+    async def is_user_pending(self, user_id: int) -> bool:
+        """Проверка очереди из кеша - без перехода в поток базы"""
+        if self.sync.membership.loaded:
+            return self.sync.is_user_pending(user_id)
+        return await self.run(self.sync.is_user_pending, user_id)
+    
+    async def add_rating(self, meeting_id: int, user_id: int, interest: int, relevance: int,
+                         spiritual_growth: int, attended: bool):
+        await self.writer.write(Database._write_rating, meeting_id, user_id, interest, relevance,
+                                spiritual_growth, attended)
+    
+    async def add_feedback(self, meeting_id: int, feedback_text: str):
+        await self.writer.write(Database._write_feedback, meeting_id, feedback_text)
+    
+    async def mark_not_attended(self, meeting_id: int, user_id: int):
+        await self.writer.write(Database._write_not_attended, meeting_id, user_id)
+    
+    def __getattr__(self, name):
+        method = getattr(self.sync, name)
+        if not callable(method):
+            return method
         
-        stats = []
-        for row in results:
-            stats.append({
-                'meeting_id': row[0],
-                'date': datetime.fromisoformat(row[1]).isoformat(),
-                'avg_interest': round(row[2], 2) if row[2] else 0,
-                'avg_relevance': round(row[3], 2) if row[3] else 0,
-                'avg_spiritual': round(row[4], 2) if row[4] else 0,
-                'attended_count': row[5]
-            })
+        @functools.wraps(method)
+        async def call(*args, **kwargs):
+            return await self.run(method, *args, **kwargs)
         
-        return stats
+        setattr(self, name, call)
+        return call
+    
+    def close(self):
+        """Дожидается очереди запросов и записей и закрывает подключения"""
+        self.writer.close()
+        self._executor.shutdown(wait=True)
+        self.sync.close()
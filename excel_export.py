@@ -0,0 +1,126 @@
+import io
+from typing import List, Sequence
+
+import config
+
+# Листы экспорта: (название, заголовки, цвет заголовка, запрос).
+# Встречи идут от новых к старым по meeting_id (он растет вместе со start_date),
+# а оценки и отзывы внутри встречи - по idx_ratings_meeting_date и
+# idx_feedback_meeting_date: CROSS JOIN оставляет встречи внешним циклом, и
+# SQLite отдает строки в нужном порядке без сортировки всего join во
+# временном B-дереве (с temp_store = MEMORY оно целиком лежало бы в памяти)
+SHEETS = [
+    (
+        "Зустрічі",
+        ["ID", "Дата початку", "Активна", "Середня цікавість", "Середня актуальність", "Середнє духовне зростання", "Відвідали"],
+        "70AD47",
+        '''
+            SELECT
+                m.meeting_id,
+                m.start_date,
+                CASE WHEN m.is_active = 1 THEN 'Так' ELSE 'Ні' END,
+                ROUND(a.interest_sum * 1.0 / a.attended_count, 2),
+                ROUND(a.relevance_sum * 1.0 / a.attended_count, 2),
+                ROUND(a.spiritual_sum * 1.0 / a.attended_count, 2),
+                COALESCE(a.attended_count, 0)
+            FROM youth_meetings m
+            LEFT JOIN meeting_aggregates a ON m.meeting_id = a.meeting_id
+            ORDER BY m.meeting_id DESC
+        ''',
+    ),
+    (
+        "Оцінки",
+        ["ID зустрічі", "Дата зустрічі", "Відвідав", "Цікавість", "Актуальність", "Духовне зростання", "Дата оцінки"],
+        "FFC000",
+        '''
+            SELECT
+                m.meeting_id,
+                m.start_date,
+                CASE WHEN r.attended = 1 THEN 'Так' ELSE 'Ні' END,
+                r.interest_rating,
+                r.relevance_rating,
+                r.spiritual_growth_rating,
+                r.rating_date
+            FROM youth_meetings m
+            CROSS JOIN ratings r ON r.meeting_id = m.meeting_id
+            ORDER BY m.meeting_id DESC, r.rating_date, r.rating_id
+        ''',
+    ),
+    (
+        "Відгуки",
+        ["ID зустрічі", "Дата зустрічі", "Відгук", "Дата відгуку"],
+        "9966FF",
+        '''
+            SELECT
+                m.meeting_id,
+                m.start_date,
+                f.feedback_text,
+                f.feedback_date
+            FROM youth_meetings m
+            CROSS JOIN feedback f ON f.meeting_id = m.meeting_id
+            ORDER BY m.meeting_id DESC, f.feedback_date, f.feedback_id
+        ''',
+    ),
+]
+
+
+def column_widths(header: Sequence, rows: List[Sequence]) -> List[int]:
+    """Ширина колонок по заголовку и выборке строк (не больше 50)"""
+    widths = [len(str(value)) for value in header]
+    for row in rows:
+        for i, value in enumerate(row):
+            widths[i] = max(widths[i], len(str(value)))
+    return [min(width + 2, 50) for width in widths]
+
+
+def build_excel_export(database) -> io.BytesIO:
+    """Строит Excel файл с данными в памяти (выполняется в потоке базы данных).
+
+    Workbook в режиме write-only: строки читаются из курсора пачками и сразу
+    пишутся в лист, поэтому память не растет вместе с таблицей оценок.
+    Ширина колонок считается заранее по первым строкам каждого листа.
+    """
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font, PatternFill, Alignment
+    from openpyxl.utils import get_column_letter
+
+    wb = Workbook(write_only=True)
+
+    conn = database.get_connection()
+    cursor = conn.cursor()
+
+    for title, header, color, query in SHEETS:
+        ws = wb.create_sheet(title)
+
+        # Ширину колонок в write-only режиме нужно задать до первой строки
+        cursor.execute(query + ' LIMIT ?', (config.EXPORT_WIDTH_SAMPLE_ROWS,))
+        for i, width in enumerate(column_widths(header, cursor.fetchall()), 1):
+            ws.column_dimensions[get_column_letter(i)].width = width
+
+        font = Font(bold=True, color="FFFFFF")
+        fill = PatternFill(start_color=color, end_color=color, fill_type="solid")
+        alignment = Alignment(horizontal="center")
+        header_cells = []
+        for value in header:
+            cell = WriteOnlyCell(ws, value=value)
+            cell.font = font
+            cell.fill = fill
+            cell.alignment = alignment
+            header_cells.append(cell)
+        ws.append(header_cells)
+
+        cursor.execute(query)
+        while True:
+            rows = cursor.fetchmany(config.EXPORT_BATCH_SIZE)
+            if not rows:
+                break
+            for row in rows:
+                ws.append(row)
+
+    conn.close()
+
+    buf = io.BytesIO()
+    wb.save(buf)
+    buf.seek(0)
+    return buf
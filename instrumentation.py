@@ -0,0 +1,63 @@
+import functools
+import time
+from typing import Iterable
+
+from telegram.ext import BaseHandler, ConversationHandler
+from telegram.request import HTTPXRequest
+
+from metrics import handler_errors, handler_seconds, telegram_errors, telegram_request_seconds
+
+
+class InstrumentedRequest(HTTPXRequest):
+    """HTTPXRequest, который замеряет каждый запрос к Bot API.
+
+    Ошибки считаются по HTTP статусу ответа (429 - flood control, 403 - бот
+    заблокирован, 400 - неверный запрос) или как network, если ответа нет.
+    """
+
+    async def do_request(self, url: str, method: str, *args, **kwargs):
+        api_method = url.rsplit('/', 1)[-1]
+        started = time.perf_counter()
+        try:
+            code, payload = await super().do_request(url, method, *args, **kwargs)
+        except Exception:
+            telegram_errors.inc(method=api_method, status='network')
+            raise
+        finally:
+            telegram_request_seconds.observe(time.perf_counter() - started, method=api_method)
+        if code >= 400:
+            telegram_errors.inc(method=api_method, status=code)
+        return code, payload
+
+
+def timed_callback(callback):
+    """Оборачивает callback обработчика: время и исключения по имени функции"""
+    if getattr(callback, '__wrapped_metrics__', False):
+        return callback
+    name = callback.__name__
+
+    @functools.wraps(callback)
+    async def wrapper(update, context):
+        started = time.perf_counter()
+        try:
+            return await callback(update, context)
+        except Exception as e:
+            handler_errors.inc(handler=name, error=type(e).__name__)
+            raise
+        finally:
+            handler_seconds.observe(time.perf_counter() - started, handler=name)
+
+    wrapper.__wrapped_metrics__ = True
+    return wrapper
+
+
+def instrument_handlers(handlers: Iterable[BaseHandler]):
+    """Подключает метрики ко всем обработчикам, включая шаги ConversationHandler"""
+    for handler in handlers:
+        if isinstance(handler, ConversationHandler):
+            instrument_handlers(handler.entry_points)
+            for state_handlers in handler.states.values():
+                instrument_handlers(state_handlers)
+            instrument_handlers(handler.fallbacks)
+        else:
+            handler.callback = timed_callback(handler.callback)
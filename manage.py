@@ -0,0 +1,115 @@
+"""Служебные команды для базы данных бота.
+
+    python manage.py check-indexes
+    python manage.py verify-aggregates
+    python manage.py rebuild-aggregates
+    python manage.py rebuild-search
+    python manage.py migrate
+    python manage.py backup [--force]
+"""
+import argparse
+import sys
+import time
+
+import config
+from backup import BackupManager
+from database import SCHEMA_VERSION, Database
+
+
+def check_indexes(db: Database, args) -> int:
+    """Печатает планы горячих запросов; код возврата 1, если индекс не используется"""
+    failed = 0
+    for check in db.explain_query_plans():
+        status = 'OK' if check['ok'] else 'FAIL'
+        print(f"[{status}] {check['query']} -> {check['index']}")
+        for line in check['plan']:
+            print(f"       {line}")
+        if not check['ok']:
+            failed += 1
+    return 1 if failed else 0
+
+
+def verify_aggregates(db: Database, args) -> int:
+    """Сверяет meeting_aggregates с сырыми оценками; код возврата 1 при расхождении"""
+    mismatched = db.verify_aggregates()
+    if mismatched:
+        print(f"Aggregates differ from ratings for meetings: {', '.join(map(str, mismatched))}")
+        print("Run 'python manage.py rebuild-aggregates' to fix them.")
+        return 1
+    print("Aggregates match ratings.")
+    return 0
+
+
+def rebuild_aggregates(db: Database, args) -> int:
+    """Пересчитывает meeting_aggregates по таблице ratings"""
+    count = db.rebuild_aggregates()
+    print(f"Rebuilt aggregates for {count} meetings.")
+    return 0
+
+
+def rebuild_search(db: Database, args) -> int:
+    """Переиндексирует отзывы для /search (feedback_fts)"""
+    count = db.rebuild_search_index()
+    print(f"Reindexed {count} feedback entries.")
+    return 0
+
+
+def migrate(db: Database, args) -> int:
+    """Показывает версию схемы и дозаполняет колонки миграций (сами миграции
+    применяются при открытии базы)"""
+    print(f"Schema version {db.get_schema_version()} (latest {SCHEMA_VERSION}).")
+    pending = [f"{migration.version} ({migration.name})" for migration in db.pending_backfills]
+    if not pending:
+        print("All migrations are backfilled.")
+        return 0
+    print(f"Backfilling migrations: {', '.join(pending)}")
+    started = time.perf_counter()
+    updated = db.backfill(args.batch_size)
+    print(f"Updated {updated} rows in {time.perf_counter() - started:.1f}s.")
+    return 0
+
+
+def backup(db: Database, args) -> int:
+    """Делает gzip-снимок базы в BACKUP_DIR (пропускает, если база не менялась)"""
+    result = BackupManager(db, args.backup_dir).create(force=args.force)
+    status = 'created' if result.changed else 'unchanged, kept'
+    print(f"Backup {status}: {result.path} ({result.size} -> {result.compressed_size} bytes)")
+    return 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Служебные команды для базы данных бота')
+    parser.add_argument('--db', default=config.DATABASE_NAME, help='путь к файлу базы данных')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    commands.add_parser(
+        'check-indexes', help='проверить EXPLAIN QUERY PLAN горячих запросов'
+    ).set_defaults(func=check_indexes)
+    commands.add_parser(
+        'verify-aggregates', help='сверить meeting_aggregates с таблицей ratings'
+    ).set_defaults(func=verify_aggregates)
+    commands.add_parser(
+        'rebuild-aggregates', help='пересчитать meeting_aggregates по таблице ratings'
+    ).set_defaults(func=rebuild_aggregates)
+    commands.add_parser(
+        'rebuild-search', help='переиндексировать отзывы для /search'
+    ).set_defaults(func=rebuild_search)
+    migrate_parser = commands.add_parser('migrate', help='применить миграции схемы и заполнить новые колонки')
+    migrate_parser.add_argument('--batch-size', type=int, default=config.BACKFILL_BATCH_SIZE,
+                                help='строк в одной транзакции')
+    migrate_parser.set_defaults(func=migrate)
+    backup_parser = commands.add_parser('backup', help='сделать сжатый снимок базы')
+    backup_parser.add_argument('--backup-dir', default=config.BACKUP_DIR, help='папка для бекапов')
+    backup_parser.add_argument('--force', action='store_true', help='сохранить снимок, даже если база не менялась')
+    backup_parser.set_defaults(func=backup)
+
+    args = parser.parse_args(argv)
+    db = Database(args.db)
+    try:
+        return args.func(db, args)
+    finally:
+        db.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
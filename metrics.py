@@ -0,0 +1,308 @@
+import abc
+import asyncio
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# Границы корзин гистограмм задержки (в секундах)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Metric(abc.ABC):
+    """Метрика с набором меток в формате Prometheus.
+
+    Значения меняются и из event loop, и из потоков базы данных, поэтому
+    под локом. Подкласс обязан определить samples(): без него он не
+    создается (а не падает при запросе /metrics).
+    """
+    kind = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[tuple, object] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _labels(self, key: tuple, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+        pairs = list(zip(self.labelnames, key)) + list(extra)
+        if not pairs:
+            return ''
+        return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+    @abc.abstractmethod
+    def samples(self) -> Iterator[str]:
+        """Строки значений в формате Prometheus"""
+
+    def render(self) -> str:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        lines.extend(self.samples())
+        return '\n'.join(lines)
+
+
+class Counter(Metric):
+    """Монотонно растущий счетчик"""
+    kind = 'counter'
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def items(self) -> Dict[tuple, float]:
+        with self._lock:
+            return dict(self._values)
+
+    def total(self) -> float:
+        return sum(self.items().values())
+
+    def samples(self) -> Iterator[str]:
+        for key, value in sorted(self.items().items()):
+            yield f'{self.name}{self._labels(key)} {value:g}'
+
+
+class Gauge(Metric):
+    """Текущее значение, которое вычисляется функцией в момент чтения
+    (размер очереди, задержка event loop)"""
+    kind = 'gauge'
+
+    def __init__(self, name: str, documentation: str, func: Callable[[], float]):
+        super().__init__(name, documentation)
+        self.func = func
+
+    def value(self) -> Optional[float]:
+        try:
+            return float(self.func())
+        except Exception as e:
+            logger.warning(f"Gauge {self.name} failed: {e}")
+            return None
+
+    def samples(self) -> Iterator[str]:
+        value = self.value()
+        if value is not None:
+            yield f'{self.name} {value:g}'
+
+
+class Histogram(Metric):
+    """Распределение значений по корзинам (для задержек).
+
+    Хранит на каждый набор меток счетчики корзин, сумму и количество - как
+    histogram в Prometheus, так что квантили можно считать и в Prometheus
+    (histogram_quantile), и здесь же для /metrics.
+    """
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # [счетчики корзин (+Inf последней), сумма, количество]
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            index = len(self.buckets)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    index = i
+                    break
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Замеряет блок кода (в том числе если он упал с исключением)"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def items(self) -> Dict[tuple, Tuple[List[int], float, int]]:
+        with self._lock:
+            return {key: (list(counts), total, count) for key, (counts, total, count) in self._values.items()}
+
+    def quantile(self, q: float, counts: List[int]) -> float:
+        """Оценка квантиля по корзинам (линейная интерполяция внутри корзины,
+        как histogram_quantile в Prometheus)"""
+        count = sum(counts)
+        if not count:
+            return 0.0
+        rank = q * count
+        cumulative = 0
+        for i, bucket_count in enumerate(counts):
+            if cumulative + bucket_count >= rank and bucket_count:
+                if i == len(self.buckets):
+                    # Выше последней границы точнее не сказать
+                    return self.buckets[-1]
+                lower = self.buckets[i - 1] if i else 0.0
+                return lower + (self.buckets[i] - lower) * (rank - cumulative) / bucket_count
+            cumulative += bucket_count
+        return self.buckets[-1]
+
+    def summary(self) -> List[dict]:
+        """Сводка по меткам для /metrics: от наибольшего суммарного времени"""
+        rows = [
+            {
+                'labels': dict(zip(self.labelnames, key)),
+                'count': count,
+                'total': total,
+                'mean': total / count if count else 0.0,
+                'p50': self.quantile(0.5, counts),
+                'p99': self.quantile(0.99, counts),
+            }
+            for key, (counts, total, count) in self.items().items()
+        ]
+        return sorted(rows, key=lambda row: row['total'], reverse=True)
+
+    def samples(self) -> Iterator[str]:
+        for key, (counts, total, count) in sorted(self.items().items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = '+Inf' if bound == float('inf') else f'{bound:g}'
+                yield f'{self.name}_bucket{self._labels(key, (("le", le),))} {cumulative}'
+            yield f'{self.name}_sum{self._labels(key)} {total:g}'
+            yield f'{self.name}_count{self._labels(key)} {count}'
+
+
+class MetricsRegistry:
+    """Все метрики процесса; render() отдает их в текстовом формате Prometheus"""
+
+    def __init__(self):
+        self.started = time.time()
+        self._metrics: Dict[str, Metric] = {}
+
+    def _register(self, metric: Metric) -> Metric:
+        existing = self._metrics.get(metric.name)
+        if existing is not None and not isinstance(metric, Gauge):
+            return existing
+        # Gauge перерегистрируется: функция ссылается на новое приложение
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge(self, name: str, documentation: str, func: Callable[[], float]) -> Gauge:
+        return self._register(Gauge(name, documentation, func))
+
+    def get(self, name: str) -> Optional[Metric]:
+        return self._metrics.get(name)
+
+    def gauges(self) -> List[Gauge]:
+        return [metric for metric in self._metrics.values() if isinstance(metric, Gauge)]
+
+    def render(self) -> str:
+        uptime = Gauge('bot_uptime_seconds', 'Время работы процесса', lambda: time.time() - self.started)
+        parts = [uptime.render()] + [metric.render() for metric in self._metrics.values()]
+        return '\n'.join(parts) + '\n'
+
+
+class MetricsServer:
+    """Локальный HTTP сервер для Prometheus: GET /metrics.
+
+    Работает в event loop бота (asyncio.start_server), отдельный поток или
+    библиотека не нужны. По умолчанию слушает только 127.0.0.1.
+    """
+
+    def __init__(self, registry: 'MetricsRegistry', host: str = config.METRICS_HOST,
+                 port: int = config.METRICS_PORT):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self):
+        if self._server is not None or not self.port:
+            return
+        try:
+            self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        except OSError as e:
+            # Занятый порт не должен мешать боту работать
+            logger.error(f"Metrics endpoint is disabled: cannot listen on {self.host}:{self.port}: {e}")
+            return
+        logger.info(f"Metrics endpoint: http://{self.host}:{self.port}/metrics")
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), 10)
+            # Заголовки запроса не нужны, но их надо дочитать
+            while (await asyncio.wait_for(reader.readline(), 10)) not in (b'\r\n', b'\n', b''):
+                pass
+            parts = request_line.decode('latin-1').split()
+            if len(parts) >= 2 and parts[0] == 'GET' and parts[1].split('?')[0] == '/metrics':
+                status, body = '200 OK', self.registry.render().encode()
+            else:
+                status, body = '404 Not Found', b'Not found\n'
+            writer.write(
+                f"HTTP/1.1 {status}\r\n"
+                f"Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: close\r\n\r\n".encode() + body
+            )
+            await writer.drain()
+        except (ConnectionError, asyncio.TimeoutError):
+            pass
+        finally:
+            writer.close()
+
+
+# Метрики бота: /metrics для админа и METRICS_PORT для Prometheus
+registry = MetricsRegistry()
+
+handler_seconds = registry.histogram(
+    'bot_handler_seconds', 'Время обработчика апдейта', ('handler',)
+)
+handler_errors = registry.counter(
+    'bot_handler_errors_total', 'Исключения в обработчиках апдейтов', ('handler', 'error')
+)
+db_query_seconds = registry.histogram(
+    'bot_db_query_seconds', 'Время запроса к базе (в потоке базы)', ('method',)
+)
+db_errors = registry.counter(
+    'bot_db_errors_total', 'Исключения в запросах к базе', ('method', 'error')
+)
+db_write_batch_size = registry.histogram(
+    'bot_db_write_batch_size', 'Записей в одной транзакции группового коммита', (),
+    (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+)
+db_write_commit_seconds = registry.histogram(
+    'bot_db_write_commit_seconds', 'Время транзакции группового коммита (пачка и commit)'
+)
+telegram_request_seconds = registry.histogram(
+    'bot_telegram_request_seconds', 'Время запроса к Bot API', ('method',)
+)
+telegram_errors = registry.counter(
+    'bot_telegram_errors_total', 'Ошибки Bot API по HTTP статусу (network - нет ответа)', ('method', 'status')
+)
+broadcast_messages = registry.counter(
+    'bot_broadcast_messages_total', 'Сообщения рассылок: delivered, failed, retry', ('result',)
+)
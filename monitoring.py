@@ -0,0 +1,88 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import List, Optional, Tuple
+
+import config
+
+logger = logging.getLogger(__name__)
+
+
+class LoopLagMonitor:
+    """Измеряет задержку event loop.
+
+    Раз в `interval` секунд засыпает и смотрит, насколько позже запланированного
+    проснулся. Если какой-то обработчик блокирует loop (синхронный запрос к
+    базе, рендер графика), задержка растет на время блокировки.
+    """
+
+    def __init__(self, interval: float = config.LOOP_LAG_CHECK_INTERVAL,
+                 warn_threshold: float = config.LOOP_LAG_WARN_THRESHOLD,
+                 history: int = 1000):
+        self.interval = interval
+        self.warn_threshold = warn_threshold
+        self.samples = deque(maxlen=history)
+        self.max_lag = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - expected)
+            self.samples.append(lag)
+            self.max_lag = max(self.max_lag, lag)
+            if lag > self.warn_threshold:
+                logger.warning(f"Event loop was blocked for {lag * 1000:.0f} ms")
+
+    def summary(self) -> dict:
+        """Статистика задержек в миллисекундах"""
+        samples = sorted(self.samples)
+        if not samples:
+            return {'count': 0, 'mean': 0.0, 'p99': 0.0, 'max': 0.0}
+        return {
+            'count': len(samples),
+            'mean': sum(samples) / len(samples) * 1000,
+            'p99': samples[max(0, int(len(samples) * 0.99) - 1)] * 1000,
+            'max': self.max_lag * 1000,
+        }
+
+
+class StartupTimer:
+    """Засекает фазы запуска бота (см. python bot.py --measure-startup)"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self._last = self.started
+        self.phases: List[Tuple[str, float]] = []
+
+    def mark(self, phase: str):
+        """Завершает фазу: время с предыдущей отметки"""
+        now = time.perf_counter()
+        self.phases.append((phase, now - self._last))
+        self._last = now
+
+    @property
+    def total(self) -> float:
+        return self._last - self.started
+
+    def report(self, budget: float) -> str:
+        lines = [f"{phase:<14}{seconds * 1000:>9.1f} ms" for phase, seconds in self.phases]
+        status = 'OK' if self.total <= budget else 'OVER BUDGET'
+        lines.append(f"{'total':<14}{self.total * 1000:>9.1f} ms (budget {budget * 1000:.0f} ms, {status})")
+        return '\n'.join(lines)
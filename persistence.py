@@ -0,0 +1,126 @@
+import json
+import logging
+import pickle
+from typing import Dict, Optional, Tuple
+
+from telegram.ext import BasePersistence, PersistenceInput
+
+import config
+
+logger = logging.getLogger(__name__)
+
+
+class SQLitePersistence(BasePersistence):
+    """Persistence бота в той же SQLite базе: строка на пользователя и на диалог.
+
+    В отличие от PicklePersistence, который при каждом сохранении переписывает
+    весь файл, здесь сохраняются только изменившиеся ключи (UPSERT), поэтому
+    сохранять можно часто, и незаконченные оценки переживают перезапуск.
+    Диалоги и user_data, которые не менялись дольше ttl_hours, удаляются при
+    запуске и потом периодически (evict_stale из задачи бота) - так не
+    копятся зависшие диалоги.
+
+    Хранятся только user_data и состояния ConversationHandler: chat_data,
+    bot_data и callback_data бот не использует.
+    """
+
+    def __init__(self, database, ttl_hours: float = config.PERSISTENCE_TTL_HOURS,
+                 update_interval: float = config.PERSISTENCE_UPDATE_INTERVAL):
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, chat_data=False, user_data=True, callback_data=False),
+            update_interval=update_interval
+        )
+        self.database = database
+        self.ttl_hours = ttl_hours
+        self._evicted = False
+
+    async def _evict_stale(self):
+        """Один раз при загрузке удаляет устаревшие диалоги и user_data"""
+        if self._evicted:
+            return
+        self._evicted = True
+        await self.evict_stale()
+
+    async def evict_stale(self, application=None) -> Tuple[int, int]:
+        """Удаляет диалоги и user_data, которые не менялись дольше ttl_hours.
+
+        Если передан application (работающий бот), сначала сохраняются
+        накопленные изменения - недавно активные пользователи не попадут под
+        удаление, - а удаленные ключи убираются и из памяти бота, иначе
+        диалог продолжился бы с зависшего состояния. Возвращает (диалогов,
+        user_data) удалено.
+        """
+        if application is not None:
+            await application.update_persistence()
+        conversations, user_ids = await self.database.evict_persisted_state(self.ttl_hours)
+        if application is not None:
+            for user_id in user_ids:
+                application.drop_user_data(user_id)
+            # Состояния ConversationHandler у Application без публичного API;
+            # удаление из TrackingDict при следующем сохранении только
+            # повторит уже выполненный DELETE
+            states = application._conversation_handler_conversations
+            for name, key in conversations:
+                if name in states:
+                    states[name].pop(tuple(json.loads(key)), None)
+        if conversations or user_ids:
+            logger.info(f"Evicted {len(conversations)} stale conversations and {len(user_ids)} user_data entries")
+        return len(conversations), len(user_ids)
+
+    async def get_user_data(self) -> Dict[int, dict]:
+        await self._evict_stale()
+        rows = await self.database.load_persisted_user_data()
+        return {user_id: pickle.loads(data) for user_id, data in rows}
+
+    async def update_user_data(self, user_id: int, data: dict) -> None:
+        # Пустой user_data (был у каждого, кто писал боту) не храним
+        await self.database.save_persisted_user_data(user_id, pickle.dumps(data) if data else None)
+
+    async def drop_user_data(self, user_id: int) -> None:
+        await self.database.save_persisted_user_data(user_id, None)
+
+    async def refresh_user_data(self, user_id: int, user_data: dict) -> None:
+        pass
+
+    async def get_conversations(self, name: str) -> Dict[Tuple[int, ...], object]:
+        await self._evict_stale()
+        rows = await self.database.load_persisted_conversations(name)
+        return {tuple(json.loads(key)): pickle.loads(state) for key, state in rows}
+
+    async def update_conversation(self, name: str, key: Tuple[int, ...], new_state: Optional[object]) -> None:
+        await self.database.save_persisted_conversation(
+            name, json.dumps(list(key)), None if new_state is None else pickle.dumps(new_state)
+        )
+
+    # === Не используются ботом ===
+
+    async def get_chat_data(self) -> Dict[int, dict]:
+        return {}
+
+    async def update_chat_data(self, chat_id: int, data: dict) -> None:
+        pass
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        pass
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: dict) -> None:
+        pass
+
+    async def get_bot_data(self) -> dict:
+        return {}
+
+    async def update_bot_data(self, data: dict) -> None:
+        pass
+
+    async def refresh_bot_data(self, bot_data: dict) -> None:
+        pass
+
+    async def get_callback_data(self) -> Optional[tuple]:
+        return None
+
+    async def update_callback_data(self, data: tuple) -> None:
+        pass
+
+    async def flush(self) -> None:
+        # Каждое изменение уже записано отдельной транзакцией
+        pass
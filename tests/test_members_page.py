@@ -0,0 +1,151 @@
+"""Keyset пагинация /pending и /remove (Database.get_members_page): листание
+вперед и назад после одобрения и удаления пользователей ничего не
+пропускает и не повторяет.
+
+    python -m pytest tests
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import Database
+
+ADMIN_ID = 1
+LIMIT = 3
+
+
+@pytest.fixture
+def db(tmp_path):
+    database = Database(str(tmp_path / 'members.db'))
+    conn = database.get_connection()
+    # Одинаковые ключи сортировки - порядок внутри них задает user_id
+    conn.executemany(
+        'INSERT INTO users (user_id, first_name, joined_date) VALUES (?, ?, ?)',
+        [(ADMIN_ID, 'Admin', '2025-01-01T00:00:00')] +
+        [(user_id, f'Name {user_id % 4}', '2025-01-01T00:00:00') for user_id in range(100, 111)]
+    )
+    conn.executemany(
+        'INSERT INTO pending_users (user_id, first_name, request_date) VALUES (?, ?, ?)',
+        [(user_id, f'Pending {user_id}', f'2025-02-{user_id % 5 + 1:02d}T10:00:00')
+         for user_id in range(200, 211)]
+    )
+    conn.commit()
+    conn.close()
+    database.load_membership()
+    yield database
+    database.close()
+
+
+def expected_ids(db: Database, kind: str) -> list:
+    """Все пользователи списка в порядке сортировки (без админа)"""
+    conn = db.get_connection()
+    if kind == 'pending':
+        rows = conn.execute('SELECT request_date, user_id FROM pending_users').fetchall()
+    else:
+        rows = conn.execute('SELECT first_name, user_id FROM users WHERE user_id != ?', (ADMIN_ID,)).fetchall()
+    conn.close()
+    return [user_id for _, user_id in sorted(rows)]
+
+
+def page(db: Database, kind: str, **anchor) -> dict:
+    result = db.get_members_page(kind, exclude_id=ADMIN_ID, limit=LIMIT, **anchor)
+    result['ids'] = [row[0] for row in result['users']]
+    return result
+
+
+def walk_forward(db: Database, kind: str, current: dict) -> list:
+    """Кнопка ▶️ до конца списка, начиная со страницы current"""
+    ids = list(current['ids'])
+    while current['has_next']:
+        current = page(db, kind, after_id=current['ids'][-1])
+        assert current['ids'], 'has_next pointed to an empty page'
+        ids += current['ids']
+    return ids
+
+
+def walk_backward(db: Database, kind: str, current: dict) -> list:
+    """Кнопка ◀️ до первой страницы, начиная со страницы current"""
+    ids = list(current['ids'])
+    while current['prev_id'] is not None:
+        current = page(db, kind, before_id=current['ids'][0])
+        assert len(current['ids']) == LIMIT, 'previous page is not full'
+        ids = current['ids'] + ids
+    return ids
+
+
+def last_page(db: Database, kind: str) -> dict:
+    current = page(db, kind)
+    while current['has_next']:
+        current = page(db, kind, after_id=current['ids'][-1])
+    return current
+
+
+@pytest.mark.parametrize('kind', ['pending', 'approved'])
+def test_walk_whole_list(db, kind):
+    order = expected_ids(db, kind)
+    first = page(db, kind)
+    assert first['prev_id'] is None
+    assert first['total'] == len(order)
+    assert walk_forward(db, kind, first) == order
+    assert walk_backward(db, kind, last_page(db, kind)) == order
+
+
+def test_approve_page_then_refresh(db):
+    """Одобрение всех на второй странице /pending и "обновить" (after prev_id)"""
+    first = page(db, 'pending')
+    second = page(db, 'pending', after_id=first['ids'][-1])
+    assert second['prev_id'] == first['ids'][-1]
+    for user_id in second['ids']:
+        assert db.approve_user(user_id)
+
+    refreshed = page(db, 'pending', after_id=second['prev_id'])
+    order = expected_ids(db, 'pending')
+    assert not set(second['ids']) & set(order)
+    assert first['ids'] + walk_forward(db, 'pending', refreshed) == order
+    assert walk_backward(db, 'pending', refreshed) == order[:order.index(refreshed['ids'][-1]) + 1]
+
+    approved = expected_ids(db, 'approved')
+    assert set(second['ids']) <= set(approved)
+    assert walk_forward(db, 'approved', page(db, 'approved')) == approved
+
+
+def test_remove_across_page_boundary(db):
+    """Удаление последнего пользователя страницы и первых на следующей,
+    затем ▶️ и ◀️ от этой страницы"""
+    order = expected_ids(db, 'approved')
+    second = page(db, 'approved', after_id=page(db, 'approved')['ids'][-1])
+    boundary = order.index(second['ids'][-1])
+    removed = order[boundary:boundary + 3]
+    for user_id in removed:
+        assert db.remove_user(user_id)
+
+    remaining = expected_ids(db, 'approved')
+    assert remaining == [user_id for user_id in order if user_id not in removed]
+    # ▶️ с удаленного опорного пользователя показывает первую страницу
+    assert page(db, 'approved', after_id=removed[0])['ids'] == remaining[:LIMIT]
+
+    # Страница, открытая до удаления, листается дальше без пропусков
+    current = page(db, 'approved', after_id=second['prev_id'])
+    before = remaining[:remaining.index(current['ids'][0])]
+    assert before + walk_forward(db, 'approved', current) == remaining
+    assert walk_backward(db, 'approved', last_page(db, 'approved')) == remaining
+    assert page(db, 'approved')['total'] == len(remaining)
+
+
+def test_back_from_shifted_page(db):
+    """После удаления с первой страницы вторая начинается не с кратной
+    LIMIT позиции; ◀️ с нее не повторяет ее пользователей"""
+    order = expected_ids(db, 'approved')
+    first = page(db, 'approved')
+    assert db.remove_user(first['ids'][0])
+
+    second = page(db, 'approved', after_id=first['ids'][-1])
+    previous = page(db, 'approved', before_id=second['ids'][0])
+    assert previous['ids'] == order[1:LIMIT]
+    assert previous['prev_id'] is None
+    assert previous['has_next']
+    assert not set(previous['ids']) & set(second['ids'])
+    assert previous['ids'] + walk_forward(db, 'approved', second) == order[1:]
@@ -0,0 +1,93 @@
+"""Миграции схемы и фоновое заполнение новых колонок на базе со старыми данными.
+
+    python -m pytest tests
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+from database import BASE_SCHEMA_VERSION, EPOCH_TIMESTAMPS_VERSION, MIGRATIONS, SCHEMA_VERSION, Database
+
+# Telegram user_id - это rowid users/pending_users: большие и разреженные
+USER_IDS = [10 ** 9 + i * 97_000_003 for i in range(60)]
+PENDING_IDS = [7 * 10 ** 9 + i * 1_000_003 for i in range(15)]
+
+
+def create_old_database(path: str, monkeypatch):
+    """База версии BASE_SCHEMA_VERSION (до миграций) с пользователями,
+    закрытыми встречами за год, оценками и отзывами"""
+    with monkeypatch.context() as patch:
+        patch.setattr(database, 'MIGRATIONS', [])
+        db = Database(path)
+    assert db.get_schema_version() == BASE_SCHEMA_VERSION
+
+    conn = db.get_connection()
+    conn.executemany(
+        'INSERT INTO users (user_id, first_name, joined_date) VALUES (?, ?, ?)',
+        [(user_id, f'User {i}', f'2025-01-{i % 28 + 1:02d}T10:00:00') for i, user_id in enumerate(USER_IDS)]
+    )
+    conn.executemany(
+        'INSERT INTO pending_users (user_id, first_name, request_date) VALUES (?, ?, ?)',
+        [(user_id, 'Pending', f'2025-02-{i % 28 + 1:02d}T09:30:00') for i, user_id in enumerate(PENDING_IDS)]
+    )
+    for month in range(1, 13):
+        cursor = conn.execute(
+            'INSERT INTO youth_meetings (start_date, deadline_date, is_active) VALUES (?, ?, 0)',
+            (f'2025-{month:02d}-{month + 5:02d}T18:00:00', f'2025-{month:02d}-{month + 6:02d}T18:00:00')
+        )
+        meeting_id = cursor.lastrowid
+        conn.executemany(
+            '''INSERT INTO ratings
+               (meeting_id, interest_rating, relevance_rating, spiritual_growth_rating, attended, rating_date)
+               VALUES (?, ?, ?, ?, ?, ?)''',
+            [(meeting_id, (i + month) % 5 + 1, i % 5 + 1, (i * month) % 5 + 1, int(i % 7 != 0),
+              f'2025-{month:02d}-{month + 5:02d}T20:{i:02d}:00') for i in range(40)]
+        )
+        conn.executemany(
+            'INSERT INTO feedback (meeting_id, feedback_text, feedback_date) VALUES (?, ?, ?)',
+            [(meeting_id, f'Відгук {i}', f'2025-{month:02d}-{month + 6:02d}T08:{i:02d}:00') for i in range(5)]
+        )
+    conn.commit()
+    conn.close()
+    db.rebuild_aggregates()
+    db.close()
+
+
+def test_migrate_and_backfill_old_database(tmp_path, monkeypatch):
+    path = str(tmp_path / 'old.db')
+    create_old_database(path, monkeypatch)
+
+    db = Database(path)
+    try:
+        assert db.get_schema_version() == SCHEMA_VERSION
+        assert not db.is_backfilled(EPOCH_TIMESTAMPS_VERSION)
+        before = {period: db.get_rating_rollup(period) for period in database.ROLLUP_PERIODS}
+
+        batches = 0
+        while db.backfill_batch(batch_size=7) is not None:
+            batches += 1
+            assert batches < 1000, 'backfill does not finish'
+
+        assert db.is_backfilled(EPOCH_TIMESTAMPS_VERSION)
+        conn = db.get_connection()
+        for migration in MIGRATIONS:
+            for backfill in migration.backfills:
+                source = backfill.expression
+                missing, wrong = conn.execute(f'''
+                    SELECT COUNT(*) - COUNT({backfill.column}),
+                           SUM({backfill.column} IS NOT {source})
+                    FROM {backfill.table}
+                ''').fetchone()
+                assert missing == 0, f'{backfill.table}.{backfill.column} not filled'
+                assert not wrong, f'{backfill.table}.{backfill.column} filled with wrong values'
+        unfinished = conn.execute('SELECT COUNT(*) FROM schema_migrations WHERE backfilled_at IS NULL').fetchone()[0]
+        conn.close()
+        assert unfinished == 0
+
+        after = {period: db.get_rating_rollup(period) for period in database.ROLLUP_PERIODS}
+        assert after == before
+        assert len(after['month']) == 12
+    finally:
+        db.close()
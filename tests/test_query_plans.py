@@ -0,0 +1,21 @@
+"""Горячие запросы используют свои индексы (то же, что python manage.py check-indexes).
+
+    python -m pytest tests
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import Database
+
+
+def test_hot_queries_use_indexes(tmp_path):
+    db = Database(str(tmp_path / 'plans.db'))
+    try:
+        results = db.explain_query_plans()
+    finally:
+        db.close()
+    assert results
+    failed = {r['query']: (r['index'], r['plan']) for r in results if not r['ok']}
+    assert not failed
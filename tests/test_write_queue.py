@@ -0,0 +1,97 @@
+"""Групповой коммит GroupCommitWriter: SAVEPOINT на запись, гарантии
+durability и запись очереди при close().
+
+    python -m pytest tests
+"""
+import asyncio
+import os
+import sqlite3
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import Database
+from write_queue import GroupCommitWriter
+
+
+@pytest.fixture
+def db(tmp_path):
+    database = Database(str(tmp_path / 'writes.db'))
+    yield database
+    database.close()
+
+
+def count_committed(db: Database, table: str) -> int:
+    """Сколько строк видно из отдельного подключения (только закоммиченные)"""
+    conn = sqlite3.connect(db.db_name)
+    try:
+        return conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+    finally:
+        conn.close()
+
+
+def write_feedback_then_fail(cursor, meeting_id: int):
+    cursor.execute(
+        'INSERT INTO feedback (meeting_id, feedback_text, feedback_date) VALUES (?, ?, ?)',
+        (meeting_id, 'не збережеться', '2025-01-01T00:00:00')
+    )
+    raise ValueError('broken write')
+
+
+def test_failed_item_is_rolled_back_alone(db):
+    meeting_id = db.create_meeting()
+    # Все записи попадают в одну пачку: она закрывается по max_batch
+    writer = GroupCommitWriter(db, max_batch=5, max_delay=5)
+    futures = [writer.submit(Database._write_rating, meeting_id, user_id, 5, 4, 3, True) for user_id in (1, 2)]
+    failed = writer.submit(write_feedback_then_fail, meeting_id)
+    futures += [writer.submit(Database._write_rating, meeting_id, user_id, 5, 4, 3, True) for user_id in (3, 4)]
+
+    for future in futures:
+        assert future.result(timeout=5) is None
+    with pytest.raises(ValueError):
+        failed.result(timeout=5)
+    writer.close()
+
+    assert count_committed(db, 'ratings') == 4
+    assert count_committed(db, 'feedback') == 0
+    assert db.get_meeting_totals(meeting_id) == (4, 0)
+
+
+def test_queued_returns_before_commit(db):
+    meeting_id = db.create_meeting()
+    writer = GroupCommitWriter(db, max_delay=0.5, durability='queued')
+
+    async def write():
+        return await writer.write(Database._write_feedback, meeting_id, 'дякую')
+
+    assert asyncio.run(write()) is None
+    assert count_committed(db, 'feedback') == 0
+    writer.close()
+    assert count_committed(db, 'feedback') == 1
+
+
+def test_full_returns_after_commit(db):
+    meeting_id = db.create_meeting()
+    writer = GroupCommitWriter(db, max_delay=0.05, durability='full')
+    assert writer.synchronous == 'FULL'
+
+    async def write():
+        await writer.write(Database._write_feedback, meeting_id, 'дякую')
+        return count_committed(db, 'feedback')
+
+    assert asyncio.run(write()) == 1
+    writer.close()
+
+
+def test_close_drains_queue(db):
+    meeting_id = db.create_meeting()
+    writer = GroupCommitWriter(db, max_batch=16, max_delay=5)
+    futures = [writer.submit(Database._write_feedback, meeting_id, f'відгук {i}') for i in range(100)]
+    writer.close()
+
+    assert all(future.done() and future.exception() is None for future in futures)
+    assert count_committed(db, 'feedback') == 100
+    with pytest.raises(RuntimeError):
+        writer.submit(Database._write_feedback, meeting_id, 'після close')
@@ -0,0 +1,163 @@
+import asyncio
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, List, Optional, Tuple
+
+import config
+from metrics import db_errors, db_write_batch_size, db_write_commit_seconds
+
+logger = logging.getLogger(__name__)
+
+# Гарантии записи: уровень -> (PRAGMA synchronous писателя, ждать ли коммита)
+DURABILITY_LEVELS = {
+    # fsync на каждый коммит пачки: записанное переживет и отключение питания
+    'full': ('FULL', True),
+    # как остальная база (WAL + NORMAL): переживет падение процесса, при
+    # отключении питания можно потерять последние пачки
+    'normal': (config.DATABASE_SYNCHRONOUS, True),
+    # ответ сразу после постановки в очередь: при падении процесса теряются
+    # пачки, которые еще не записаны; ошибки записи только в логе
+    'queued': (config.DATABASE_SYNCHRONOUS, False),
+}
+
+# (функция записи, аргументы, future для ответа)
+WriteItem = Tuple[Callable, tuple, Future]
+
+
+class GroupCommitWriter:
+    """Единственный писатель с групповым коммитом.
+
+    Обработчики ставят запись в очередь и ждут подтверждения, а поток
+    писателя собирает пачку - все, что накопилось, и дальше, пока не пройдет
+    max_delay секунд с первой записи или не наберется max_batch штук, - и
+    коммитит ее одной транзакцией. Сотни оценок сразу после рассылки опроса
+    платят за одну транзакцию (и один fsync), а не каждая за свою, и не
+    толкаются за блокировку записи в потоках базы.
+
+    Каждая запись выполняется в своем SAVEPOINT: ошибка одной записи
+    откатывает только ее, остальные записи пачки сохраняются.
+    """
+
+    def __init__(self, database, max_batch: int = config.WRITE_QUEUE_MAX_BATCH,
+                 max_delay: float = config.WRITE_QUEUE_MAX_DELAY,
+                 durability: str = config.WRITE_DURABILITY):
+        if durability not in DURABILITY_LEVELS:
+            raise ValueError(f"Unknown durability {durability!r}, expected one of {', '.join(DURABILITY_LEVELS)}")
+        self.database = database
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.durability = durability
+        self.synchronous, self.wait_for_commit = DURABILITY_LEVELS[durability]
+        self._queue: 'queue.Queue[Optional[WriteItem]]' = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._closed = False
+
+    @property
+    def pending(self) -> int:
+        """Записей в очереди (метрика bot_db_write_queue_size)"""
+        return self._queue.qsize()
+
+    def submit(self, func: Callable, *args) -> Future:
+        """Ставит запись func(cursor, *args) в очередь; Future завершится после коммита"""
+        with self._lock:
+            if self._closed:
+                raise RuntimeError('Write queue is closed')
+            if self._thread is None:
+                # Поток стартует с первой записью (manage.py и бенчмарки без записей его не создают)
+                self._thread = threading.Thread(target=self._run, name='database-writer', daemon=True)
+                self._thread.start()
+            future = Future()
+            self._queue.put((func, args, future))
+        return future
+
+    async def write(self, func: Callable, *args):
+        """Запись из обработчика: ждет коммита (кроме durability='queued')"""
+        future = self.submit(func, *args)
+        if not self.wait_for_commit:
+            future.add_done_callback(self._log_error)
+            return None
+        return await asyncio.wrap_future(future)
+
+    @staticmethod
+    def _log_error(future: Future):
+        if not future.cancelled() and future.exception() is not None:
+            logger.error(f"Queued write failed: {future.exception()}")
+
+    def close(self):
+        """Записывает все, что осталось в очереди, и останавливает поток"""
+        with self._lock:
+            self._closed = True
+            thread = self._thread
+            self._queue.put(None)
+        if thread is not None:
+            thread.join()
+
+    def _run(self):
+        conn = self.database.get_connection()
+        conn.execute(f'PRAGMA synchronous = {self.synchronous}')
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.max_batch:
+                timeout = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._flush(conn, batch)
+        conn.close()
+
+    def _flush(self, conn, batch: List[WriteItem]):
+        """Выполняет пачку одной транзакцией и отвечает каждой записи"""
+        # Обработчик, который перестал ждать (отменен), не получит ответа - не пишем
+        batch = [item for item in batch if item[2].set_running_or_notify_cancel()]
+        if not batch:
+            return
+        started = time.perf_counter()
+        results = []
+        try:
+            cursor = conn.cursor()
+            cursor.execute('BEGIN IMMEDIATE')
+            for func, args, future in batch:
+                cursor.execute('SAVEPOINT write_item')
+                try:
+                    result = func(cursor, *args)
+                except Exception as e:
+                    cursor.execute('ROLLBACK TO write_item')
+                    cursor.execute('RELEASE write_item')
+                    db_errors.inc(method=func.__name__, error=type(e).__name__)
+                    results.append((future, None, e))
+                else:
+                    cursor.execute('RELEASE write_item')
+                    results.append((future, result, None))
+            conn.commit()
+        except Exception as e:
+            # Не удалось начать или закоммитить транзакцию - не сохранилось ничего
+            if conn.in_transaction:
+                conn.rollback()
+            db_errors.inc(method='write_batch', error=type(e).__name__)
+            logger.error(f"Write batch of {len(batch)} failed: {e}")
+            for _, _, future in batch:
+                future.set_exception(e)
+            return
+        finally:
+            db_write_commit_seconds.observe(time.perf_counter() - started)
+            db_write_batch_size.observe(len(batch))
+
+        for future, result, error in results:
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)